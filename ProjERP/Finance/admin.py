@@ -2,4 +2,10 @@ from django.contrib import admin
 
 from .models import *
 
-admin.site.register(Department)
+
+@admin.register(Department)
+class DepartmentAdmin(admin.ModelAdmin):
+    list_display = ("DepartmentName", "ManagerID", "Budget")
+    list_select_related = ("ManagerID__DepartmentID",)  # Staff.__str__ shows the manager's department
+    search_fields = ("DepartmentName",)
+    raw_id_fields = ("ManagerID",)
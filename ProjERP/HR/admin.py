@@ -2,5 +2,11 @@ from django.contrib import admin
 
 from .models import *
 
-admin.site.register(Staff)
 
+@admin.register(Staff)
+class StaffAdmin(admin.ModelAdmin):
+    list_display = ("Name", "Role", "Salary", "DepartmentID", "StartDate")
+    list_select_related = ("DepartmentID__ManagerID",)  # Department.__str__ shows the manager's name
+    search_fields = ("Name", "Role")
+    autocomplete_fields = ("DepartmentID",)
+    show_full_result_count = False
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Finance', '0002_initial'),
+        ('HR', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='staff',
+            index=models.Index(fields=['DepartmentID', 'Name'], name='staff_department_name_idx'),
+        ),
+    ]
@@ -1,8 +1,102 @@
 # Imports for managing staff data, financial operations and time tracking
 from django.db import models
 from Finance.models import Department
-from django.db.models import Sum, Avg, Count
+from django.db.models import Sum, Avg, Count, F, Q, Case, When, Value, Window, FilteredRelation, ExpressionWrapper
+from django.db.models.functions import Cast, Coalesce, NullIf, Rank
 from datetime import datetime, timedelta
+from app.routers import ReportingDatabase
+
+LEADERBOARD_METRICS = {
+   # Leaderboard rank_by name -> annotation it orders by
+   "total_sales": "PeriodTotalSales",
+   "average_sale": "AverageSale",
+   "transactions": "TotalTransactions",
+   "sales_per_day": "SalesPerDay",
+   "performance_index": "PerformanceIndex",
+}
+
+class StaffQuerySet(models.QuerySet):
+   def WithPerformance(self, date_range=30, end_date=None):
+       # Annotate every staff member with ViewPerformance's metrics in one grouped query over the sales rollup
+       end_date = end_date or datetime.now().date()
+       start_date = end_date - timedelta(days=date_range)
+       money = models.DecimalField(max_digits=20, decimal_places=2)
+
+       # The date range sits in the JOIN condition, so staff without sales in the period are kept with zeros
+       totals = self.annotate(
+           PeriodSales=FilteredRelation(
+               "sales_rollups", condition=Q(sales_rollups__Date__range=[start_date, end_date])
+           ),
+       ).annotate(
+           PeriodTotalSales=Coalesce(Sum("PeriodSales__TotalAmount"), Value(0), output_field=money),
+           TotalTransactions=Coalesce(Sum("PeriodSales__TransactionCount"), Value(0)),
+       )
+       # SQLite stores whole-unit decimals as integers and would divide them as integers (25 / 3 = 8), so
+       # every ratio divides a float copy of the total; the results are rounded back to decimals
+       total = Cast("PeriodTotalSales", models.FloatField())
+       return totals.annotate(
+           AverageSale=Coalesce(
+               ExpressionWrapper(total / NullIf(F("TotalTransactions"), 0), output_field=money),
+               Value(0),
+               output_field=money,
+           ),
+           SalesPerDay=ExpressionWrapper(total / Value(float(date_range)), output_field=money),
+           PerformanceIndex=ExpressionWrapper(
+               total / Case(When(Salary=0, then=Value(1)), default=F("Salary")),  # Sales per salary unit
+               output_field=models.DecimalField(max_digits=20, decimal_places=4),
+           ),
+       )
+
+   def Leaderboard(self, date_range=30, rank_by="performance_index", department=None, top=None, page=1, page_size=50):
+       # -------------------
+       # Ranked staff performance for everyone in the queryset, or one department, over the last date_range days.
+       # Ranks are computed in the database (ties share a rank); top limits the board to the first N places and
+       # page/page_size page through it. Returns {"count", "page", "page_size", "results"}.
+       # -------------------
+       if rank_by not in LEADERBOARD_METRICS:
+           raise ValueError(f"Unknown leaderboard metric: {rank_by}")
+       if page < 1 or page_size < 1:
+           raise ValueError("Page and page size must be positive.")
+
+       staff = self.using(ReportingDatabase())
+       if department is not None:
+           staff = staff.filter(DepartmentID=department)
+
+       metric = LEADERBOARD_METRICS[rank_by]
+       ranked = (
+           staff.WithPerformance(date_range)
+           .annotate(Rank=Window(Rank(), order_by=F(metric).desc()))
+           .order_by("Rank", "EmployeeID")
+           .values(
+               "Rank", "EmployeeID", "Name", "DepartmentID__DepartmentName", "PeriodTotalSales", "AverageSale",
+               "TotalTransactions", "SalesPerDay", "PerformanceIndex",
+           )
+       )
+
+       # top keeps whole places, so everyone tied at place N stays on the board even if that makes it longer
+       if top is not None:
+           ranked = ranked.filter(Rank__lte=top)
+           count = ranked.count()
+       else:
+           count = staff.count()
+       first = (page - 1) * page_size
+       last = min(first + page_size, count)
+
+       results = [
+           {
+               "rank": row["Rank"],
+               "employee_id": row["EmployeeID"],
+               "employee_name": row["Name"],
+               "department": row["DepartmentID__DepartmentName"],
+               "period_total_sales": row["PeriodTotalSales"],
+               "average_daily_sales": row["AverageSale"],  # Same key and meaning as ViewPerformance
+               "total_transactions": row["TotalTransactions"],
+               "sales_per_day": row["SalesPerDay"],
+               "performance_index": row["PerformanceIndex"],
+           }
+           for row in (ranked[first:last] if first < last else [])
+       ]
+       return {"count": count, "page": page, "page_size": page_size, "results": results}
 
 class Staff(models.Model):
    # Primary staff identifiers and employment details 
@@ -19,6 +113,14 @@ class Staff(models.Model):
    )
    StartDate = models.DateField(auto_now_add=True)
 
+   objects = StaffQuerySet.as_manager()
+
+   class Meta:
+       indexes = [
+           # Department staff listings ordered by name
+           models.Index(fields=["DepartmentID", "Name"], name="staff_department_name_idx"),
+       ]
+
    def __str__(self):
        # Display staff info with department if assigned
        if self.DepartmentID:
@@ -61,17 +163,16 @@ class Staff(models.Model):
    def ViewPerformance(self, date_range=30):
        # Calculate staff performance metrics over specified period
        try:
-           end_date = datetime.now()
+           end_date = datetime.now().date()
            start_date = end_date - timedelta(days=date_range)
 
            # Aggregate sales metrics within date range for staff member
-           sales_data = Staff.sales.filter(
-               EmployeeID=self.EmployeeID,
-               SalesDate__range=[start_date, end_date]
+           sales_data = self.sales.using(ReportingDatabase()).filter(
+               SaleDate__range=[start_date, end_date]
            ).aggregate(
-               total_sales=Sum('total_amount'),  # Total monetary value of sales
-               average_daily_sales=Avg('total_amount'),  # Average sale value per day
-               total_transactions=Count('id'),  # Number of sales transactions
+               total_sales=Sum('TotalAmount'),  # Total monetary value of sales
+               average_daily_sales=Avg('TotalAmount'),  # Average sale value per day
+               total_transactions=Count('SalesID'),  # Number of sales transactions
            )
 
            # Calculate derived performance metrics including efficiency ratios
@@ -1,3 +1,66 @@
+from datetime import date
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from Finance.models import Department
+from Inventory.models import Store
+from Sales.models import Sales
+from .models import Staff
+
+
+class StaffLeaderboardTests(TestCase):
+    # The leaderboard must report the same metrics as Staff.ViewPerformance
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = department = Department.objects.create(DepartmentName="Sales", Budget=1000)
+        cls.store = store = Store.objects.create(
+            StoreName="Central", Location="Town", ContactNumber="123", TotalSales=0, OperatingHours=8
+        )
+        cls.ann = Staff.objects.create(Name="Ann", Role="Clerk", Salary=10, DepartmentID=department)
+        cls.bob = Staff.objects.create(Name="Bob", Role="Clerk", Salary=10, DepartmentID=department)
+        # Whole-unit totals with non-integer ratios: 25 over 3 days, 3 sales and a salary of 10
+        for amount in ("10.00", "10.00", "5.00"):
+            Sales.objects.create(
+                PaymentMethod="Card", TotalAmount=Decimal(amount), StoreID=store, EmployeeID=cls.ann,
+                SaleDate=date.today(),
+            )
+        Sales.objects.create(
+            PaymentMethod="Card", TotalAmount=Decimal("24.00"), StoreID=store, EmployeeID=cls.bob,
+            SaleDate=date.today(),
+        )
+
+    def test_metrics_match_view_performance(self):
+        row = Staff.objects.Leaderboard(date_range=3)["results"][0]
+        expected = self.ann.ViewPerformance(date_range=3)
+        self.assertEqual(row["employee_id"], self.ann.pk)
+        self.assertEqual(row["period_total_sales"], expected["period_total_sales"])
+        self.assertAlmostEqual(float(row["sales_per_day"]), float(expected["sales_per_day"]), places=2)
+        self.assertAlmostEqual(float(row["performance_index"]), float(expected["performance_index"]), places=4)
+        self.assertAlmostEqual(float(row["average_daily_sales"]), float(expected["average_daily_sales"]), places=2)
+
+    def test_ranking_uses_fractional_values(self):
+        # 2.5 against 2.4: integer division would tie both at 2
+        results = Staff.objects.Leaderboard(date_range=3)["results"]
+        self.assertEqual([(row["rank"], row["employee_id"]) for row in results], [(1, self.ann.pk), (2, self.bob.pk)])
+
+    def test_top_keeps_ties_at_the_cut_off(self):
+        # Cid ties Bob for second place; Dee has no sales and comes fourth
+        cid = Staff.objects.create(Name="Cid", Role="Clerk", Salary=10, DepartmentID=self.department)
+        Staff.objects.create(Name="Dee", Role="Clerk", Salary=10, DepartmentID=self.department)
+        Sales.objects.create(
+            PaymentMethod="Card", TotalAmount=Decimal("24.00"), StoreID=self.store, EmployeeID=cid,
+            SaleDate=date.today(),
+        )
+
+        def Board(**kwargs):
+            board = Staff.objects.Leaderboard(date_range=3, **kwargs)
+            return board["count"], [(row["rank"], row["employee_id"]) for row in board["results"]]
+
+        self.assertEqual(Board(top=1), (1, [(1, self.ann.pk)]))
+        places = [(1, self.ann.pk), (2, self.bob.pk), (2, cid.pk)]
+        self.assertEqual(Board(top=2), (3, places))
+        self.assertEqual(Board(top=3), (3, places))
+        self.assertEqual(Board(top=2, page=2, page_size=2), (3, [(2, cid.pk)]))
+        self.assertEqual(Board()[0], 4)
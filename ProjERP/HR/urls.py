@@ -0,0 +1,7 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path("staff/", views.StaffListView, name="staff-list"),
+]
@@ -1,3 +1,8 @@
-from django.shortcuts import render
+from app.paginator import KeysetListView, ParseId
+from .models import Staff
 
-# Create your views here.
+StaffListView = KeysetListView(
+    Staff,
+    ["EmployeeID", "Name", "Role", "StartDate", "DepartmentID", "DepartmentID__DepartmentName"],
+    {"department": ("DepartmentID", ParseId)},
+)
@@ -1,7 +1,50 @@
 from django.contrib import admin
 
+from app.paginator import EstimatedCountPaginator
 from .models import *
 
-admin.site.register(Product)
-admin.site.register(Store)
-admin.site.register(ProductLocation)
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ("ProductName", "Category", "Price", "StockLevel", "ReorderQuantity", "SupplierID")
+    list_select_related = ("SupplierID",)
+    search_fields = ("ProductName", "Category")
+    autocomplete_fields = ("SupplierID",)
+    readonly_fields = ("StockLevel",)
+    show_full_result_count = False
+
+
+@admin.register(Store)
+class StoreAdmin(admin.ModelAdmin):
+    list_display = ("StoreName", "Location", "ContactNumber", "ManagerId", "OperatingHours")
+    list_select_related = ("ManagerId__DepartmentID",)  # Staff.__str__ shows the manager's department
+    search_fields = ("StoreName", "Location")
+    raw_id_fields = ("ManagerId",)
+
+
+@admin.register(ProductLocation)
+class ProductLocationAdmin(admin.ModelAdmin):
+    list_display = ("ProductID", "StoreId", "Quantity", "Date")
+    list_select_related = ("ProductID", "StoreId")
+    autocomplete_fields = ("ProductID", "StoreId")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    # The ledger is append-only; movements are recorded by the stock operations, never edited here
+    list_display = ("OccurredAt", "Kind", "ProductID", "StoreId", "Quantity", "Reference")
+    list_select_related = ("ProductID", "StoreId")
+    list_filter = ("Kind",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
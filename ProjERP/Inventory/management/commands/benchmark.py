@@ -0,0 +1,66 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.benchmark import RunBenchmarks
+
+
+class Command(BaseCommand):
+    help = "Time the ERP hot paths (p50/p95 latency and query counts) and emit the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--only", action="append", help="Benchmark name to run (repeatable).")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per benchmark.")
+        parser.add_argument("--warmup", type=int, default=2, help="Untimed runs before timing.")
+        parser.add_argument("--keep-cache", action="store_true", help="Do not clear the report cache between runs.")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed for picking products, staff and stores.")
+        parser.add_argument(
+            "--report-workers",
+            help="Comma-separated worker counts for report engine scaling runs, e.g. 1,2,4,8.",
+        )
+        parser.add_argument(
+            "--report-source", choices=["sales", "rollup"], default="sales",
+            help="Table the scaling runs aggregate (default: the raw Sales table).",
+        )
+        parser.add_argument(
+            "--report-partition", choices=["store", "date"], default="store",
+            help="How the scaling runs split the work between processes.",
+        )
+        parser.add_argument(
+            "--startup", type=int, default=0, metavar="RUNS",
+            help="Also time cold start (django.setup and facade import) over this many fresh interpreters.",
+        )
+        parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        reportWorkers = None
+        if options["report_workers"]:
+            try:
+                reportWorkers = [int(count) for count in options["report_workers"].split(",")]
+            except ValueError:
+                raise CommandError(f"Invalid --report-workers: {options['report_workers']}")
+            if min(reportWorkers) < 1:
+                raise CommandError("--report-workers counts must be at least 1.")
+
+        try:
+            results = RunBenchmarks(
+                names=options["only"],
+                repeat=options["repeat"],
+                warmup=options["warmup"],
+                clearCache=not options["keep_cache"],
+                seed=options["seed"],
+                reportWorkers=reportWorkers,
+                reportSource=options["report_source"],
+                reportPartition=options["report_partition"],
+                startupRuns=options["startup"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        document = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                output.write(document + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Wrote benchmark results to {options['output']}."))
+        else:
+            self.stdout.write(document)
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.exports import EXPORT_FORMATS, GetExportDatasets, IterExport
+from app.paginator import ParseDate
+
+
+class Command(BaseCommand):
+    help = "Stream a sales, purchase order or stock extract to a file or stdout as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(GetExportDatasets()))
+        parser.add_argument("--format", dest="export_format", choices=sorted(EXPORT_FORMATS), default="csv")
+        parser.add_argument("--output", help="File to write to (defaults to stdout).")
+        parser.add_argument("--start-date", help="First date to include (YYYY-MM-DD).")
+        parser.add_argument("--end-date", help="Last date to include (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        dates = {}
+        for option in ("start_date", "end_date"):
+            value = options[option]
+            try:
+                dates[option] = ParseDate(value) if value else None
+            except ValueError as e:
+                raise CommandError(f"Invalid {option.replace('_', '-')}: {e}")
+
+        chunks = IterExport(options["dataset"], options["export_format"], **dates)
+
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
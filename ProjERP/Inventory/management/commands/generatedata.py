@@ -0,0 +1,171 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.reportcache import InvalidateReports
+from Finance.models import Department
+from HR.models import Staff
+from Inventory.models import Product, ProductLocation, StockMovement, Store
+from Procurement.models import PurchaseOrder, Supplier
+from Sales.models import Sales, SalesDailyRollup
+
+# Rows per table for each dataset scale
+SCALES = {
+    "10k": {"sales": 10_000, "stores": 10, "products": 500, "staff": 50, "suppliers": 20, "departments": 5, "orders": 1_000},
+    "1m": {"sales": 1_000_000, "stores": 100, "products": 10_000, "staff": 1_000, "suppliers": 200, "departments": 20, "orders": 50_000},
+    "10m": {"sales": 10_000_000, "stores": 500, "products": 50_000, "staff": 5_000, "suppliers": 2_000, "departments": 50, "orders": 500_000},
+}
+CATEGORIES = ["Grocery", "Household", "Electronics", "Clothing", "Toys", "Garden", "Office", "Health"]
+PAYMENT_METHODS = ["Card", "Cash", "Mobile", "Voucher"]
+ORDER_STATUSES = ["Delivered"] * 7 + ["Pending", "Shipped", "Cancelled"]
+CHUNK_SIZE = 10_000
+
+
+def ZipfWeights(count, exponent=1.1):
+    # Cumulative weights giving a long-tailed popularity: a few stores/products take most sales
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = "Populate the database with a skewed synthetic ERP dataset for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=sorted(SCALES), default="10k", help="Dataset size by number of sales.")
+        parser.add_argument("--sales", type=int, help="Override the number of sales rows.")
+        parser.add_argument("--days", type=int, default=365, help="Days of history to spread sales over.")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed, for repeatable datasets.")
+
+    def handle(self, *args, **options):
+        counts = dict(SCALES[options["scale"]])
+        if options["sales"] is not None:
+            counts["sales"] = options["sales"]
+        rng = random.Random(options["seed"])
+        today = date.today()
+
+        with transaction.atomic():
+            departments = Department.objects.bulk_create(
+                Department(DepartmentName=f"Department {i}", Budget=rng.randint(50_000, 500_000))
+                for i in range(counts["departments"])
+            )
+            staff = Staff.objects.bulk_create(
+                (
+                    Staff(
+                        Name=f"Employee {i}",
+                        Role=rng.choice(["Cashier", "Clerk", "Supervisor", "Manager"]),
+                        Salary=rng.randint(18_000, 60_000),
+                        DepartmentID=rng.choice(departments),
+                    )
+                    for i in range(counts["staff"])
+                ),
+                batch_size=CHUNK_SIZE,
+            )
+            suppliers = Supplier.objects.bulk_create(
+                (
+                    Supplier(
+                        SupplierName=f"Supplier {i}",
+                        ContactDetails=f"supplier{i}@example.com",
+                        Location=f"City {i % 50}",
+                        ContractTerms=f"Net {rng.choice([15, 30, 60])}",
+                    )
+                    for i in range(counts["suppliers"])
+                ),
+                batch_size=CHUNK_SIZE,
+            )
+            stores = Store.objects.bulk_create(
+                Store(
+                    StoreName=f"Store {i}",
+                    Location=f"City {i % 50}",
+                    ContactNumber=f"0{rng.randint(1_000_000_000, 9_999_999_999)}",
+                    TotalSales=0,
+                    OperatingHours=rng.choice([8, 10, 12, 24]),
+                )
+                for i in range(counts["stores"])
+            )
+            # bulk_create skips Product.save, so StockLevel is rebuilt once the locations exist
+            products = Product.objects.bulk_create(
+                (
+                    Product(
+                        ProductName=f"Product {i}",
+                        Category=rng.choice(CATEGORIES),
+                        Price=Decimal(rng.randint(50, 50_000)) / 100,
+                        ReorderQuantity=rng.randint(10, 200),
+                        SupplierID=rng.choice(suppliers),
+                    )
+                    for i in range(counts["products"])
+                ),
+                batch_size=CHUNK_SIZE,
+            )
+            self.stdout.write(f"Created {len(stores)} stores, {len(products)} products, {len(staff)} staff.")
+
+            # Popular products are stocked in more stores
+            storeIds = [store.StoreId for store in stores]
+            locations = []
+            for rank, product in enumerate(products, start=1):
+                stocked = rng.sample(storeIds, max(1, int(len(storeIds) / rank ** 0.5)))
+                locations.extend(
+                    ProductLocation(ProductID=product, StoreId_id=storeId, Quantity=rng.randint(0, 500))
+                    for storeId in stocked
+                )
+            ProductLocation.objects.bulk_create(locations, batch_size=CHUNK_SIZE)
+            Product.RebuildStockLevels()
+            StockMovement.SeedFromLocations()  # bulk_create bypasses the ledger; open it at these quantities
+            self.stdout.write(f"Created {len(locations)} stock locations.")
+
+            orders = []
+            for _ in range(counts["orders"]):
+                product = rng.choice(products)
+                orderDate = today - timedelta(days=rng.randint(0, options["days"]))
+                status = rng.choice(ORDER_STATUSES)
+                leadTime = max(1, int(rng.gammavariate(2, 3)))  # Mostly a few days, occasionally weeks
+                deliveryDate = orderDate + timedelta(days=leadTime)
+                orders.append(PurchaseOrder(
+                    ProductID=product,
+                    TotalAmount=product.Price * rng.randint(10, 200),
+                    OrderDate=orderDate,
+                    DeliveryDate=deliveryDate if status == "Delivered" and deliveryDate <= today else None,
+                    OrderStatus=status if status != "Delivered" or deliveryDate <= today else "Shipped",
+                ))
+            PurchaseOrder.objects.bulk_create(orders, batch_size=CHUNK_SIZE)
+            self.stdout.write(f"Created {len(orders)} purchase orders.")
+
+            self.CreateSales(rng, counts["sales"], stores, products, staff, options["days"], today)
+
+            # bulk_create sends no signals, so derived data is rebuilt in bulk
+            SalesDailyRollup.Rebuild()
+            InvalidateReports()
+
+        self.stdout.write(self.style.SUCCESS("Synthetic dataset generated."))
+
+    def CreateSales(self, rng, total, stores, products, staff, days, today):
+        # Insert sales in chunks with Zipf-skewed stores and products and busier weekends
+        storeWeights = ZipfWeights(len(stores))
+        productWeights = ZipfWeights(len(products))
+        staffByStore = {store.StoreId: rng.sample(staff, min(len(staff), 10)) for store in stores}
+        dayWeights = list(accumulate(
+            1.5 if (today - timedelta(days=offset)).weekday() >= 5 else 1.0 for offset in range(days)
+        ))
+
+        created = 0
+        while created < total:
+            size = min(CHUNK_SIZE, total - created)
+            chosenStores = rng.choices(stores, cum_weights=storeWeights, k=size)
+            chosenProducts = rng.choices(products, cum_weights=productWeights, k=size)
+            offsets = rng.choices(range(days), cum_weights=dayWeights, k=size)
+
+            Sales.objects.bulk_create(
+                Sales(
+                    PaymentMethod=rng.choice(PAYMENT_METHODS),
+                    TotalAmount=product.Price * rng.randint(1, 5),
+                    StoreID=store,
+                    ProductID=product,
+                    EmployeeID=rng.choice(staffByStore[store.StoreId]),
+                    SaleDate=today - timedelta(days=offset),
+                )
+                for store, product, offset in zip(chosenStores, chosenProducts, offsets)
+            )
+            created += size
+            self.stdout.write(f"Created {created}/{total} sales.")
@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from app.instrumentation import GetConfig, LoadRecords, SummariseRecords
+
+
+class Command(BaseCommand):
+    help = "Summarise per-view latency and query counts recorded by QueryInstrumentationMiddleware."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--spool-dir", help="Spool directory (defaults to QUERY_INSTRUMENTATION['SPOOL_DIR']).")
+        parser.add_argument("--view", help="Only show this view name.")
+        parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+
+    def handle(self, *args, **options):
+        records = LoadRecords(options["spool_dir"] or GetConfig()["SPOOL_DIR"])
+        if options["view"]:
+            records = [record for record in records if record["view"] == options["view"]]
+
+        summary = SummariseRecords(records)
+        if options["json"]:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+
+        if not summary:
+            self.stdout.write("No instrumentation records found.")
+            return
+
+        self.stdout.write(f"{'view':40} {'reqs':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'q p50':>6} {'q p95':>6} {'db ms':>8}")
+        for row in summary:
+            self.stdout.write(
+                f"{row['view'][:40]:40} {row['requests']:>6} {row['wall_ms_p50']:>9.1f} {row['wall_ms_p95']:>9.1f} "
+                f"{row['wall_ms_p99']:>9.1f} {row['queries_p50']:>6} {row['queries_p95']:>6} {row['db_ms_mean']:>8.1f}"
+            )
+            for duplicate in row["duplicates"]:
+                self.stdout.write(self.style.WARNING(f"    repeated x{duplicate['count']}: {duplicate['sql'][:100]}"))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Inventory.models import ProductLocation, StockMovement
+
+
+class Command(BaseCommand):
+    help = "Rebuild ProductLocation quantities and product totals from the stock movement ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report locations whose quantity differs from the ledger, without rewriting them.",
+        )
+        parser.add_argument(
+            "--seed",
+            action="store_true",
+            help="Record opening-balance adjustments so the ledger matches the current quantities instead.",
+        )
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            with transaction.atomic():
+                recorded = StockMovement.SeedFromLocations()
+            self.stdout.write(self.style.SUCCESS(f"Recorded {recorded} opening-balance movement(s)."))
+            return
+
+        if options["verify"]:
+            ledger = StockMovement.GetStockAt()
+            current = {
+                (productId, storeId): quantity
+                for productId, storeId, quantity in ProductLocation.objects.values_list("ProductID", "StoreId", "Quantity")
+            }
+            drift = sorted(key for key in ledger.keys() | current.keys() if ledger.get(key, 0) != current.get(key, 0))
+            for productId, storeId in drift:
+                self.stdout.write(
+                    f"Product {productId} at store {storeId}: quantity {current.get((productId, storeId), 0)}, "
+                    f"ledger {ledger.get((productId, storeId), 0)}"
+                )
+            if drift:
+                self.stdout.write(self.style.WARNING(f"{len(drift)} location(s) out of sync with the ledger."))
+            else:
+                self.stdout.write(self.style.SUCCESS("All stock locations match the ledger."))
+            return
+
+        corrected = ProductLocation.RebuildFromLedger()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stock locations from the ledger, {corrected} corrected."))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Inventory.models import Product
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialised Product.StockLevel totals from ProductLocation quantities."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report products whose StockLevel has drifted, without rewriting it.",
+        )
+
+    def handle(self, *args, **options):
+        drift = Product.GetStockLevelDrift()
+
+        for productId, stored, actual in drift:
+            self.stdout.write(f"Product {productId}: StockLevel {stored}, locations total {actual}")
+
+        if options["verify"]:
+            if drift:
+                self.stdout.write(self.style.WARNING(f"{len(drift)} product(s) out of sync."))
+            else:
+                self.stdout.write(self.style.SUCCESS("All stock levels are in sync."))
+            return
+
+        with transaction.atomic():
+            updated = Product.RebuildStockLevels()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stock levels for {updated} product(s), {len(drift)} corrected."))
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from Inventory.models import StockSnapshot
+
+
+class Command(BaseCommand):
+    help = "Compact the stock movement ledger into a new snapshot batch for point-in-time stock queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prune-days",
+            type=int,
+            help="Also delete snapshot batches older than this many days, keeping the newest one before the cutoff.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            takenAt, written = StockSnapshot.TakeSnapshot()
+        if takenAt is None:
+            self.stdout.write(self.style.WARNING("A snapshot at or after this time already exists; nothing written."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Snapshot at {takenAt.isoformat()}: {written} stock location(s)."))
+
+        if options["prune_days"] is not None:
+            deleted = StockSnapshot.PruneBefore(timezone.now() - timedelta(days=options["prune_days"]))
+            self.stdout.write(f"Pruned {deleted} old snapshot row(s).")
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:30
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def RebuildStockLevels(apps, schema_editor):
+    # Seed the materialised totals from the existing ProductLocation rows
+    Product = apps.get_model("Inventory", "Product")
+    ProductLocation = apps.get_model("Inventory", "ProductLocation")
+    totals = (
+        ProductLocation.objects.filter(ProductID=OuterRef("ProductID"))
+        .values("ProductID")
+        .annotate(Total=Sum("Quantity"))
+        .values("Total")
+    )
+    Product.objects.update(StockLevel=Coalesce(Subquery(totals), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Inventory', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='StockLevel',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(RebuildStockLevels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Inventory', '0003_materialised_stock_level'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='productlocation',
+            constraint=models.UniqueConstraint(fields=('ProductID', 'StoreId'), name='productlocation_product_store_unique'),
+        ),
+    ]
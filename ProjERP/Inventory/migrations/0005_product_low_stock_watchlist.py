@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:42
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Inventory', '0004_productlocation_productlocation_product_store_unique'),
+        ('Procurement', '0003_order_date_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='Shortfall',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('ReorderQuantity'), '-', models.F('StockLevel')), output_field=models.IntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('Shortfall__gt', 0)), fields=['-Shortfall', 'ProductID'], name='product_low_stock_idx'),
+        ),
+    ]
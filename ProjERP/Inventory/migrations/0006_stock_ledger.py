@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def SeedStockLedger(apps, schema_editor):
+    # Open the ledger with one adjustment per existing stock location, so rebuilding from it keeps them
+    ProductLocation = apps.get_model("Inventory", "ProductLocation")
+    StockMovement = apps.get_model("Inventory", "StockMovement")
+    now = timezone.now()
+    StockMovement.objects.bulk_create(
+        (
+            StockMovement(
+                ProductID_id=productId, StoreId_id=storeId, Kind="Adjustment", Quantity=quantity,
+                OccurredAt=now, Reference="Opening balance",
+            )
+            for productId, storeId, quantity in ProductLocation.objects.exclude(Quantity=0)
+            .values_list("ProductID", "StoreId", "Quantity").iterator()
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Inventory', '0005_product_low_stock_watchlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('MovementID', models.BigAutoField(primary_key=True, serialize=False)),
+                ('Kind', models.CharField(choices=[('Sale', 'Sale'), ('Transfer', 'Transfer'), ('Receipt', 'Receipt'), ('Adjustment', 'Adjustment')], max_length=20)),
+                ('Quantity', models.IntegerField()),
+                ('OccurredAt', models.DateTimeField(default=django.utils.timezone.now)),
+                ('Reference', models.CharField(blank=True, max_length=100)),
+                ('ProductID', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='Inventory.product')),
+                ('StoreId', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='Inventory.store')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['OccurredAt'], name='stockmovement_time_idx'), models.Index(fields=['StoreId', 'OccurredAt'], name='stockmovement_store_time_idx'), models.Index(fields=['ProductID', 'OccurredAt'], name='stockmovement_product_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('SnapshotID', models.BigAutoField(primary_key=True, serialize=False)),
+                ('TakenAt', models.DateTimeField()),
+                ('Quantity', models.IntegerField()),
+                ('ProductID', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='Inventory.product')),
+                ('StoreId', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='Inventory.store')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('TakenAt', 'StoreId', 'ProductID'), name='stocksnapshot_batch_unique')],
+            },
+        ),
+        migrations.RunPython(SeedStockLedger, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,21 @@
 # Imports for managing inventory, store locations and validation operations
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
-from django.db.models import Sum, Avg
-from datetime import datetime, timedelta
+from django.db.models import Sum, Avg, Max, F, Q, Case, When, Value, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from datetime import date, datetime, time, timedelta
+
+STOCK_UPDATE_BATCH_SIZE = 500  # Rows per CASE-based bulk UPDATE
+LOW_STOCK_DEFAULT_LIMIT = 100  # Watchlist rows returned when no limit is given
+LEDGER_BATCH_SIZE = 2000  # Stock movement and snapshot rows per bulk INSERT
+SNAPSHOT_SETTLE_SECONDS = 300  # Snapshots stop this far in the past so in-flight movements are not missed
+SALE, TRANSFER, RECEIPT, ADJUSTMENT = "Sale", "Transfer", "Receipt", "Adjustment"  # Stock movement kinds
+
+
+def GetPk(value):
+   # Accept either a model instance or a raw primary key
+   return value.pk if isinstance(value, models.Model) else value
 
 class Product(models.Model):
    # Primary product identifiers and inventory tracking fields
@@ -10,7 +23,7 @@ class Product(models.Model):
    ProductName = models.CharField(max_length=200)
    Category = models.CharField(max_length=100)
    Price = models.DecimalField(max_digits=10, decimal_places=2)
-   StockLevel = models.IntegerField()
+   StockLevel = models.IntegerField(default=0, editable=False)  # Materialised total of ProductLocation quantities
    ReorderQuantity = models.IntegerField()
    LastPurchaseDate = models.DateField(null=True, blank=True)
    SupplierID = models.ForeignKey(
@@ -19,48 +32,154 @@ class Product(models.Model):
        related_name="products",  # Links products back to supplier
        on_delete=models.SET_NULL,
    )
+   # Units below the reorder threshold, computed by the database on every write to StockLevel or
+   # ReorderQuantity; a positive value puts the product on the low-stock watchlist
+   Shortfall = models.GeneratedField(
+       expression=F("ReorderQuantity") - F("StockLevel"),
+       output_field=models.IntegerField(),
+       db_persist=True,
+   )
+
+   class Meta:
+       indexes = [
+           # Partial index holding only the watchlist, already in shortfall order
+           models.Index(
+               fields=["-Shortfall", "ProductID"], condition=Q(Shortfall__gt=0), name="product_low_stock_idx"
+           ),
+       ]
 
    def __str__(self):
        # Display product info with stock levels
        return f"{self.ProductName} - Level:{self.StockLevel} Order at:{self.ReorderQuantity}"
 
+   def save(self, *args, **kwargs):
+       # StockLevel is owned by ProductLocation changes, so never write back a stale in-memory copy
+       if self._state.adding:
+           self.StockLevel = 0  # A new product has no stock locations yet
+       elif kwargs.get("update_fields") is None:
+           kwargs["update_fields"] = [
+               field.name for field in self._meta.concrete_fields
+               if not field.primary_key and not field.generated and field.name != "StockLevel"
+           ]
+       super().save(*args, **kwargs)
+
    def GetAllStores(self):
        # Get store locations stocking this product
        return self.stocklocation_set.values("StoreId__StoreName", "StoreId__Location")
 
    def GetStockLevel(self):
-       # Calculate total stock across all store locations
-       return self.stocklocation_set.aggregate(TotalStock=Sum("Quantity"))["TotalStock"] or 0
+       # Read the materialised total stock across all store locations
+       self.refresh_from_db(fields=["StockLevel"])
+       return self.StockLevel
+
+   @classmethod
+   def AdjustStockLevels(cls, deltas):
+       # Apply {productId: delta} changes to the materialised StockLevel totals as F-expression updates
+       deltas = [(productId, delta) for productId, delta in deltas.items() if delta]
+       for start in range(0, len(deltas), STOCK_UPDATE_BATCH_SIZE):
+           batch = deltas[start:start + STOCK_UPDATE_BATCH_SIZE]
+           if len(batch) == 1:
+               productId, delta = batch[0]
+               cls.objects.filter(ProductID=productId).update(StockLevel=F("StockLevel") + delta)
+           else:
+               # One UPDATE for the whole batch, with each row's delta chosen by a CASE
+               cls.objects.filter(ProductID__in=[productId for productId, _ in batch]).update(
+                   StockLevel=F("StockLevel") + Case(
+                       *[When(ProductID=productId, then=Value(delta)) for productId, delta in batch],
+                       output_field=models.IntegerField(),
+                   )
+               )
+
+   @classmethod
+   def GetLowStockProducts(cls, limit=LOW_STOCK_DEFAULT_LIMIT):
+       # Products below their reorder threshold, largest shortfall first, read from the partial index
+       watchlist = (
+           cls.objects.filter(Shortfall__gt=0)
+           .values("ProductID", "ProductName", "StockLevel", "ReorderQuantity", "Shortfall", "SupplierID")
+           .order_by("-Shortfall", "ProductID")
+       )
+       return list(watchlist[:limit] if limit is not None else watchlist)
+
+   @classmethod
+   def GetLocationTotals(cls):
+       # Correlated SUM(Quantity) over ProductLocation, the source of truth for StockLevel
+       totals = (
+           ProductLocation.objects.filter(ProductID=OuterRef("ProductID"))
+           .values("ProductID")
+           .annotate(Total=Sum("Quantity"))
+           .values("Total")
+       )
+       return Coalesce(Subquery(totals), Value(0))
+
+   @classmethod
+   def GetStockLevelDrift(cls):
+       # List (productId, StockLevel, actual total) for products whose materialised total has drifted
+       return list(
+           cls.objects.annotate(ActualStock=cls.GetLocationTotals())
+           .exclude(StockLevel=F("ActualStock"))
+           .values_list("ProductID", "StockLevel", "ActualStock")
+           .order_by("ProductID")
+       )
+
+   @classmethod
+   def RebuildStockLevels(cls):
+       # Recompute every StockLevel from ProductLocation in a single UPDATE
+       return cls.objects.update(StockLevel=cls.GetLocationTotals())
 
    def TransferStock(self, from_store, to_store, quantity):
        # Handle inter-store stock transfers with validation
        if quantity <= 0:
            raise ValueError("Quantity must be greater than zero.")
+       if GetPk(from_store) == GetPk(to_store):
+           raise ValueError("Source and destination stores must differ.")
+
+       # Both legs run as F-expression UPDATEs in one transaction, so concurrent transfers cannot lose updates
+       with transaction.atomic():
+           # Conditional UPDATE: only succeeds while the source still holds enough stock
+           taken = self.stocklocation.filter(StoreId=from_store, Quantity__gte=quantity).update(
+               Quantity=F("Quantity") - quantity
+           )
+           if not taken:
+               raise ValidationError("Insufficient stock in the source store.")
 
-       # Check source and destination stock levels
-       from_stock = self.stocklocation.filter(StoreId=from_store).first()
-       to_stock = self.stocklocation.filter(StoreId=to_store).first()
+           added = self.stocklocation.filter(StoreId=to_store).update(Quantity=F("Quantity") + quantity)
+           if not added:
+               # Create new stock location if product not stocked at destination. bulk_create skips the
+               # stock-total signal, which is correct here: a transfer leaves the product total unchanged.
+               ProductLocation.objects.bulk_create(
+                   [ProductLocation(ProductID=self, StoreId_id=GetPk(to_store), Quantity=quantity)]
+               )
 
-       if not from_stock or from_stock.Quantity < quantity:
-           raise ValidationError("Insufficient stock in the source store.")
+           StockMovement.RecordDeltas(
+               {(self.ProductID, GetPk(from_store)): -quantity, (self.ProductID, GetPk(to_store)): quantity},
+               TRANSFER,
+           )
 
-       # Update stock levels for both locations
-       from_stock.Quantity -= quantity
-       from_stock.save()
+   @classmethod
+   def TransferStockBatch(cls, transfers):
+       # ------------------- 
+       # Moves stock for many (product, from_store, to_store, quantity) tuples in one transaction.
+       # Products and stores may be given as instances or primary keys. Stock is checked against the
+       # net change per location, and either every transfer is applied or none is.
+       # ------------------- 
+       deltas = {}
+       for product, from_store, to_store, quantity in transfers:
+           if quantity <= 0:
+               raise ValueError("Quantity must be greater than zero.")
+           productId, fromId, toId = GetPk(product), GetPk(from_store), GetPk(to_store)
+           if fromId == toId:
+               raise ValueError("Source and destination stores must differ.")
+           deltas[(productId, fromId)] = deltas.get((productId, fromId), 0) - quantity
+           deltas[(productId, toId)] = deltas.get((productId, toId), 0) + quantity
 
-       if to_stock:
-           to_stock.Quantity += quantity
-       else:
-           # Create new stock location if product not stocked at destination
-           ProductLocation.objects.create(ProductID=self, StoreId=to_store, Quantity=quantity)
-       to_stock.save()
+       ProductLocation.ApplyStockDeltas(deltas, kind=TRANSFER)
 
    def EditReorderLevel(self, new_reorder_level):
        # Update product reorder threshold with validation
        if new_reorder_level < 0:
            raise ValueError("Reorder level must be a non-negative integer.")
        self.ReorderQuantity = new_reorder_level
-       self.save()
+       self.save(update_fields=["ReorderQuantity"])
 
 class Store(models.Model):
    # Primary store identifiers and operational details
@@ -134,12 +253,268 @@ class ProductLocation(models.Model):
    Quantity = models.IntegerField()
    Date = models.DateTimeField(auto_now_add=True)
 
+   class Meta:
+       constraints = [
+           # One stock row per product and store; also serves (ProductID, StoreId) lookups
+           models.UniqueConstraint(fields=["ProductID", "StoreId"], name="productlocation_product_store_unique"),
+       ]
+
    def __str__(self):
        return f"{self.ProductID.ProductName} - {self.StoreId.StoreName} - Amount: {self.Quantity}"
 
+   @classmethod
+   def from_db(cls, db, field_names, values):
+       # Remember the stored product, store and quantity so saves can apply the change as a delta
+       instance = super().from_db(db, field_names, values)
+       instance._stored_stock = tuple(instance.__dict__.get(name) for name in ("ProductID_id", "StoreId_id", "Quantity"))
+       return instance
+
    def AdjustStock(self, quantity):
-       # Update stock levels with understock prevention 
-       if self.Quantity + quantity < 0:
-           raise ValidationError("Insufficient stock for the operation.")
+       # Update stock levels with understock prevention, as a conditional F-expression UPDATE
+       with transaction.atomic():
+           updated = ProductLocation.objects.filter(
+               ProductLocationID=self.ProductLocationID, Quantity__gte=-quantity
+           ).update(Quantity=F("Quantity") + quantity)
+           if not updated:
+               raise ValidationError("Insufficient stock for the operation.")
+           Product.AdjustStockLevels({self.ProductID_id: quantity})
+           StockMovement.RecordDeltas({(self.ProductID_id, self.StoreId_id): quantity}, ADJUSTMENT)
+
        self.Quantity += quantity
-       self.save()
\ No newline at end of file
+       self._stored_stock = (self.ProductID_id, self.StoreId_id, self.Quantity)
+
+   @classmethod
+   def ApplyStockDeltas(cls, deltas, allow_negative=False, kind=ADJUSTMENT, reference=""):
+       # ------------------- 
+       # Applies {(productId, storeId): delta} stock changes in one transaction.
+       # Existing rows are locked, checked and updated with CASE-based F-expression UPDATEs, missing rows
+       # are bulk-created, the product totals are adjusted to match and the changes are appended to the
+       # stock ledger as movements of the given kind (None skips the ledger, for rebuilding from it).
+       # Raises ValidationError if any location would go below zero, unless allow_negative is set.
+       # Returns the (productId, storeId) keys that ended up below zero.
+       # ------------------- 
+       deltas = {key: delta for key, delta in deltas.items() if delta}
+       if not deltas:
+           return []
+
+       with transaction.atomic():
+           # Lock candidate rows in primary-key order so concurrent batches cannot deadlock
+           locked = (
+               cls.objects.select_for_update()
+               .filter(ProductID__in={key[0] for key in deltas}, StoreId__in={key[1] for key in deltas})
+               .order_by("ProductLocationID")
+               .values_list("ProductLocationID", "ProductID", "StoreId", "Quantity")
+           )
+           existing = {(productId, storeId): (locationId, quantity) for locationId, productId, storeId, quantity in locked}
+
+           shortfalls = [key for key, delta in deltas.items() if existing.get(key, (None, 0))[1] + delta < 0]
+           if shortfalls and not allow_negative:
+               raise ValidationError(f"Insufficient stock for {len(shortfalls)} product location(s).")
+
+           updates = [(existing[key][0], delta) for key, delta in deltas.items() if key in existing]
+           for start in range(0, len(updates), STOCK_UPDATE_BATCH_SIZE):
+               batch = updates[start:start + STOCK_UPDATE_BATCH_SIZE]
+               cls.objects.filter(ProductLocationID__in=[locationId for locationId, _ in batch]).update(
+                   Quantity=F("Quantity") + Case(
+                       *[When(ProductLocationID=locationId, then=Value(delta)) for locationId, delta in batch],
+                       output_field=models.IntegerField(),
+                   )
+               )
+
+           # bulk_create skips the stock-total signal; totals are adjusted explicitly below
+           cls.objects.bulk_create(
+               [
+                   cls(ProductID_id=productId, StoreId_id=storeId, Quantity=delta)
+                   for (productId, storeId), delta in deltas.items()
+                   if (productId, storeId) not in existing
+               ],
+               batch_size=STOCK_UPDATE_BATCH_SIZE,
+           )
+
+           productDeltas = {}
+           for (productId, _), delta in deltas.items():
+               productDeltas[productId] = productDeltas.get(productId, 0) + delta
+           Product.AdjustStockLevels(productDeltas)
+
+           if kind is not None:
+               StockMovement.RecordDeltas(deltas, kind, reference)
+
+       return shortfalls
+
+   @classmethod
+   def RebuildFromLedger(cls):
+       # -------------------
+       # Makes ProductLocation the projection of the stock ledger again: every location is set to its
+       # latest snapshot plus later movements, locations missing from the ledger drop to zero, and the
+       # product totals are recomputed. Returns the number of locations corrected.
+       # -------------------
+       with transaction.atomic():
+           ledger = StockMovement.GetStockAt()
+           current = {
+               (productId, storeId): quantity
+               for productId, storeId, quantity in cls.objects.values_list("ProductID", "StoreId", "Quantity")
+           }
+           deltas = {
+               key: ledger.get(key, 0) - current.get(key, 0)
+               for key in ledger.keys() | current.keys()
+           }
+           deltas = {key: delta for key, delta in deltas.items() if delta}
+           cls.ApplyStockDeltas(deltas, allow_negative=True, kind=None)
+           Product.RebuildStockLevels()
+       return len(deltas)
+
+
+def ToLedgerMoment(when):
+   # Point-in-time bound for ledger queries: a date means the close of that day, None means now
+   if when is None:
+       return timezone.now()
+   if isinstance(when, datetime):
+       return when if timezone.is_aware(when) else timezone.make_aware(when)
+   if isinstance(when, date):
+       return timezone.make_aware(datetime.combine(when + timedelta(days=1), time.min))
+   raise ValueError(f"Expected a date or datetime, got {when!r}")
+
+
+class StockMovement(models.Model):
+   # -------------------
+   # Append-only ledger of every stock change; ProductLocation holds its running totals per location.
+   # Quantity is signed (negative for stock leaving the location). Rows are only ever inserted in bulk by
+   # RecordDeltas, never updated, so audits read the ledger without touching ProductLocation locks.
+   # -------------------
+   KIND_CHOICES = [(kind, kind) for kind in (SALE, TRANSFER, RECEIPT, ADJUSTMENT)]
+
+   MovementID = models.BigAutoField(primary_key=True)
+   # The composite indexes below lead with these columns, so the single-column FK indexes are left out
+   ProductID = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="movements", db_index=False)
+   StoreId = models.ForeignKey(Store, on_delete=models.CASCADE, related_name="movements", db_index=False)
+   Kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+   Quantity = models.IntegerField()
+   OccurredAt = models.DateTimeField(default=timezone.now)
+   Reference = models.CharField(max_length=100, blank=True)  # e.g. the purchase order received
+
+   class Meta:
+       indexes = [
+           # Delta scans since the last snapshot: company-wide, per store and per product
+           models.Index(fields=["OccurredAt"], name="stockmovement_time_idx"),
+           models.Index(fields=["StoreId", "OccurredAt"], name="stockmovement_store_time_idx"),
+           models.Index(fields=["ProductID", "OccurredAt"], name="stockmovement_product_time_idx"),
+       ]
+
+   def __str__(self):
+       return f"{self.Kind} {self.Quantity:+} of product {self.ProductID_id} at store {self.StoreId_id}"
+
+   @classmethod
+   def Record(cls, movements, kind, occurredAt=None):
+       # Append (productId, storeId, quantity, reference) movements with a bulk INSERT, skipping zero quantities
+       occurredAt = occurredAt or timezone.now()
+       return cls.objects.bulk_create(
+           [
+               cls(ProductID_id=productId, StoreId_id=storeId, Kind=kind, Quantity=quantity,
+                   OccurredAt=occurredAt, Reference=reference)
+               for productId, storeId, quantity, reference in movements
+               if quantity
+           ],
+           batch_size=LEDGER_BATCH_SIZE,
+       )
+
+   @classmethod
+   def RecordDeltas(cls, deltas, kind, reference="", occurredAt=None):
+       # Append one movement per {(productId, storeId): delta} entry, all with the same reference
+       return cls.Record(
+           ((productId, storeId, delta, reference) for (productId, storeId), delta in deltas.items()), kind, occurredAt
+       )
+
+   @classmethod
+   def GetStockAt(cls, when=None, store=None, product=None):
+       # -------------------
+       # Stock per (productId, storeId) as it stood at `when` (a datetime, a date meaning the close of that
+       # day, or None for now), optionally for one store and/or product. Reads the latest snapshot taken
+       # at or before `when` and adds only the movements since it, so the scan is bounded by the snapshot
+       # interval. Locations at zero are left out.
+       # -------------------
+       moment = ToLedgerMoment(when)
+       takenAt = StockSnapshot.objects.filter(TakenAt__lte=moment).aggregate(Latest=Max("TakenAt"))["Latest"]
+
+       filters = {}
+       if store is not None:
+           filters["StoreId"] = GetPk(store)
+       if product is not None:
+           filters["ProductID"] = GetPk(product)
+
+       stock = {}
+       if takenAt is not None:
+           snapshot = StockSnapshot.objects.filter(TakenAt=takenAt, **filters)
+           for productId, storeId, quantity in snapshot.values_list("ProductID", "StoreId", "Quantity"):
+               stock[(productId, storeId)] = quantity
+
+       movements = cls.objects.filter(OccurredAt__lt=moment, **filters)
+       if takenAt is not None:
+           movements = movements.filter(OccurredAt__gte=takenAt)
+       grouped = movements.values_list("ProductID", "StoreId").annotate(Delta=Sum("Quantity")).order_by()
+       for productId, storeId, delta in grouped:
+           stock[(productId, storeId)] = stock.get((productId, storeId), 0) + delta
+
+       return {key: quantity for key, quantity in stock.items() if quantity}
+
+   @classmethod
+   def SeedFromLocations(cls, reference="Opening balance"):
+       # Record adjustments so the ledger matches ProductLocation, e.g. after loading stock with bulk_create
+       ledger = cls.GetStockAt()
+       current = {
+           (productId, storeId): quantity
+           for productId, storeId, quantity in ProductLocation.objects.values_list("ProductID", "StoreId", "Quantity")
+       }
+       deltas = {key: current.get(key, 0) - ledger.get(key, 0) for key in ledger.keys() | current.keys()}
+       return len(cls.RecordDeltas(deltas, ADJUSTMENT, reference))
+
+
+class StockSnapshot(models.Model):
+   # -------------------
+   # Compacted ledger: the stock of every non-empty location from all movements before TakenAt.
+   # Each TakeSnapshot() call writes one batch sharing a TakenAt; point-in-time queries start from the
+   # latest batch and scan only the movements after it.
+   # -------------------
+   SnapshotID = models.BigAutoField(primary_key=True)
+   ProductID = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="snapshots", db_index=False)
+   StoreId = models.ForeignKey(Store, on_delete=models.CASCADE, related_name="snapshots", db_index=False)
+   TakenAt = models.DateTimeField()
+   Quantity = models.IntegerField()
+
+   class Meta:
+       constraints = [
+           # Leads with TakenAt: finds the latest batch and reads it by store or product
+           models.UniqueConstraint(fields=["TakenAt", "StoreId", "ProductID"], name="stocksnapshot_batch_unique"),
+       ]
+
+   def __str__(self):
+       return f"Product {self.ProductID_id} at store {self.StoreId_id}: {self.Quantity} as of {self.TakenAt}"
+
+   @classmethod
+   def TakeSnapshot(cls, takenAt=None):
+       # -------------------
+       # Fold the ledger up to takenAt (default: SNAPSHOT_SETTLE_SECONDS ago, so movements still being
+       # committed are not skipped) into a new snapshot batch. Returns (takenAt, rows written), or
+       # (None, 0) when a snapshot already exists at or after takenAt.
+       # -------------------
+       takenAt = takenAt or timezone.now() - timedelta(seconds=SNAPSHOT_SETTLE_SECONDS)
+       if cls.objects.filter(TakenAt__gte=takenAt).exists():
+           return None, 0
+
+       stock = StockMovement.GetStockAt(takenAt)
+       rows = cls.objects.bulk_create(
+           [
+               cls(ProductID_id=productId, StoreId_id=storeId, TakenAt=takenAt, Quantity=quantity)
+               for (productId, storeId), quantity in sorted(stock.items())
+           ],
+           batch_size=LEDGER_BATCH_SIZE,
+       )
+       return takenAt, len(rows)
+
+   @classmethod
+   def PruneBefore(cls, cutoff):
+       # Delete snapshot batches older than cutoff, always keeping the latest batch taken before it
+       keep = cls.objects.filter(TakenAt__lt=cutoff).aggregate(Latest=Max("TakenAt"))["Latest"]
+       if keep is None:
+           return 0
+       deleted, _ = cls.objects.filter(TakenAt__lt=keep).delete()
+       return deleted
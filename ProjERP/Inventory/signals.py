@@ -0,0 +1,39 @@
+# Signal handlers keeping Product.StockLevel and the stock ledger in step with ProductLocation rows
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ADJUSTMENT, Product, ProductLocation, StockMovement
+
+
+@receiver(post_save, sender=ProductLocation)
+def ApplyLocationSave(sender, instance, created, raw=False, **kwargs):
+    # Apply the difference between the stored and saved row to the product totals
+    if raw:  # Fixture loading, totals are rebuilt separately
+        return
+
+    storedProduct, storedStore, storedQuantity = getattr(instance, "_stored_stock", (None, None, None))
+    deltas = {}
+    if not created and storedProduct is not None:
+        deltas[storedProduct] = -(storedQuantity or 0)
+    deltas[instance.ProductID_id] = deltas.get(instance.ProductID_id, 0) + instance.Quantity
+
+    Product.AdjustStockLevels(deltas)
+
+    # Direct edits (admin, fixtures in code) are ledger adjustments like any other stock change
+    locationDeltas = {(instance.ProductID_id, instance.StoreId_id): instance.Quantity}
+    if not created and storedProduct is not None:
+        storedKey = (storedProduct, storedStore)
+        locationDeltas[storedKey] = locationDeltas.get(storedKey, 0) - (storedQuantity or 0)
+    StockMovement.RecordDeltas(locationDeltas, ADJUSTMENT)
+    instance._stored_stock = (instance.ProductID_id, instance.StoreId_id, instance.Quantity)
+
+
+@receiver(post_delete, sender=ProductLocation)
+def ApplyLocationDelete(sender, instance, origin=None, **kwargs):
+    # Remove a deleted row's quantity from its product total (also runs for cascades)
+    Product.AdjustStockLevels({instance.ProductID_id: -instance.Quantity})
+    if isinstance(origin, ProductLocation) or (isinstance(origin, QuerySet) and origin.model is ProductLocation):
+        # Only locations deleted directly leave stock history behind; a cascade from the product or
+        # store removes that history too
+        StockMovement.RecordDeltas({(instance.ProductID_id, instance.StoreId_id): -instance.Quantity}, ADJUSTMENT)
@@ -1,3 +1,224 @@
+from datetime import date, datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import Product, ProductLocation, StockMovement, StockSnapshot, Store
+
+
+class StockLevelTests(TestCase):
+    # Product.StockLevel must always equal the sum of the product's location quantities
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.central, cls.north = [
+            Store.objects.create(StoreName=name, Location="Town", ContactNumber="123", TotalSales=0, OperatingHours=8)
+            for name in ("Central", "North")
+        ]
+        cls.pen, cls.ink = [
+            Product.objects.create(ProductName=name, Category="Office", Price=Decimal("1.00"), ReorderQuantity=5)
+            for name in ("Pen", "Ink")
+        ]
+
+    def Levels(self):
+        return dict(Product.objects.values_list("ProductName", "StockLevel"))
+
+    def test_location_create_update_delete(self):
+        location = ProductLocation.objects.create(ProductID=self.pen, StoreId=self.central, Quantity=10)
+        ProductLocation.objects.create(ProductID=self.pen, StoreId=self.north, Quantity=4)
+        self.assertEqual(self.Levels(), {"Pen": 14, "Ink": 0})
+
+        location = ProductLocation.objects.get(pk=location.pk)
+        location.Quantity = 7
+        location.save()
+        self.assertEqual(self.Levels(), {"Pen": 11, "Ink": 0})
+
+        location.ProductID = self.ink  # Moving the row moves its quantity between products
+        location.save()
+        self.assertEqual(self.Levels(), {"Pen": 4, "Ink": 7})
+
+        location.delete()
+        self.assertEqual(self.Levels(), {"Pen": 4, "Ink": 0})
+        ProductLocation.objects.all().delete()  # Queryset deletes go through the same handler
+        self.assertEqual(self.Levels(), {"Pen": 0, "Ink": 0})
+
+    def test_adjust_stock(self):
+        location = ProductLocation.objects.create(ProductID=self.pen, StoreId=self.central, Quantity=5)
+        location.AdjustStock(-3)
+        location.AdjustStock(2)
+        with self.assertRaises(ValidationError):
+            location.AdjustStock(-10)
+        self.assertEqual((ProductLocation.objects.get().Quantity, self.Levels()["Pen"]), (4, 4))
+        ProductLocation.ApplyStockDeltas({(self.pen.pk, self.north.pk): 6, (self.ink.pk, self.north.pk): 1})
+        self.assertEqual(self.Levels(), {"Pen": 10, "Ink": 1})
+
+    def test_deleting_store_or_product(self):
+        for product, quantities in ((self.pen, (3, 5)), (self.ink, (2, 9))):
+            for store, quantity in zip((self.central, self.north), quantities):
+                ProductLocation.objects.create(ProductID=product, StoreId=store, Quantity=quantity)
+        self.north.delete()
+        self.assertEqual(self.Levels(), {"Pen": 3, "Ink": 2})
+        self.pen.delete()
+        self.assertEqual(self.Levels(), {"Ink": 2})
+        self.assertEqual(Product.GetStockLevelDrift(), [])
+
+    def test_product_save_keeps_stock_level(self):
+        stale = Product.objects.get(pk=self.pen.pk)
+        ProductLocation.objects.create(ProductID=self.pen, StoreId=self.central, Quantity=8)
+        stale.Price = Decimal("2.00")
+        stale.save()  # Its StockLevel of 0 is out of date and must not be written back
+        self.assertEqual(self.Levels()["Pen"], 8)
+
+    def test_rebuild_command_verifies_and_repairs_drift(self):
+        ProductLocation.objects.create(ProductID=self.pen, StoreId=self.central, Quantity=8)
+        Product.objects.filter(pk=self.pen.pk).update(StockLevel=99)  # Drift that bypasses the signals
+
+        out = StringIO()
+        call_command("rebuildstocklevels", "--verify", stdout=out)
+        self.assertIn(f"Product {self.pen.pk}: StockLevel 99, locations total 8", out.getvalue())
+        self.assertIn("1 product(s) out of sync.", out.getvalue())
+        self.assertEqual(self.Levels()["Pen"], 99)  # --verify only reports
+
+        call_command("rebuildstocklevels", stdout=StringIO())
+        self.assertEqual(self.Levels(), {"Pen": 8, "Ink": 0})
+        out = StringIO()
+        call_command("rebuildstocklevels", "--verify", stdout=out)
+        self.assertIn("All stock levels are in sync.", out.getvalue())
+
+
+class StockTransferTests(TestCase):
+    # Transfers move stock between stores atomically and leave the product total unchanged
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stores = [
+            Store.objects.create(StoreName=name, Location="Town", ContactNumber="123", TotalSales=0, OperatingHours=8)
+            for name in ("Central", "North", "South")
+        ]
+        cls.product = Product.objects.create(
+            ProductName="Pen", Category="Office", Price=Decimal("1.50"), ReorderQuantity=10
+        )
+        ProductLocation.objects.create(ProductID=cls.product, StoreId=cls.stores[0], Quantity=10)
+        ProductLocation.objects.create(ProductID=cls.product, StoreId=cls.stores[1], Quantity=0)
+
+    def Stock(self):
+        # Quantity per store, then the materialised product total
+        quantities = dict(self.product.stocklocation.values_list("StoreId", "Quantity"))
+        return [quantities.get(store.pk) for store in self.stores], self.product.GetStockLevel()
+
+    def test_transfer_creates_destination_and_records_ledger(self):
+        central, _, south = self.stores
+        self.product.TransferStock(central, south.pk, 4)
+        self.assertEqual(self.Stock(), ([6, 0, 4], 10))
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(Kind="Transfer").values_list("StoreId", "Quantity")),
+            [(central.pk, -4), (south.pk, 4)],
+        )
+
+    def test_transfer_rejects_bad_requests(self):
+        central, north, _ = self.stores
+        with self.assertRaises(ValidationError):
+            self.product.TransferStock(central, north, 11)
+        with self.assertRaises(ValueError):
+            self.product.TransferStock(central, north, 0)
+        with self.assertRaises(ValueError):
+            self.product.TransferStock(central, central, 1)
+        self.assertEqual(self.Stock(), ([10, 0, None], 10))
+        self.assertFalse(StockMovement.objects.filter(Kind="Transfer").exists())
+
+    def test_batch_checks_the_net_change(self):
+        # North starts empty but ends positive, so routing through it is allowed
+        central, north, south = self.stores
+        Product.TransferStockBatch([(self.product, central, north, 8), (self.product.pk, north.pk, south.pk, 5)])
+        self.assertEqual(self.Stock(), ([2, 3, 5], 10))
+
+    def test_batch_is_all_or_nothing(self):
+        central, north, south = self.stores
+        with self.assertRaises(ValidationError):
+            Product.TransferStockBatch([(self.product, central, north, 5), (self.product, central, south, 6)])
+        self.assertEqual(self.Stock(), ([10, 0, None], 10))
+        self.assertFalse(StockMovement.objects.filter(Kind="Transfer").exists())
+
+
+class StockLedgerTests(TestCase):
+    # The ledger replays to any point in time, with or without snapshots, and ProductLocation follows it
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.central, cls.north = [
+            Store.objects.create(StoreName=name, Location="Town", ContactNumber="123", TotalSales=0, OperatingHours=8)
+            for name in ("Central", "North")
+        ]
+        cls.pen, cls.ink = [
+            Product.objects.create(ProductName=name, Category="Office", Price=Decimal("1.00"), ReorderQuantity=5)
+            for name in ("Pen", "Ink")
+        ]
+
+    def At(self, day, hour=12):
+        return timezone.make_aware(datetime(2024, 1, day, hour))
+
+    def Move(self, day, *movements):
+        StockMovement.Record(
+            [(product.pk, store.pk, quantity, "") for product, store, quantity in movements], "Adjustment", self.At(day)
+        )
+
+    def setUp(self):
+        self.Move(1, (self.pen, self.central, 10), (self.ink, self.north, 4))
+        self.Move(3, (self.pen, self.central, -3), (self.pen, self.north, 3))
+        self.Move(5, (self.ink, self.north, -4))
+
+    def test_point_in_time_stock(self):
+        pen, ink, central, north = self.pen.pk, self.ink.pk, self.central.pk, self.north.pk
+        self.assertEqual(StockMovement.GetStockAt(self.At(1, 0)), {})
+        self.assertEqual(StockMovement.GetStockAt(date(2024, 1, 2)), {(pen, central): 10, (ink, north): 4})
+        # A date means the close of that day; locations back at zero are left out
+        self.assertEqual(StockMovement.GetStockAt(date(2024, 1, 5)), {(pen, central): 7, (pen, north): 3})
+        self.assertEqual(
+            StockMovement.GetStockAt(date(2024, 1, 4), store=self.north), {(pen, north): 3, (ink, north): 4}
+        )
+        self.assertEqual(StockMovement.GetStockAt(date(2024, 1, 4), product=ink), {(ink, north): 4})
+
+    def test_snapshots_give_the_same_answers(self):
+        expected = {day: StockMovement.GetStockAt(date(2024, 1, day)) for day in range(1, 7)}
+        self.assertEqual(StockSnapshot.TakeSnapshot(self.At(4)), (self.At(4), 3))
+        self.assertEqual(StockSnapshot.TakeSnapshot(self.At(2)), (None, 0))  # One already exists after it
+        self.Move(6, (self.pen, self.central, 1))
+        expected[6][(self.pen.pk, self.central.pk)] += 1
+        for day, stock in expected.items():
+            with self.subTest(day=day):
+                self.assertEqual(StockMovement.GetStockAt(date(2024, 1, day)), stock)
+
+        # From day 4 on the answer comes from the snapshot, not the movements folded into it
+        StockMovement.objects.filter(OccurredAt__lt=self.At(4)).delete()
+        for day in (4, 5, 6):
+            self.assertEqual(StockMovement.GetStockAt(date(2024, 1, day)), expected[day])
 
+    def test_prune_keeps_the_latest_snapshot_before_the_cutoff(self):
+        for day in (2, 4, 6):
+            StockSnapshot.TakeSnapshot(self.At(day))
+        StockSnapshot.PruneBefore(self.At(5))
+        kept = sorted(set(StockSnapshot.objects.values_list("TakenAt", flat=True)))
+        self.assertEqual(kept, [self.At(4), self.At(6)])
+        self.assertEqual(
+            StockMovement.GetStockAt(date(2024, 1, 5)),
+            {(self.pen.pk, self.central.pk): 7, (self.pen.pk, self.north.pk): 3},
+        )
 
+    def test_locations_rebuild_from_the_ledger(self):
+        # ProductLocation writes record their own movements, so adding them keeps the ledger in step
+        ProductLocation.objects.create(ProductID=self.ink, StoreId=self.central, Quantity=2)
+        ledger = StockMovement.GetStockAt()
+        ProductLocation.objects.filter(ProductID=self.ink).update(Quantity=50)  # Drift that bypasses the ledger
+        ProductLocation.RebuildFromLedger()
+        locations = {
+            (productId, storeId): quantity
+            for productId, storeId, quantity in ProductLocation.objects.exclude(Quantity=0)
+            .values_list("ProductID", "StoreId", "Quantity")
+        }
+        self.assertEqual(locations, ledger)
+        self.pen.refresh_from_db()
+        self.assertEqual(self.pen.StockLevel, 10)
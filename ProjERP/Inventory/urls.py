@@ -3,6 +3,7 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
-        
-
+    path("low-stock/", views.LowStockView, name="low-stock"),
+    path("products/", views.ProductListView, name="product-list"),
+    path("stores/", views.StoreListView, name="store-list"),
 ]
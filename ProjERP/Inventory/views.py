@@ -1,19 +1,29 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.http import JsonResponse
 from django.shortcuts import render
 
-from app.facade import Facade
+from app.paginator import KeysetListView, ParseId
+from Sales.views import SalesPerformanceGraphView  # The sales performance API is served by the Sales app
+from .models import LOW_STOCK_DEFAULT_LIMIT, Product, Store
 
+ProductListView = KeysetListView(
+    Product,
+    ["ProductID", "ProductName", "Category", "Price", "StockLevel", "ReorderQuantity", "LastPurchaseDate",
+     "SupplierID", "SupplierID__SupplierName"],
+    {"supplier": ("SupplierID", ParseId)},
+)
 
-def SalesPerformanceGraphView(request):
-    facade = Facade()
-    start_date = request.GET.get("start_date")  # Optional date from query parameters
-    end_date = request.GET.get("end_date")
+StoreListView = KeysetListView(
+    Store,
+    ["StoreId", "StoreName", "Location", "ContactNumber", "ManagerId", "ManagerId__Name", "OperatingHours"],
+)
 
-    sales_data = facade.GetSalesPerformanceGraph(start_date, end_date)
 
-    return JsonResponse(
-        {
-            "store_sales": sales_data["store_sales"],
-            "product_sales": sales_data["product_sales"],
-        }
-    )
+@staff_member_required
+def LowStockView(request):
+    # Replenishment dashboard feed: the low-stock watchlist, largest shortfall first
+    limit = request.GET.get("limit", str(LOW_STOCK_DEFAULT_LIMIT))
+    if not limit.isdigit() or int(limit) == 0:
+        return JsonResponse({"error": f"Invalid limit: {limit}"}, status=400)
+
+    return JsonResponse({"products": Product.GetLowStockProducts(int(limit))})
@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import *
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("JobID", "Kind", "Status", "Attempts", "RunAfter", "StartedAt", "FinishedAt", "LockedBy")
+    list_filter = ("Status", "Kind")
+    readonly_fields = ("DedupeKey", "StartedAt", "FinishedAt", "LockedBy", "LockedAt", "Result", "LastError")
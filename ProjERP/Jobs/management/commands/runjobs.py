@@ -0,0 +1,81 @@
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections
+
+from Jobs.models import Job
+from Jobs.worker import RunWorker
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Run a pool of job queue workers. Stop with Ctrl+C; running jobs finish first."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=settings.JOB_QUEUE["WORKERS"], help="Number of worker threads."
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=settings.JOB_QUEUE["POLL_INTERVAL"],
+            help="Seconds an idle worker waits before checking the queue again.",
+        )
+        parser.add_argument("--once", action="store_true", help="Exit once the queue has no due jobs.")
+        parser.add_argument(
+            "--purge-days", type=int, help="First delete finished jobs older than this many days."
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1.")
+
+        if options["purge_days"] is not None:
+            self.stdout.write(f"Purged {Job.PurgeFinished(options['purge_days'])} finished job(s).")
+        self.RecoverStale()
+
+        stopEvent = threading.Event()
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        threads = [
+            threading.Thread(
+                target=RunWorker,
+                args=(f"{prefix}:{index}", stopEvent, options["poll_interval"], options["once"]),
+                name=f"job-worker-{index}",
+            )
+            for index in range(options["workers"])
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Workers on other hosts can die too, so stale jobs are recovered periodically, not only at startup
+        recoverAt = time.monotonic() + settings.JOB_QUEUE["RECOVERY_INTERVAL"]
+        try:
+            alive = threads
+            while alive:
+                alive[0].join(timeout=1)
+                alive = [thread for thread in alive if thread.is_alive()]
+                if alive and time.monotonic() >= recoverAt:
+                    self.RecoverStale()
+                    recoverAt = time.monotonic() + settings.JOB_QUEUE["RECOVERY_INTERVAL"]
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping workers after their current job...")
+            stopEvent.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
+
+    def RecoverStale(self):
+        # Requeue (or fail, when out of attempts) Running jobs that stopped heartbeating
+        close_old_connections()
+        try:
+            requeued, failed = Job.RequeueStale()
+        except DatabaseError:
+            logger.exception("Stale job recovery failed; retrying at the next pass")
+            return
+        if requeued or failed:
+            self.stdout.write(f"Requeued {requeued} and failed {failed} stale job(s).")
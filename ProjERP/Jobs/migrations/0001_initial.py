@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:44
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('JobID', models.AutoField(primary_key=True, serialize=False, unique=True)),
+                ('Kind', models.CharField(max_length=50)),
+                ('DedupeKey', models.CharField(blank=True, max_length=64, null=True)),
+                ('Payload', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('Status', models.CharField(choices=[('Pending', 'Pending'), ('Running', 'Running'), ('Succeeded', 'Succeeded'), ('Failed', 'Failed')], default='Pending', max_length=20)),
+                ('Attempts', models.IntegerField(default=0)),
+                ('MaxAttempts', models.IntegerField(default=3)),
+                ('RunAfter', models.DateTimeField(default=django.utils.timezone.now)),
+                ('CreatedAt', models.DateTimeField(auto_now_add=True)),
+                ('StartedAt', models.DateTimeField(blank=True, null=True)),
+                ('FinishedAt', models.DateTimeField(blank=True, null=True)),
+                ('LockedBy', models.CharField(blank=True, max_length=100)),
+                ('Result', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('LastError', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['Status', 'RunAfter'], name='job_status_run_after_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('Status__in', ('Pending', 'Running'))), fields=('Kind', 'DedupeKey'), name='job_active_dedupe_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,182 @@
+# Database-backed job queue: web requests enqueue work, "manage.py runjobs" workers execute it
+import hashlib
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+PENDING, RUNNING, SUCCEEDED, FAILED = "Pending", "Running", "Succeeded", "Failed"
+ACTIVE_STATUSES = (PENDING, RUNNING)  # A job in one of these states absorbs duplicate enqueues
+CLAIM_CANDIDATES = 10  # Due jobs considered per claim attempt, so competing workers rarely collide
+
+logger = logging.getLogger(__name__)
+
+
+class Job(models.Model):
+    STATUS_CHOICES = [(status, status) for status in (PENDING, RUNNING, SUCCEEDED, FAILED)]
+
+    JobID = models.AutoField(primary_key=True, unique=True)
+    Kind = models.CharField(max_length=50)  # Key into the handler registry in Jobs.tasks
+    DedupeKey = models.CharField(max_length=64, null=True, blank=True)  # Hash of kind and payload
+    Payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)  # Keyword arguments for the handler
+    Status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    Attempts = models.IntegerField(default=0)
+    MaxAttempts = models.IntegerField(default=3)
+    RunAfter = models.DateTimeField(default=timezone.now)  # Not claimed before this time; pushed back on retry
+    CreatedAt = models.DateTimeField(auto_now_add=True)
+    StartedAt = models.DateTimeField(null=True, blank=True)
+    FinishedAt = models.DateTimeField(null=True, blank=True)
+    LockedBy = models.CharField(max_length=100, blank=True)  # Worker currently running the job
+    LockedAt = models.DateTimeField(null=True, blank=True)  # Last heartbeat from that worker
+    Result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    LastError = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            # At most one pending or running job per kind and payload; later enqueues join it
+            models.UniqueConstraint(
+                fields=["Kind", "DedupeKey"],
+                condition=Q(Status__in=ACTIVE_STATUSES),
+                name="job_active_dedupe_unique",
+            ),
+        ]
+        indexes = [
+            # Claiming scans due pending jobs in RunAfter order; stale-job recovery filters on Running
+            models.Index(fields=["Status", "RunAfter"], name="job_status_run_after_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.Kind} #{self.JobID} - {self.Status}"
+
+    @staticmethod
+    def GetDedupeKey(kind, payload):
+        # Stable hash of the kind and canonical JSON payload, e.g. one key per product or report range
+        canonical = json.dumps(payload, sort_keys=True, cls=DjangoJSONEncoder)
+        return hashlib.sha256(f"{kind}:{canonical}".encode()).hexdigest()
+
+    @classmethod
+    def Enqueue(cls, kind, payload=None, dedupe=True, runAfter=None, maxAttempts=None):
+        # -------------------
+        # Queues a job and returns (job, created). With dedupe on, an identical pending or running job is
+        # returned instead of creating a new one. Raises ValueError for unknown kinds or bad payloads.
+        # -------------------
+        from .tasks import CheckPayload  # Handlers import the ERP models; keep that out of model loading
+
+        payload = payload or {}
+        CheckPayload(kind, payload)
+        dedupeKey = cls.GetDedupeKey(kind, payload) if dedupe else None
+
+        def FindActive():
+            return cls.objects.filter(Kind=kind, DedupeKey=dedupeKey, Status__in=ACTIVE_STATUSES).first()
+
+        if dedupeKey is not None:
+            existing = FindActive()
+            if existing is not None:
+                return existing, False
+
+        try:
+            with transaction.atomic():
+                job = cls.objects.create(
+                    Kind=kind,
+                    DedupeKey=dedupeKey,
+                    Payload=payload,
+                    RunAfter=runAfter or timezone.now(),
+                    MaxAttempts=maxAttempts or settings.JOB_QUEUE["MAX_ATTEMPTS"],
+                )
+        except IntegrityError:  # A concurrent request enqueued the same job first
+            existing = FindActive()
+            if existing is None:
+                raise
+            return existing, False
+        return job, True
+
+    @classmethod
+    def ClaimNext(cls, workerName):
+        # Atomically move the next due pending job to Running for this worker; returns None if nothing is due
+        now = timezone.now()
+        candidates = list(
+            cls.objects.filter(Status=PENDING, RunAfter__lte=now)
+            .order_by("RunAfter", "JobID")
+            .values_list("JobID", flat=True)[:CLAIM_CANDIDATES]
+        )
+        for jobId in candidates:
+            # Conditional UPDATE: only one worker wins the Pending -> Running transition, and a job rescheduled
+            # for retry since the candidate read is not claimed early
+            claimed = cls.objects.filter(JobID=jobId, Status=PENDING, RunAfter__lte=now).update(
+                Status=RUNNING, LockedBy=workerName, LockedAt=now, StartedAt=now, Attempts=F("Attempts") + 1
+            )
+            if claimed:
+                return cls.objects.get(JobID=jobId)
+        return None
+
+    def GetClaim(self):
+        # This run of the job, as long as stale-job recovery has not taken it away from its worker
+        return Job.objects.filter(JobID=self.JobID, Status=RUNNING, LockedBy=self.LockedBy, Attempts=self.Attempts)
+
+    def Heartbeat(self):
+        # Refresh LockedAt so stale-job recovery leaves the job alone; False once the claim has been lost
+        self.LockedAt = timezone.now()
+        return self.GetClaim().update(LockedAt=self.LockedAt) == 1
+
+    def Run(self):
+        # -------------------
+        # Execute the claimed job, recording the result, or scheduling a retry with exponential backoff.
+        # Returns whether the handler succeeded. If stale-job recovery took the job away meanwhile, the
+        # outcome is logged and discarded, since the job belongs to its new run.
+        # -------------------
+        from .tasks import GetJobHandler
+
+        running = self.GetClaim()
+        try:
+            result = GetJobHandler(self.Kind)(**self.Payload)
+        except Exception:
+            self.LastError = traceback.format_exc()
+            if self.Attempts >= self.MaxAttempts:
+                self.Status = FAILED
+                self.FinishedAt = timezone.now()
+            else:
+                self.Status = PENDING
+                delay = settings.JOB_QUEUE["RETRY_DELAY"] * 2 ** (self.Attempts - 1)
+                self.RunAfter = timezone.now() + timedelta(seconds=delay)
+            if not running.update(
+                Status=self.Status, RunAfter=self.RunAfter, FinishedAt=self.FinishedAt,
+                LastError=self.LastError, LockedBy="",
+            ):
+                logger.warning("%s lost its claim while running; failure not recorded", self)
+            return False
+
+        self.Status, self.Result, self.FinishedAt = SUCCEEDED, result, timezone.now()
+        if not running.update(Status=SUCCEEDED, Result=result, FinishedAt=self.FinishedAt, LockedBy=""):
+            logger.warning("%s lost its claim while running; result discarded", self)
+        return True
+
+    @classmethod
+    def RequeueStale(cls, staleAfter=None):
+        # -------------------
+        # Recovers Running jobs whose worker has not sent a heartbeat for staleAfter seconds (it died or hung).
+        # Jobs with attempts left return to the queue; the rest are marked Failed, so a job that keeps killing
+        # its worker stops after MaxAttempts like any other failure. Returns (requeued, failed).
+        # -------------------
+        staleAfter = staleAfter if staleAfter is not None else settings.JOB_QUEUE["STALE_AFTER"]
+        now = timezone.now()
+        stale = cls.objects.filter(Status=RUNNING).filter(
+            Q(LockedAt__lt=now - timedelta(seconds=staleAfter)) | Q(LockedAt=None)
+        )
+        failed = stale.filter(Attempts__gte=F("MaxAttempts")).update(
+            Status=FAILED, FinishedAt=now, LockedBy="", LastError="Worker stopped responding on the last attempt."
+        )
+        requeued = stale.update(Status=PENDING, LockedBy="", RunAfter=now)
+        return requeued, failed
+
+    @classmethod
+    def PurgeFinished(cls, olderThanDays):
+        # Delete succeeded and failed jobs finished more than olderThanDays ago; returns the number deleted
+        cutoff = timezone.now() - timedelta(days=olderThanDays)
+        deleted, _ = cls.objects.filter(Status__in=(SUCCEEDED, FAILED), FinishedAt__lt=cutoff).delete()
+        return deleted
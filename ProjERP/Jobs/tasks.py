@@ -0,0 +1,123 @@
+# Job handler registry: each handler takes the job payload as keyword arguments and returns a JSON result
+import inspect
+import os
+import uuid
+
+from django.conf import settings
+
+from app.paginator import ParseDate
+
+JOB_HANDLERS = {}
+JOB_CHECKS = {}  # Kind -> payload check run at Enqueue, so malformed jobs never reach a worker
+
+
+def JobHandler(kind, check=None):
+    # Register the decorated function as the handler for a job kind, with an optional payload check that
+    # takes the same keyword arguments and raises ValueError
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        if check is not None:
+            JOB_CHECKS[kind] = check
+        return func
+    return decorator
+
+
+def GetJobHandler(kind):
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return JOB_HANDLERS[kind]
+
+
+def CheckPayload(kind, payload):
+    # Reject payloads that do not match the handler's keyword arguments before they reach the queue
+    if not isinstance(payload, dict):
+        raise ValueError("Job payload must be an object of keyword arguments.")
+    try:
+        inspect.signature(GetJobHandler(kind)).bind(**payload)
+    except TypeError as e:
+        raise ValueError(f"Invalid payload for {kind} job: {e}")
+    if kind in JOB_CHECKS:
+        JOB_CHECKS[kind](**payload)
+
+
+def ParsePayloadDate(value, name):
+    # Payload dates travel as ISO strings; None leaves that end of the range open
+    if value is None:
+        return None
+    try:
+        if not isinstance(value, str):
+            raise ValueError(f"expected YYYY-MM-DD, got {value!r}")
+        return ParseDate(value)
+    except ValueError as e:
+        raise ValueError(f"Invalid {name}: {e}")
+
+
+def ParseDateRange(start_date=None, end_date=None):
+    # Both payload dates, checked against each other
+    start_date, end_date = ParsePayloadDate(start_date, "start_date"), ParsePayloadDate(end_date, "end_date")
+    if start_date and end_date and start_date > end_date:
+        raise ValueError("start_date must not be after end_date")
+    return start_date, end_date
+
+
+def CheckReorder(product_ids=None):
+    from app.facade import ParseProductIds
+
+    if product_ids is not None:
+        ParseProductIds(product_ids)
+
+
+def CheckExport(dataset, format="csv", start_date=None, end_date=None):
+    from app.exports import EXPORT_FORMATS, GetExportDatasets
+
+    if dataset not in GetExportDatasets():
+        raise ValueError(f"Unknown export dataset: {dataset}")
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format: {format}")
+    return ParseDateRange(start_date, end_date)
+
+
+@JobHandler("reorder", check=CheckReorder)
+def ReorderJob(product_ids=None):
+    # Evaluate reorder thresholds and raise purchase orders for the given products, or all of them
+    from app.facade import Facade
+
+    return Facade().TriggerPurchaseOrders(product_ids)
+
+
+@JobHandler("rollup", check=ParseDateRange)
+def RollupJob(start_date=None, end_date=None):
+    # Rebuild the sales daily rollup for a date range, then drop report results computed from the old rows
+    from app.reportcache import InvalidateReports
+    from Sales.models import SalesDailyRollup
+
+    written = SalesDailyRollup.Rebuild(*ParseDateRange(start_date, end_date))
+    InvalidateReports()
+    return {"written": written}
+
+
+@JobHandler("salesperformance", check=ParseDateRange)
+def SalesPerformanceJob(start_date=None, end_date=None):
+    # Compute the sales performance report; the result also lands in the report cache for the web views
+    from app.facade import Facade
+
+    return Facade().GetSalesPerformance(*ParseDateRange(start_date, end_date))
+
+
+@JobHandler("export", check=CheckExport)
+def ExportJob(dataset, format="csv", start_date=None, end_date=None):
+    # Write a dataset export to JOB_QUEUE["EXPORT_DIR"] and return the file path
+    from app.exports import IterExport
+
+    start_date, end_date = CheckExport(dataset, format, start_date, end_date)
+    exportDir = settings.JOB_QUEUE["EXPORT_DIR"]
+    os.makedirs(exportDir, exist_ok=True)
+    path = os.path.join(exportDir, f"{dataset}-{uuid.uuid4().hex}.{format}")
+    chunks = IterExport(dataset, format, start_date, end_date)
+
+    # Write under a temporary name so a failed attempt never leaves a truncated export behind
+    with open(path + ".part", "w", newline="") as handle:
+        for chunk in chunks:
+            handle.write(chunk)
+    os.replace(path + ".part", path)
+    return {"path": path}
@@ -0,0 +1,142 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from app.routers import WROTE_TO_PRIMARY
+from .models import FAILED, PENDING, RUNNING, SUCCEEDED, Job
+from .tasks import JOB_HANDLERS, JobHandler
+from .worker import RunWorker
+
+
+class JobWorkerTests(TransactionTestCase):
+    # RunWorker closes its connection and runs outside a transaction, like the runjobs threads
+
+    def setUp(self):
+        self.seen = []
+        JobHandler("test-record")(self.Record)
+        self.addCleanup(JOB_HANDLERS.pop, "test-record")
+
+    def Record(self, value=None, fail=False, sleep=0):
+        self.seen.append((value, WROTE_TO_PRIMARY.get()))
+        time.sleep(sleep)
+        if fail:
+            raise RuntimeError("handler failed")
+        return value
+
+    def Claim(self, workerName="test-worker"):
+        job = Job.ClaimNext(workerName)
+        self.assertIsNotNone(job)
+        return job
+
+    def Age(self, job, seconds):
+        # Make the job's last heartbeat look seconds old
+        Job.objects.filter(pk=job.pk).update(LockedAt=timezone.now() - timedelta(seconds=seconds))
+
+    def RunOnce(self):
+        RunWorker("test-worker", threading.Event(), pollInterval=0, once=True)
+
+    def test_each_job_starts_unpinned(self):
+        Job.Enqueue("test-record", {"value": 1})
+        Job.Enqueue("test-record", {"value": 2})
+        WROTE_TO_PRIMARY.set(True)  # As left behind by an earlier job that wrote ERP data
+        self.RunOnce()
+        self.assertEqual(self.seen, [(1, False), (2, False)])
+
+    def test_claim_is_exclusive(self):
+        job, _ = Job.Enqueue("test-record", {"value": 1})
+        self.assertEqual(self.Claim("a").pk, job.pk)
+        self.assertIsNone(Job.ClaimNext("b"))
+        job.refresh_from_db()
+        self.assertEqual((job.Status, job.LockedBy, job.Attempts), (RUNNING, "a", 1))
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        Job.Enqueue("test-record", {"fail": True}, maxAttempts=2)
+        self.assertFalse(self.Claim().Run())
+        job = Job.objects.get()
+        self.assertEqual((job.Status, job.Attempts), (PENDING, 1))
+        self.assertGreater(job.RunAfter, timezone.now())
+        self.assertIsNone(Job.ClaimNext("test-worker"))  # Not due yet
+
+        Job.objects.update(RunAfter=timezone.now())
+        self.assertFalse(self.Claim().Run())
+        job.refresh_from_db()
+        self.assertEqual((job.Status, job.Attempts), (FAILED, 2))
+        self.assertIn("handler failed", job.LastError)
+
+    def test_stale_jobs_are_requeued_until_out_of_attempts(self):
+        Job.Enqueue("test-record", {"value": 1}, maxAttempts=2)
+        self.Age(self.Claim(), 60)
+        self.assertEqual(Job.RequeueStale(staleAfter=300), (0, 0))  # Heartbeat is recent enough
+
+        self.Age(Job.objects.get(), 600)
+        self.assertEqual(Job.RequeueStale(staleAfter=300), (1, 0))
+        self.Age(self.Claim(), 600)
+        self.assertEqual(Job.RequeueStale(staleAfter=300), (0, 1))
+        self.assertEqual(Job.objects.get().Status, FAILED)
+
+    def test_recovered_job_keeps_the_new_runs_result(self):
+        Job.Enqueue("test-record", {"value": 1})
+        first = self.Claim("first")
+        self.Age(first, 600)
+        Job.RequeueStale(staleAfter=300)
+        second = self.Claim("second")
+
+        self.assertFalse(first.Heartbeat())
+        with self.assertLogs("Jobs.models", "WARNING"):
+            first.Run()  # Finishes late; must not overwrite the new run
+        self.assertEqual(Job.objects.get().Status, RUNNING)
+        self.assertTrue(second.Run())
+        self.assertEqual(Job.objects.get().Status, SUCCEEDED)
+
+    def test_worker_heartbeats_while_running(self):
+        Job.Enqueue("test-record", {"value": 1, "sleep": 0.3})
+        RunWorker("test-worker", threading.Event(), pollInterval=0, once=True, heartbeatInterval=0.05)
+        job = Job.objects.get()
+        self.assertEqual(job.Status, SUCCEEDED)
+        self.assertGreater(job.LockedAt, job.StartedAt)
+
+
+class JobEnqueueTests(TestCase):
+    # Malformed payloads are refused when queued instead of failing every attempt on a worker
+
+    BAD_PAYLOADS = [
+        ("reorder", {"product_ids": ["abc"]}, "Invalid product id"),
+        ("reorder", {"product_ids": "12"}, "must be a list"),
+        ("rollup", {"start_date": "2025-02-30"}, "Invalid start_date"),
+        ("rollup", {"end_date": 20250101}, "Invalid end_date"),
+        ("salesperformance", {"start_date": "2025-02-01", "end_date": "2025-01-01"}, "must not be after"),
+        ("export", {"dataset": "sales", "format": "xml"}, "Unsupported format"),
+        ("export", {"dataset": "payroll"}, "Unknown export dataset"),
+        ("export", {"dataset": "sales", "start_date": "soon"}, "Invalid start_date"),
+        ("rollup", {"days": 3}, "Invalid payload for rollup job"),
+    ]
+
+    def test_bad_payloads_are_rejected(self):
+        for kind, payload, message in self.BAD_PAYLOADS:
+            with self.subTest(kind=kind, payload=payload):
+                with self.assertRaisesMessage(ValueError, message):
+                    Job.Enqueue(kind, payload)
+        self.assertFalse(Job.objects.exists())
+
+        job, created = Job.Enqueue("reorder", {"product_ids": ["1", 2]})
+        self.assertTrue(created)
+        self.assertTrue(Job.Enqueue("rollup", {"start_date": "2025-01-01", "end_date": "2025-01-31"})[1])
+
+    def test_enqueue_view(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+        for kind, payload, message in self.BAD_PAYLOADS:
+            with self.subTest(kind=kind, payload=payload):
+                url = reverse("job-enqueue", args=[kind])
+                response = self.client.post(url, payload, content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(message, response.json()["error"])
+
+        response = self.client.post(
+            reverse("job-enqueue", args=["rollup"]), {"start_date": "2025-01-01"}, content_type="application/json"
+        )
+        self.assertEqual((response.status_code, response.json()["status"]), (202, PENDING))
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path("<int:job_id>/", views.JobStatusView, name="job-status"),
+    path("<str:kind>/", views.EnqueueJobView, name="job-enqueue"),
+]
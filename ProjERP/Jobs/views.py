@@ -0,0 +1,39 @@
+import json
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+
+from .models import Job
+
+
+@staff_member_required
+def EnqueueJobView(request, kind):
+    # Queue a job from a JSON payload of handler arguments and return its id straight away
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    try:
+        payload = json.loads(request.body or b"{}")
+        job, created = Job.Enqueue(kind, payload)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Request body must be a JSON object."}, status=400)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({"job_id": job.JobID, "status": job.Status, "deduplicated": not created}, status=202)
+
+
+@staff_member_required
+def JobStatusView(request, job_id):
+    # Poll a job's progress and, once it has succeeded, its result
+    job = Job.objects.filter(JobID=job_id).first()
+    if job is None:
+        raise Http404(f"Unknown job: {job_id}")
+
+    return JsonResponse({
+        "job_id": job.JobID,
+        "kind": job.Kind,
+        "status": job.Status,
+        "attempts": job.Attempts,
+        "result": job.Result,
+        "error": job.LastError.strip().splitlines()[-1] if job.LastError else None,
+    })
@@ -0,0 +1,76 @@
+# Worker loop run by each thread of "manage.py runjobs"
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
+
+from app.routers import WROTE_TO_PRIMARY
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def KeepClaimed(job, interval, done):
+    # Runs beside a job on its own thread and connection, refreshing its heartbeat until done is set
+    try:
+        while not done.wait(interval):
+            if not job.Heartbeat():
+                logger.warning("%s was recovered as stale while still running", job)
+                return
+    except DatabaseError:
+        logger.exception("Heartbeat for %s failed", job)
+    finally:
+        connection.close()
+
+
+def RunClaimed(job, heartbeatInterval):
+    # Run a claimed job with a heartbeat thread alongside; returns whether the handler succeeded
+    done = threading.Event()
+    heartbeat = threading.Thread(
+        target=KeepClaimed, args=(job, heartbeatInterval, done), name=f"job-heartbeat-{job.JobID}", daemon=True
+    )
+    heartbeat.start()
+    try:
+        return job.Run()
+    finally:
+        done.set()
+        heartbeat.join()
+
+
+def RunWorker(workerName, stopEvent, pollInterval, once=False, heartbeatInterval=None):
+    # -------------------
+    # Claims and runs jobs until stopEvent is set. Sleeps pollInterval seconds whenever the queue is empty,
+    # or returns at that point when once is set. Each thread uses its own database connection. While a job
+    # runs its LockedAt is refreshed every heartbeatInterval seconds (JOB_QUEUE["HEARTBEAT_INTERVAL"]).
+    # -------------------
+    if heartbeatInterval is None:
+        heartbeatInterval = settings.JOB_QUEUE["HEARTBEAT_INTERVAL"]
+    try:
+        while not stopEvent.is_set():
+            close_old_connections()  # Honour CONN_MAX_AGE and drop broken connections between jobs
+            # Like a request, each job starts reading reports from the replica until it writes itself
+            WROTE_TO_PRIMARY.set(False)
+            try:
+                job = Job.ClaimNext(workerName)
+                if job is not None:
+                    logger.info("%s running %s", workerName, job)
+                    if not RunClaimed(job, heartbeatInterval):
+                        logger.warning(
+                            "%s: %s job %s failed (attempt %s of %s)",
+                            workerName, job.Kind, job.JobID, job.Attempts, job.MaxAttempts,
+                        )
+            except DatabaseError:
+                # Keep the worker alive through a dropped connection or lock timeout; a job left Running
+                # stops heartbeating and is picked up again by Job.RequeueStale
+                logger.exception("%s: database error, retrying after %ss", workerName, pollInterval)
+                job = None
+                if once:
+                    return
+
+            if job is None:
+                if once:
+                    return
+                stopEvent.wait(pollInterval)
+    finally:
+        connection.close()
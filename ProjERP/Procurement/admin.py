@@ -1,6 +1,20 @@
 from django.contrib import admin
+
+from app.paginator import EstimatedCountPaginator
 from .models import *
 
-admin.site.register(Supplier)
-admin.site.register(PurchaseOrder)
 
+@admin.register(Supplier)
+class SupplierAdmin(admin.ModelAdmin):
+    list_display = ("SupplierName", "Location", "ContactDetails", "ContractTerms")
+    search_fields = ("SupplierName", "Location")
+
+
+@admin.register(PurchaseOrder)
+class PurchaseOrderAdmin(admin.ModelAdmin):
+    list_display = ("PurchaseOrderID", "ProductID", "TotalAmount", "OrderDate", "DeliveryDate", "OrderStatus")
+    list_select_related = ("ProductID",)
+    list_filter = ("OrderStatus",)
+    autocomplete_fields = ("ProductID",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
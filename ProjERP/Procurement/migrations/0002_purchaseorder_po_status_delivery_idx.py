@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Inventory', '0004_productlocation_productlocation_product_store_unique'),
+        ('Procurement', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['OrderStatus', 'DeliveryDate'], name='po_status_delivery_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:37
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Procurement', '0002_purchaseorder_po_status_delivery_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='purchaseorder',
+            name='OrderDate',
+            field=models.DateField(default=datetime.date.today),
+        ),
+    ]
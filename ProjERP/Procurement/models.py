@@ -1,8 +1,27 @@
 # Imports for managing supplier data, purchase orders and time operations
-from django.db import models
-from Inventory.models import Product
-from django.db.models import Sum, Avg, Count
-from datetime import datetime, timedelta
+from django.db import models, transaction
+from Inventory.models import RECEIPT, Product, ProductLocation, StockMovement, Store
+from django.db.models import Sum, Avg, Count, F, Q, DurationField, ExpressionWrapper
+from datetime import date, datetime, timedelta
+from math import ceil
+from app.reportcache import CachedReport, InvalidateReports
+from app.routers import ReportingDatabase
+
+ON_TIME_DAYS = 7  # Default order-to-delivery lead time counted as on time
+LEAD_TIME_PERCENTILES = (50, 90, 95)
+CLOSED_ORDER_STATUSES = ("Delivered", "Cancelled")  # Orders in these states cannot be received
+
+
+def HistogramPercentile(histogram, percentile):
+   # Nearest-rank percentile of a sorted [(value, count)] histogram
+   total = sum(count for _, count in histogram)
+   rank = max(1, ceil(percentile / 100 * total))
+   seen = 0
+   for value, count in histogram:
+      seen += count
+      if seen >= rank:
+         return value
+   return None
 
 class Supplier(models.Model):
    # Primary supplier identifiers and contact information
@@ -30,19 +49,20 @@ class Supplier(models.Model):
 
    def ViewSupplierPerformance(self, dateRange=30):
        # Calculate supplier performance metrics within specified date window 
-       endDate = datetime.now()
+       endDate = datetime.now().date()
        startDate = endDate - timedelta(days=dateRange)
 
        # Filter orders by supplier, delivery date and completed status
-       orders = PurchaseOrder.objects.filter(
-           ProductId__SupplierId=self.SupplierID,  # Filter through product to supplier
+       orders = PurchaseOrder.objects.using(ReportingDatabase()).filter(
+           ProductID__SupplierID=self.SupplierID,  # Filter through product to supplier
            DeliveryDate__range=[startDate, endDate],  # Date range filter using __range
            OrderStatus="Delivered",
        )
 
-       # Calculate totals with null handling for empty result sets
-       totalAmount = orders.aggregate(total=Sum("TotalAmount"))["total"] or 0
-       totalOrders = orders.count()
+       # Calculate totals with null handling for empty result sets, in a single aggregate
+       totals = orders.aggregate(total=Sum("TotalAmount"), count=Count("PurchaseOrderID"))
+       totalAmount = totals["total"] or 0
+       totalOrders = totals["count"]
 
        # Compute performance metrics with division by zero protection
        performance = {
@@ -52,15 +72,70 @@ class Supplier(models.Model):
        }
        return performance
 
+   @classmethod
+   def GetScorecards(cls, dateRange=30, onTimeDays=ON_TIME_DAYS):
+       # Scorecards for every supplier with deliveries in the last dateRange days (cached per window)
+       endDate = datetime.now().date()
+       return cls.GetScorecardsForWindow(endDate - timedelta(days=dateRange), endDate, onTimeDays)
+
+   @classmethod
+   @CachedReport("SupplierScorecards")
+   def GetScorecardsForWindow(cls, startDate, endDate, onTimeDays=ON_TIME_DAYS):
+       # ------------------- 
+       # One grouped query over delivered orders in [startDate, endDate]: per supplier and lead time (days from
+       # OrderDate to DeliveryDate), the order count and amount. Totals, average order value, on-time rate
+       # (lead time <= onTimeDays) and nearest-rank lead-time percentiles are all derived from that histogram.
+       # Returns a list of dicts ordered by SupplierID, with ViewSupplierPerformance's keys plus lead-time stats.
+       # ------------------- 
+       histogram = (
+           PurchaseOrder.objects.using(ReportingDatabase())
+           .filter(DeliveryDate__range=[startDate, endDate], OrderStatus="Delivered", ProductID__SupplierID__isnull=False)
+           .annotate(LeadTime=ExpressionWrapper(F("DeliveryDate") - F("OrderDate"), output_field=DurationField()))
+           .values_list("ProductID__SupplierID", "ProductID__SupplierID__SupplierName", "LeadTime")
+           .annotate(Orders=Count("PurchaseOrderID"), Amount=Sum("TotalAmount"))
+           .order_by("ProductID__SupplierID", "LeadTime")
+       )
+
+       scorecards = {}
+       for supplierId, supplierName, leadTime, orders, amount in histogram:
+           card = scorecards.setdefault(supplierId, {"SupplierName": supplierName, "Amount": 0, "LeadTimes": []})
+           card["Amount"] += amount
+           card["LeadTimes"].append((leadTime.days, orders))
+
+       results = []
+       for supplierId, card in scorecards.items():
+           leadTimes = card["LeadTimes"]
+           totalOrders = sum(orders for _, orders in leadTimes)
+           onTime = sum(orders for days, orders in leadTimes if days <= onTimeDays)
+           scorecard = {
+               "SupplierID": supplierId,
+               "SupplierName": card["SupplierName"],
+               "TotalDeliveredOrders": totalOrders,
+               "TotalDeliveredAmount": card["Amount"],
+               "AverageOrderValue": card["Amount"] / totalOrders,
+               "OnTimeRate": onTime / totalOrders,
+               "AverageLeadTimeDays": sum(days * orders for days, orders in leadTimes) / totalOrders,
+           }
+           for percentile in LEAD_TIME_PERCENTILES:
+               scorecard[f"LeadTimeP{percentile}Days"] = HistogramPercentile(leadTimes, percentile)
+           results.append(scorecard)
+       return results
+
 class PurchaseOrder(models.Model):
    # Primary purchase order details with automatic ID generation
    PurchaseOrderID = models.AutoField(primary_key=True, unique=True)
    TotalAmount = models.DecimalField(max_digits=10, decimal_places=2)
    ProductID = models.ForeignKey(Product, on_delete=models.CASCADE)  # Links to product with cascade delete
-   OrderDate = models.DateField(auto_now_add=True)  # Automatically set on creation
+   OrderDate = models.DateField(default=date.today)  # Defaults to the creation date
    DeliveryDate = models.DateField(blank=True, null=True)  # Optional expected delivery date
    OrderStatus = models.CharField(max_length=200)
 
+   class Meta:
+       indexes = [
+           # Status dashboards and delivered-order reports filtered by delivery date
+           models.Index(fields=["OrderStatus", "DeliveryDate"], name="po_status_delivery_idx"),
+       ]
+
    def __str__(self):
        return f"Id:{self.PurchaseOrderID} - Contains:{self.ProductID.ProductName} - Amount:{self.TotalAmount} - Status:{self.OrderStatus}"
 
@@ -74,6 +149,91 @@ class PurchaseOrder(models.Model):
            OrderStatus=orderStatus,
        )
 
+   @classmethod
+   def CreatePurchaseOrders(cls, orders, deliveryDate=None, orderStatus="Pending"):
+       # Bulk factory: orders is an iterable of (productId, totalAmount) pairs, inserted atomically
+       with transaction.atomic():
+           purchaseOrders = cls.objects.bulk_create(
+               cls(
+                   ProductID_id=productId,
+                   TotalAmount=totalAmount,
+                   DeliveryDate=deliveryDate,
+                   OrderStatus=orderStatus,
+               )
+               for productId, totalAmount in orders
+           )
+           if purchaseOrders:
+               InvalidateReports()  # bulk_create sends no post_save signals
+       return purchaseOrders
+
+   @classmethod
+   def ReceiveDeliveries(cls, lines, deliveryDate=None):
+       # ------------------- 
+       # Receives a delivery in one transaction. lines is an iterable of (purchaseOrderId, storeId, quantity);
+       # an order may be split across several stores. Every order named is marked Delivered with a single
+       # UPDATE, the quantities are added to ProductLocation (rows created where missing) and recorded in
+       # the stock ledger as receipts, and Product.LastPurchaseDate moves forward to the delivery date.
+       # The query count stays constant however many lines the delivery has.
+       # Raises ValueError for bad quantities, unknown orders or stores, or orders already closed;
+       # nothing is written in that case.
+       # ------------------- 
+       deliveryDate = deliveryDate or date.today()
+       lines = list(lines)
+       if not lines:
+           return {"orders": 0, "lines": 0, "units": 0}
+       for purchaseOrderId, storeId, quantity in lines:
+           if quantity <= 0:
+               raise ValueError(f"Quantity for purchase order {purchaseOrderId} must be greater than zero.")
+
+       orderIds = {purchaseOrderId for purchaseOrderId, _, _ in lines}
+       storeIds = {storeId for _, storeId, _ in lines}
+
+       with transaction.atomic():
+           # Lock the orders so a concurrent receipt of the same order waits, then sees it closed
+           locked = list(
+               cls.objects.select_for_update()
+               .filter(PurchaseOrderID__in=orderIds)
+               .order_by("PurchaseOrderID")
+               .values_list("PurchaseOrderID", "OrderStatus", "ProductID")
+           )
+           orders = {orderId: status for orderId, status, _ in locked}
+           products = {orderId: productId for orderId, _, productId in locked}
+           missing = sorted(orderIds - orders.keys())
+           if missing:
+               raise ValueError(f"Unknown purchase order(s): {', '.join(map(str, missing))}")
+           closed = sorted(orderId for orderId, status in orders.items() if status in CLOSED_ORDER_STATUSES)
+           if closed:
+               raise ValueError(f"Purchase order(s) already delivered or cancelled: {', '.join(map(str, closed))}")
+
+           knownStores = set(Store.objects.filter(StoreId__in=storeIds).values_list("StoreId", flat=True))
+           unknownStores = sorted(storeIds - knownStores)
+           if unknownStores:
+               raise ValueError(f"Unknown store(s): {', '.join(map(str, unknownStores))}")
+
+           cls.objects.filter(PurchaseOrderID__in=orderIds).update(OrderStatus="Delivered", DeliveryDate=deliveryDate)
+
+           deltas = {}
+           for purchaseOrderId, storeId, quantity in lines:
+               key = (products[purchaseOrderId], storeId)
+               deltas[key] = deltas.get(key, 0) + quantity
+           ProductLocation.ApplyStockDeltas(deltas, kind=None)  # Ledger rows are written per order below
+           StockMovement.Record(
+               (
+                   (products[purchaseOrderId], storeId, quantity, f"Purchase order {purchaseOrderId}")
+                   for purchaseOrderId, storeId, quantity in lines
+               ),
+               RECEIPT,
+           )
+
+           Product.objects.filter(
+               Q(LastPurchaseDate__isnull=True) | Q(LastPurchaseDate__lt=deliveryDate),
+               ProductID__in=set(products.values()),
+           ).update(LastPurchaseDate=deliveryDate)
+
+           InvalidateReports()  # QuerySet.update sends no post_save signals
+
+       return {"orders": len(orderIds), "lines": len(lines), "units": sum(quantity for _, _, quantity in lines)}
+
    def GetPurchaseOrderStatus(self):
        # Get current status string for order tracking
        return self.OrderStatus
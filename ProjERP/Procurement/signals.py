@@ -0,0 +1,15 @@
+# Signal handlers dropping cached supplier reports when procurement data changes
+from django.db.models.signals import post_delete, post_save
+
+from app.reportcache import InvalidateReports
+from .models import PurchaseOrder, Supplier
+
+
+def InvalidateReportCache(sender, **kwargs):
+    # Purchase orders feed the supplier scorecards, which also show supplier names
+    InvalidateReports()
+
+
+for model in (PurchaseOrder, Supplier):
+    post_save.connect(InvalidateReportCache, sender=model, dispatch_uid=f"report-cache-save-{model.__name__}")
+    post_delete.connect(InvalidateReportCache, sender=model, dispatch_uid=f"report-cache-delete-{model.__name__}")
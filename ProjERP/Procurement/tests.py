@@ -1,3 +1,224 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+
+from app.facade import Facade
+from app.reportcache import GetReportCache
+from Inventory.models import Product, ProductLocation, StockMovement, Store
+from .models import PurchaseOrder, Supplier
+
+
+class BatchReorderTests(TestCase):
+    # Facade.TriggerPurchaseOrders raises one order per product below its reorder level
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supplier = Supplier.objects.create(
+            SupplierName="Acme", ContactDetails="-", Location="-", ContractTerms="-"
+        )
+        cls.store = Store.objects.create(
+            StoreName="Central", Location="Town", ContactNumber="123", TotalSales=0, OperatingHours=8
+        )
+        cls.product = Product.objects.create(
+            ProductName="Pen", Category="Office", Price=Decimal("1.50"), ReorderQuantity=10, SupplierID=cls.supplier
+        )
+        ProductLocation.objects.create(ProductID=cls.product, StoreId=cls.store, Quantity=4)
+
+    def test_orders_shortfall(self):
+        report = Facade().TriggerPurchaseOrders([self.product.pk])
+        self.assertEqual(report["created"], [{
+            "PurchaseOrderID": PurchaseOrder.objects.get().pk, "ProductID": self.product.pk,
+            "Quantity": 6, "TotalAmount": Decimal("9.00"),
+        }])
+
+    def test_string_ids_match_products(self):
+        report = Facade().TriggerPurchaseOrders([str(self.product.pk), "999999"])
+        self.assertEqual(report["missing"], [999999])
+        self.assertEqual(len(report["created"]), 1)
+
+    def test_invalid_ids_are_rejected(self):
+        # Nothing is ordered when any id in the payload is malformed
+        for productIds in (["abc"], [self.product.pk, "1.5"], [None], [True], "12", 12):
+            with self.subTest(productIds=productIds):
+                with self.assertRaises(ValueError):
+                    Facade().TriggerPurchaseOrders(productIds)
+        with self.assertRaisesMessage(ValueError, "Invalid product id: expected a positive integer, got 'abc'"):
+            Facade().TriggerPurchaseOrders([self.product.pk, "abc"])
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+    def test_open_orders_are_not_duplicated(self):
+        Facade().TriggerPurchaseOrders([self.product.pk])
+        report = Facade().TriggerPurchaseOrders([self.product.pk])
+        self.assertEqual((report["created"], report["on_order"]), ([], [self.product.pk]))
+        self.assertEqual(PurchaseOrder.objects.count(), 1)
+
+        PurchaseOrder.objects.update(OrderStatus="Cancelled")  # A closed order no longer counts
+        report = Facade().TriggerPurchaseOrders([self.product.pk])
+        self.assertEqual(len(report["created"]), 1)
+
+    def test_matches_low_stock_watchlist(self):
+        # The reorder pass and the watchlist share the materialised Shortfall
+        for name, reorderLevel in (("Ink", 3), ("Pad", 0)):
+            Product.objects.create(
+                ProductName=name, Category="Office", Price=Decimal("2.00"), ReorderQuantity=reorderLevel,
+                SupplierID=self.supplier,
+            )
+        report = Facade().TriggerPurchaseOrders()
+        self.assertEqual(report["sufficient"], 1)
+        self.assertEqual(
+            sorted((row["ProductID"], row["Quantity"]) for row in report["created"]),
+            sorted((row["ProductID"], row["Shortfall"]) for row in Product.GetLowStockProducts()),
+        )
+
+
+class SupplierScorecardTests(TestCase):
+    # Scorecards summarise delivered orders per supplier from one lead-time histogram
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = date.today()
+        cls.acme, cls.other = [
+            Supplier.objects.create(SupplierName=name, ContactDetails="-", Location="-", ContractTerms="-")
+            for name in ("Acme", "Other")
+        ]
+        cls.pen = Product.objects.create(
+            ProductName="Pen", Category="Office", Price=Decimal("1.50"), ReorderQuantity=10, SupplierID=cls.acme
+        )
+        ink = Product.objects.create(
+            ProductName="Ink", Category="Office", Price=Decimal("2.00"), ReorderQuantity=10, SupplierID=cls.other
+        )
+        # Acme: lead times of 5, 12 and 2 days inside the window
+        for ordered, delivered, amount in ((10, 5, "10.00"), (20, 8, "20.00"), (3, 1, "30.00")):
+            cls.Order(cls.pen, ordered, delivered, amount)
+        cls.Order(cls.pen, 60, 45, "99.00")  # Delivered before the window
+        cls.Order(cls.pen, 2, None, "99.00", "Pending")
+        cls.Order(ink, 5, None, "99.00", "Shipped")  # Other has nothing delivered
+
+    @classmethod
+    def Order(cls, product, orderedDaysAgo, deliveredDaysAgo, amount, status="Delivered"):
+        deliveryDate = None if deliveredDaysAgo is None else cls.today - timedelta(days=deliveredDaysAgo)
+        order = PurchaseOrder.CreatePurchaseOrder(product, Decimal(amount), deliveryDate, status)
+        PurchaseOrder.objects.filter(pk=order.pk).update(OrderDate=cls.today - timedelta(days=orderedDaysAgo))
+        return order
+
+    def setUp(self):
+        GetReportCache().clear()
+
+    def test_scorecard_statistics(self):
+        [card] = Supplier.GetScorecards(dateRange=30)
+        self.assertEqual(card, {
+            "SupplierID": self.acme.pk,
+            "SupplierName": "Acme",
+            "TotalDeliveredOrders": 3,
+            "TotalDeliveredAmount": Decimal("60.00"),
+            "AverageOrderValue": Decimal("20.00"),
+            "OnTimeRate": 2 / 3,
+            "AverageLeadTimeDays": 19 / 3,
+            "LeadTimeP50Days": 5,
+            "LeadTimeP90Days": 12,
+            "LeadTimeP95Days": 12,
+        })
+        self.assertEqual(Supplier.GetScorecards(dateRange=30, onTimeDays=1)[0]["OnTimeRate"], 0)
+
+    def test_matches_supplier_performance(self):
+        [card] = Supplier.GetScorecards(dateRange=30)
+        for key, value in self.acme.ViewSupplierPerformance(dateRange=30).items():
+            with self.subTest(key=key):
+                self.assertEqual(card[key], value)
+
+    def test_new_delivery_invalidates_cached_scorecards(self):
+        self.assertEqual(Supplier.GetScorecards(dateRange=30)[0]["TotalDeliveredOrders"], 3)
+        self.Order(self.pen, 4, 0, "40.00")
+        self.assertEqual(Supplier.GetScorecards(dateRange=30)[0]["TotalDeliveredOrders"], 4)
+
+
+class ReceiveDeliveriesTests(TestCase):
+    # Receiving closes the orders, books the stock and records receipts in one all-or-nothing step
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.central, cls.north = [
+            Store.objects.create(StoreName=name, Location="Town", ContactNumber="123", TotalSales=0, OperatingHours=8)
+            for name in ("Central", "North")
+        ]
+        cls.pen = Product.objects.create(
+            ProductName="Pen", Category="Office", Price=Decimal("1.00"), ReorderQuantity=5,
+            LastPurchaseDate=date(2024, 1, 1),
+        )
+        cls.ink = Product.objects.create(
+            ProductName="Ink", Category="Office", Price=Decimal("1.00"), ReorderQuantity=5,
+            LastPurchaseDate=date(2024, 6, 1),
+        )
+        ProductLocation.objects.create(ProductID=cls.pen, StoreId=cls.central, Quantity=4)
+        cls.penOrder = PurchaseOrder.CreatePurchaseOrder(cls.pen, Decimal("8.00"), None, "Shipped")
+        cls.inkOrder = PurchaseOrder.CreatePurchaseOrder(cls.ink, Decimal("2.00"), None)
+        cls.closedOrder = PurchaseOrder.CreatePurchaseOrder(cls.ink, Decimal("2.00"), date(2024, 1, 1), "Delivered")
+
+    def Stock(self):
+        return {
+            (productId, storeId): quantity
+            for productId, storeId, quantity in ProductLocation.objects.values_list("ProductID", "StoreId", "Quantity")
+        }
+
+    def test_split_delivery(self):
+        received = PurchaseOrder.ReceiveDeliveries(
+            [(self.penOrder.pk, self.central.pk, 5), (self.penOrder.pk, self.north.pk, 3),
+             (self.inkOrder.pk, self.central.pk, 2)],
+            date(2024, 3, 1),
+        )
+        self.assertEqual(received, {"orders": 2, "lines": 3, "units": 10})
+        self.assertEqual(self.Stock(), {
+            (self.pen.pk, self.central.pk): 9, (self.pen.pk, self.north.pk): 3, (self.ink.pk, self.central.pk): 2,
+        })
+        for order in (self.penOrder, self.inkOrder):
+            order.refresh_from_db()
+            self.assertEqual((order.OrderStatus, order.DeliveryDate), ("Delivered", date(2024, 3, 1)))
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(Kind="Receipt").values_list("StoreId", "Quantity", "Reference")),
+            sorted([
+                (self.central.pk, 5, f"Purchase order {self.penOrder.pk}"),
+                (self.north.pk, 3, f"Purchase order {self.penOrder.pk}"),
+                (self.central.pk, 2, f"Purchase order {self.inkOrder.pk}"),
+            ]),
+        )
+        # Totals follow the locations; LastPurchaseDate only ever moves forward
+        self.pen.refresh_from_db()
+        self.ink.refresh_from_db()
+        self.assertEqual((self.pen.StockLevel, self.pen.LastPurchaseDate), (12, date(2024, 3, 1)))
+        self.assertEqual((self.ink.StockLevel, self.ink.LastPurchaseDate), (2, date(2024, 6, 1)))
+
+    def test_bad_deliveries_write_nothing(self):
+        good = (self.penOrder.pk, self.central.pk, 5)
+        for line, message in (
+            ((self.penOrder.pk, self.north.pk, 0), "greater than zero"),
+            ((999999, self.central.pk, 1), "Unknown purchase order"),
+            ((self.closedOrder.pk, self.central.pk, 1), "already delivered or cancelled"),
+            ((self.inkOrder.pk, 999999, 1), "Unknown store"),
+        ):
+            with self.subTest(message=message):
+                with self.assertRaisesMessage(ValueError, message):
+                    PurchaseOrder.ReceiveDeliveries([good, line])
+        self.assertEqual(self.Stock(), {(self.pen.pk, self.central.pk): 4})
+        self.assertEqual(PurchaseOrder.objects.filter(OrderStatus="Delivered").count(), 1)
+        self.assertFalse(StockMovement.objects.filter(Kind="Receipt").exists())
+
+    def test_receive_view(self):
+        url = reverse("purchase-order-receive")
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+        line = {"purchase_order": self.penOrder.pk, "store": self.north.pk, "quantity": 2}
+
+        self.assertEqual(self.client.get(url).status_code, 405)
+        for body in ("not json", {"lines": "none"}, {"lines": [{"store": 1}]},
+                     {"lines": [line], "delivery_date": "2024-02-30"}):
+            with self.subTest(body=body):
+                response = self.client.post(url, body, content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
 
-# Create your tests here.
+        body = {"lines": [line], "delivery_date": "2024-03-01"}
+        response = self.client.post(url, body, content_type="application/json")
+        self.assertEqual(response.json(), {"orders": 1, "lines": 1, "units": 2})
+        self.assertEqual(self.Stock()[(self.pen.pk, self.north.pk)], 2)
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path("purchase-orders/", views.PurchaseOrderListView, name="purchase-order-list"),
+    path("purchase-orders/receive/", views.ReceiveDeliveryView, name="purchase-order-receive"),
+]
@@ -1,3 +1,51 @@
-from django.shortcuts import render
+import json
 
-# Create your views here.
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.utils.dateparse import parse_date
+
+from app.paginator import KeysetListView, ParseId
+from .models import PurchaseOrder
+
+PurchaseOrderListView = KeysetListView(
+    PurchaseOrder,
+    ["PurchaseOrderID", "OrderDate", "DeliveryDate", "OrderStatus", "TotalAmount", "ProductID",
+     "ProductID__ProductName"],
+    {
+        "status": ("OrderStatus", str),  # Leading column of po_status_delivery_idx
+        "product": ("ProductID", ParseId),
+    },
+)
+
+
+@staff_member_required
+def ReceiveDeliveryView(request):
+    # -------------------
+    # Receive a delivery from a JSON body:
+    # {"delivery_date": "YYYY-MM-DD" (optional), "lines": [{"purchase_order": 1, "store": 2, "quantity": 10}, ...]}
+    # -------------------
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    try:
+        body = json.loads(request.body or b"{}")
+        if not isinstance(body, dict) or not isinstance(body.get("lines"), list):
+            raise ValueError("Request body must be an object with a list of lines.")
+
+        deliveryDate = body.get("delivery_date")
+        if deliveryDate is not None and parse_date(str(deliveryDate)) is None:
+            raise ValueError(f"Invalid delivery_date: {deliveryDate}")
+
+        lines = []
+        for number, line in enumerate(body["lines"], start=1):
+            try:
+                lines.append((int(line["purchase_order"]), int(line["store"]), int(line["quantity"])))
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"Line {number} needs integer purchase_order, store and quantity.")
+
+        received = PurchaseOrder.ReceiveDeliveries(lines, parse_date(deliveryDate) if deliveryDate else None)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Request body must be a JSON object."}, status=400)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse(received)
@@ -0,0 +1,213 @@
+# Repeatable latency/query-count benchmarks for the ERP hot paths
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+from datetime import date, datetime, timedelta
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from .instrumentation import Percentile
+from .reportcache import GetReportCache
+
+
+class Rollback(Exception):
+    # Raised to undo a benchmark run that writes
+    pass
+
+
+def GetBenchmarks(rng):
+    # Benchmark name -> (callable taking no arguments, whether it writes)
+    from HR.models import Staff
+    from Inventory.models import Product, ProductLocation, Store
+    from Procurement.models import Supplier
+    from Sales import analytics
+    from .facade import Facade
+
+    productIds = list(Product.objects.values_list("ProductID", flat=True))
+    storeIds = list(Store.objects.values_list("StoreId", flat=True))
+    staffIds = list(Staff.objects.values_list("EmployeeID", flat=True))
+    supplierIds = list(Supplier.objects.values_list("SupplierID", flat=True))
+    stocked = list(ProductLocation.objects.filter(Quantity__gt=0).values_list("ProductID", "StoreId")[:1000])
+    if not (productIds and storeIds and staffIds and supplierIds and stocked):
+        raise ValueError("Benchmarks need data; run the generatedata command first.")
+
+    today = date.today()
+
+    def SalesPerformance():
+        Facade().GetSalesPerformance(today - timedelta(days=30), today)
+
+    def TriggerPurchaseOrder():
+        Facade().TriggerPurchaseOrder(rng.choice(productIds))
+
+    def TriggerPurchaseOrders():
+        Facade().TriggerPurchaseOrders(rng.sample(productIds, min(100, len(productIds))))
+
+    def GetStockLevel():
+        Product(ProductID=rng.choice(productIds)).GetStockLevel()
+
+    def TransferStock():
+        productId, fromStore = rng.choice(stocked)
+        toStore = rng.choice([storeId for storeId in storeIds if storeId != fromStore] or storeIds)
+        Product(ProductID=productId).TransferStock(fromStore, toStore, 1)
+
+    def ViewPerformance():
+        Staff.objects.get(EmployeeID=rng.choice(staffIds)).ViewPerformance()
+
+    def ViewSupplierPerformance():
+        Supplier(SupplierID=rng.choice(supplierIds)).ViewSupplierPerformance()
+
+    benchmarks = {
+        "Facade.GetSalesPerformance": (SalesPerformance, False),
+        "Facade.TriggerPurchaseOrder": (TriggerPurchaseOrder, True),
+        "Facade.TriggerPurchaseOrders": (TriggerPurchaseOrders, True),
+        "Product.GetStockLevel": (GetStockLevel, False),
+        "Product.TransferStock": (TransferStock, True),
+        "Staff.ViewPerformance": (ViewPerformance, False),
+        "Supplier.ViewSupplierPerformance": (ViewSupplierPerformance, False),
+    }
+
+    if analytics.np is not None:  # In-memory snapshot; the first (warmup) run pays for the load
+        def SnapshotSalesPerformance():
+            analytics.GetSalesSnapshot().GetSalesPerformance(today - timedelta(days=30), today)
+
+        benchmarks["SalesSnapshot.GetSalesPerformance"] = (SnapshotSalesPerformance, False)
+    return benchmarks
+
+
+def GetScalingBenchmarks(workerCounts, source="sales", partition="store"):
+    # Company-wide reports from the parallel engine at each worker count, over the full history
+    from . import reportengine
+
+    benchmarks = {}
+    for workers in workerCounts:
+        def SalesPerformance(workers=workers):
+            reportengine.GetSalesPerformance(workers=workers, partition=partition, source=source)
+
+        def StorePerformance(workers=workers):
+            reportengine.GetStorePerformance(workers=workers, partition=partition, source=source)
+
+        benchmarks[f"ReportEngine.GetSalesPerformance[workers={workers}]"] = (SalesPerformance, False)
+        benchmarks[f"ReportEngine.GetStorePerformance[workers={workers}]"] = (StorePerformance, False)
+    return benchmarks
+
+
+def TimeBenchmark(func, writes, repeat, warmup, clearCache):
+    # Run func repeat times (after warmup runs) and report latency percentiles and query counts
+    timings, queries = [], []
+    for run in range(warmup + repeat):
+        if clearCache:
+            GetReportCache().clear()
+
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            if writes:
+                try:
+                    with transaction.atomic():
+                        func()
+                        raise Rollback()  # Leave the dataset unchanged for the next run
+                except Rollback:
+                    pass
+            else:
+                func()
+            elapsed = time.perf_counter() - start
+
+        if run >= warmup:
+            timings.append(elapsed * 1000)
+            queries.append(len(context.captured_queries))
+
+    return {
+        "runs": repeat,
+        "p50_ms": Percentile(timings, 50),
+        "p95_ms": Percentile(timings, 95),
+        "mean_ms": sum(timings) / len(timings),
+        "min_ms": min(timings),
+        "queries_p50": Percentile(queries, 50),
+        "queries_max": max(queries),
+    }
+
+
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+import {module}
+print(json.dumps({{"django_setup_ms": (setup - start) * 1000, "facade_import_ms": (time.perf_counter() - setup) * 1000}}))
+"""
+
+
+def MeasureStartup(runs=5, constructions=10000):
+    # Cold-start cost in fresh interpreters (django.setup() and importing the facade module), plus the
+    # per-request cost of constructing a Facade compared with binding the three querysets eagerly
+    from Inventory.models import Product, Store
+    from Sales.models import Sales
+    from .facade import Facade
+
+    script = STARTUP_SCRIPT.format(module=Facade.__module__)
+    samples = []
+    for _ in range(runs):
+        child = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True, env=os.environ.copy()
+        )
+        samples.append(json.loads(child.stdout.strip().splitlines()[-1]))
+
+    def EagerBinding():  # What every Facade() used to do
+        Sales.objects.all(), Store.objects.all(), Product.objects.all()
+
+    return {
+        "runs": runs,
+        "django_setup_ms_p50": Percentile([sample["django_setup_ms"] for sample in samples], 50),
+        "facade_import_ms_p50": Percentile([sample["facade_import_ms"] for sample in samples], 50),
+        "facade_construct_us": timeit.timeit(Facade, number=constructions) / constructions * 1e6,
+        "eager_binding_us": timeit.timeit(EagerBinding, number=constructions) / constructions * 1e6,
+    }
+
+
+def GetDatasetSize():
+    from Inventory.models import Product, ProductLocation, Store
+    from Procurement.models import PurchaseOrder
+    from Sales.models import Sales
+
+    return {
+        model.__name__: model.objects.count()
+        for model in (Sales, Product, ProductLocation, Store, PurchaseOrder)
+    }
+
+
+def RunBenchmarks(names=None, repeat=20, warmup=2, clearCache=True, seed=42, reportWorkers=None,
+                  reportSource="sales", reportPartition="store", startupRuns=0):
+    # Run the selected benchmarks and return a JSON-serialisable result document
+    rng = random.Random(seed)
+    benchmarks = GetBenchmarks(rng)
+    if reportWorkers:  # Report engine scaling runs, one entry per worker count
+        benchmarks.update(GetScalingBenchmarks(reportWorkers, reportSource, reportPartition))
+    unknown = set(names or []) - set(benchmarks)
+    if unknown:
+        raise ValueError(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    results = {}
+    for name, (func, writes) in benchmarks.items():
+        if names and name not in names:
+            continue
+        results[name] = TimeBenchmark(func, writes, repeat, warmup, clearCache)
+
+    document = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "database": connection.vendor,
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "repeat": repeat,
+        "report_cache_cleared": clearCache,
+        "dataset": GetDatasetSize(),
+        "results": results,
+    }
+    if startupRuns:
+        document["startup"] = MeasureStartup(startupRuns)
+    return document
@@ -0,0 +1,117 @@
+# Streaming CSV/NDJSON exports of the large ERP tables
+import csv
+import io
+import json
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+
+from .paginator import ParseDate
+
+EXPORT_CHUNK_SIZE = 2000  # Rows fetched per database round trip and written per streamed chunk
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def GetExportDatasets():
+    # Dataset name -> (model, exported columns, date column used for range filters)
+    from Inventory.models import ProductLocation
+    from Procurement.models import PurchaseOrder
+    from Sales.models import Sales
+
+    return {
+        "sales": (
+            Sales,
+            ["SalesID", "SaleDate", "StoreID", "ProductID", "EmployeeID", "PaymentMethod", "TotalAmount"],
+            "SaleDate",
+        ),
+        "purchaseorders": (
+            PurchaseOrder,
+            ["PurchaseOrderID", "OrderDate", "DeliveryDate", "ProductID", "OrderStatus", "TotalAmount"],
+            "OrderDate",
+        ),
+        "stock": (
+            ProductLocation,
+            ["ProductLocationID", "ProductID", "StoreId", "Quantity", "Date"],
+            "Date__date",
+        ),
+    }
+
+
+def GetExportRows(dataset, start_date=None, end_date=None):
+    # Build the (columns, lazy row iterator) pair for a dataset; rows are tuples straight from values_list
+    datasets = GetExportDatasets()
+    if dataset not in datasets:
+        raise KeyError(dataset)
+    model, columns, dateColumn = datasets[dataset]
+
+    queryset = model.objects.all()
+    if start_date:
+        queryset = queryset.filter(**{f"{dateColumn}__gte": start_date})
+    if end_date:
+        queryset = queryset.filter(**{f"{dateColumn}__lte": end_date})
+
+    # Primary-key order keeps extracts stable; iterator() avoids caching the result set in memory
+    rows = queryset.order_by("pk").values_list(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return columns, rows
+
+
+def IterCsv(columns, rows):
+    # Yield CSV text in chunks of EXPORT_CHUNK_SIZE rows, header first
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def IterNdjson(columns, rows):
+    # Yield one JSON object per line, in chunks of EXPORT_CHUNK_SIZE rows
+    encoder = DjangoJSONEncoder()
+    lines = []
+    for row in rows:
+        lines.append(encoder.encode(dict(zip(columns, row))))
+        if len(lines) >= EXPORT_CHUNK_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def IterExport(dataset, exportFormat="csv", start_date=None, end_date=None):
+    # Stream a dataset in the requested format
+    columns, rows = GetExportRows(dataset, start_date, end_date)
+    if exportFormat == "ndjson":
+        return IterNdjson(columns, rows)
+    return IterCsv(columns, rows)
+
+
+@staff_member_required
+def ExportView(request, dataset):
+    # Stream an export; memory use stays flat however many rows the dataset holds
+    if dataset not in GetExportDatasets():
+        raise Http404(f"Unknown export dataset: {dataset}")
+
+    exportFormat = request.GET.get("format", "csv")
+    if exportFormat not in EXPORT_FORMATS:
+        return JsonResponse({"error": f"Unsupported format: {exportFormat}"}, status=400)
+
+    dates = {}
+    for param in ("start_date", "end_date"):
+        value = request.GET.get(param)
+        try:
+            dates[param] = ParseDate(value) if value else None
+        except ValueError as e:
+            return JsonResponse({"error": f"Invalid {param}: {e}"}, status=400)
+
+    response = StreamingHttpResponse(
+        IterExport(dataset, exportFormat, **dates), content_type=EXPORT_FORMATS[exportFormat]
+    )
+    response["Content-Disposition"] = f'attachment; filename="{dataset}.{exportFormat}"'
+    return response
@@ -1,74 +1,261 @@
-# Imports for managing inventory, procurement, and sales functionality
-from Inventory import Product
-from Procurement import Supplier, PurchaseOrder
-from Sales.models import Sales
-from Inventory.models import Product, Store
+# Facade over the inventory, procurement and sales subsystems. Subsystem models are imported inside the
+# methods that use them, so importing or constructing a Facade costs nothing until a report actually runs.
+import functools
+
+from .reportcache import CachedReport
+from .routers import ReportingDatabase
+
+REQUEST_FACADE_ATTRIBUTE = "_erp_facades"
+
+
+def Memoized(method):
+    # Remember a read-only method's result on the Facade instance, i.e. for the lifetime of one request
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        if key not in self.memo:
+            self.memo[key] = method(self, *args, **kwargs)
+        return self.memo[key]
+    return wrapper
+
+
+def ParseProductIds(product_ids):
+    # Product ids from a job or API payload as a set of ints; payloads may carry "1" for 1
+    if isinstance(product_ids, (str, bytes, dict)) or not hasattr(product_ids, "__iter__"):
+        raise ValueError(f"product_ids must be a list of product ids, got {product_ids!r}")
+    parsed = set()
+    for productId in product_ids:
+        if isinstance(productId, bool) or not isinstance(productId, (int, str)) or not str(productId).isdigit():
+            raise ValueError(f"Invalid product id: expected a positive integer, got {productId!r}")
+        parsed.add(int(productId))
+    return parsed
+
 
 class Facade:  # Facade pattern to simplify complex subsystem interactions
-    def __init__(self):
-        # Initialise with all records from core business models
-        self.sales = Sales.objects.all()    # All sales records
-        self.stores = Store.objects.all()   # All store locations  
-        self.products = Product.objects.all()   # All product inventory
+    def __init__(self, sales=None, stores=None, products=None):
+        # Optional pre-filtered querysets scope every report and action, e.g. to one store or tenant
+        self.scopedSales = sales
+        self.scopedStores = stores
+        self.scopedProducts = products
+        self.memo = {}
 
+    @classmethod
+    def ForRequest(cls, request, **scope):
+        # The request's Facade for this scope, created on first use so later calls share memoized results
+        facades = request.__dict__.setdefault(REQUEST_FACADE_ATTRIBUTE, {})
+        facade = cls(**scope)
+        return facades.setdefault(facade.GetReportScope(), facade)
 
-    def GetSalesPerformance(self, start_date=None, end_date=None):
-        try:
-            from django.db.models import Sum  # Import for aggregation operations
+    @property
+    def sales(self):
+        # Sales records in scope
+        if self.scopedSales is not None:
+            return self.scopedSales
+        from Sales.models import Sales
+        return Sales.objects.all()
+
+    @property
+    def stores(self):
+        # Store locations in scope
+        if self.scopedStores is not None:
+            return self.scopedStores
+        from Inventory.models import Store
+        return Store.objects.all()
 
-            sales_queryset = self.sales
-            if start_date:  # Apply date filters if provided
-                sales_queryset = sales_queryset.filter(DateOfSale__gte=start_date)
+    @property
+    def products(self):
+        # Product inventory in scope
+        if self.scopedProducts is not None:
+            return self.scopedProducts
+        from Inventory.models import Product
+        return Product.objects.all()
+
+    def GetReportScope(self):
+        # Part of every cached report key, so scoped and unscoped results never share cache entries
+        return tuple(
+            str(queryset.values("pk").query) if queryset is not None else None
+            for queryset in (self.scopedSales, self.scopedStores, self.scopedProducts)
+        )
+
+    def GetScopedRollup(self, start_date=None, end_date=None):
+        # Rows to aggregate for the sales reports: the daily rollup narrowed to the scoped stores and products,
+        # or the scoped Sales rows themselves when a sales queryset was given (the rollup cannot express it)
+        if self.scopedSales is not None:
+            sales_queryset = self.scopedSales
+            if start_date:
+                sales_queryset = sales_queryset.filter(SaleDate__gte=start_date)
             if end_date:
-                sales_queryset = sales_queryset.filter(DateOfSale__lte=end_date)
+                sales_queryset = sales_queryset.filter(SaleDate__lte=end_date)
+            return sales_queryset
 
-            # Group sales by store and calculate totals
-            store_sales = (
-                sales_queryset.values("StoreID__StoreName")
-                .annotate(TotalSales=Sum("TotalAmount"))
-                .order_by("StoreId__StoreName")
-            )
+        from Sales.models import SalesDailyRollup
 
-            # Group sales by store and product with totals
-            product_sales = (
-                sales_queryset.values("StoreId__StoreName", "ProductID__ProductName")
-                .annotate(TotalSales=Sum("TotalAmount"))
-                .order_by("ProductID__ProductName")
-            )
+        sales_queryset = SalesDailyRollup.FilterDates(start_date, end_date).using(ReportingDatabase())
+        if self.scopedStores is not None:
+            sales_queryset = sales_queryset.filter(StoreID__in=self.scopedStores.values("pk"))
+        if self.scopedProducts is not None:
+            sales_queryset = sales_queryset.filter(ProductID__in=self.scopedProducts.values("pk"))
+        return sales_queryset
 
-            return {"store_sales": list(store_sales), "product_sales": list(product_sales)}
+    def GetSalesPerformance(self, start_date=None, end_date=None, parallel=False):
+        try:
+            unscoped = all(queryset is None for queryset in (self.scopedSales, self.scopedStores, self.scopedProducts))
+            # Company-wide run split by store across REPORT_ENGINE["WORKERS"] processes; for jobs and
+            # management commands only, since every call starts a process pool
+            if parallel and unscoped:
+                from .reportengine import GetSalesPerformance
+                return GetSalesPerformance(start_date, end_date)
+
+            # Store-level and product-level totals are independent, so callers may also run them concurrently
+            return {
+                "store_sales": self.GetStoreSales(start_date, end_date),
+                "product_sales": self.GetProductSales(start_date, end_date),
+            }
 
         except Exception as e:  # Handle aggregation errors
             raise ValueError(f"Error generating sales performance graph: {str(e)}")
 
+    @Memoized
+    @CachedReport("GetStoreSales")
+    def GetStoreSales(self, start_date=None, end_date=None):
+        from django.db.models import Sum  # Import for aggregation operations
+
+        # Daily rollup rows already hold per store/product totals for each date
+        sales_queryset = self.GetScopedRollup(start_date, end_date)
+
+        # Group sales by store and calculate totals
+        store_sales = (
+            sales_queryset.values("StoreID__StoreName")
+            .annotate(TotalSales=Sum("TotalAmount"))
+            .order_by("StoreID__StoreName")
+        )
+        return list(store_sales)
+
+    @Memoized
+    @CachedReport("GetProductSales")
+    def GetProductSales(self, start_date=None, end_date=None):
+        from django.db.models import Sum  # Import for aggregation operations
+
+        sales_queryset = self.GetScopedRollup(start_date, end_date)
+
+        # Group sales by store and product with totals
+        product_sales = (
+            sales_queryset.values("StoreID__StoreName", "ProductID__ProductName")
+            .annotate(TotalSales=Sum("TotalAmount"))
+            .order_by("ProductID__ProductName")
+        )
+        return list(product_sales)
+
+    @Memoized
+    @CachedReport("GetStorePerformance")
+    def GetStorePerformance(self, start_date=None, end_date=None):
+        # Store.ViewStorePerformance for every store, from recorded sales, as one grouped query on the rollup.
+        # The report engine runs it inline here; its process pool is only for commands and jobs
+        from .reportengine import GetStorePerformance
+
+        performance = GetStorePerformance(start_date, end_date, workers=1)
+        if self.scopedStores is not None:  # The engine works company-wide; keep the scoped stores only
+            storeIds = set(self.scopedStores.values_list("pk", flat=True))
+            performance = [row for row in performance if row["StoreId"] in storeIds]
+        return performance
+
+    @staticmethod
+    def AnnotateOnOrder(products):
+        # OnOrder: the product still has an open (not delivered or cancelled) purchase order; shared by the
+        # single and batch reorder paths so neither raises a second order before the first is received
+        from django.db.models import Exists, OuterRef
+        from Procurement.models import CLOSED_ORDER_STATUSES, PurchaseOrder
+
+        openOrders = PurchaseOrder.objects.filter(ProductID=OuterRef("pk")).exclude(
+            OrderStatus__in=CLOSED_ORDER_STATUSES
+        )
+        return products.annotate(OnOrder=Exists(openOrders))
+
     def TriggerPurchaseOrder(self, productId):
         try:
-            product = Product.objects.get(ProductId=productId)  # Get product details
-            currentStock = product.GetStockLevel()  # Check current inventory level
+            from Procurement.models import PurchaseOrder
 
-            if currentStock < product.ReorderLevel:  # Stock below threshold
-                supplier = Supplier.objects.get(SupplierID=product.SupplierID.SupplierID)  # Get product supplier
+            product = self.AnnotateOnOrder(self.products).get(ProductID=productId)  # Get product details
+            currentStock = product.GetStockLevel()  # Check current inventory level
 
-                if not supplier.exists():  # Validate supplier existence
+            if currentStock < product.ReorderQuantity:  # Stock below threshold
+                if product.OnOrder:  # Already reordered; wait for that delivery
+                    return f"Product ID {productId} already has an open purchase order. No purchase order needed."
+                if product.SupplierID_id is None:  # Validate supplier existence
                     return f"No supplier found for product ID {productId}."
 
-                reorderQuantity = product.ReorderLevel - currentStock  # Calculate needed quantity
+                reorderQuantity = product.ReorderQuantity - currentStock  # Calculate needed quantity
                 totalAmount = reorderQuantity * product.Price  # Calculate order cost
 
                 # Create PO with necessary details
                 purchaseOrder = PurchaseOrder.CreatePurchaseOrder(
                     product=product,
                     totalAmount=totalAmount,
+                    deliveryDate=None,
                     orderStatus="Pending",
-                    SupplierID=supplier
                 )
 
                 return f"Purchase order {purchaseOrder.PurchaseOrderID} created for product ID {productId} with quantity {reorderQuantity}."
             else:
                 return f"Stock level ({currentStock}) for product ID {productId} is sufficient. No purchase order needed."
 
-        except Product.DoesNotExist:  # Handle invalid product ID
+        except self.products.model.DoesNotExist:  # Handle invalid product ID
             return f"Product ID {productId} does not exist."
         except Exception as e:  # Catch other potential errors
             return f"Error triggering purchase order: {str(e)}"
 
+    def TriggerPurchaseOrders(self, product_ids=None):
+        # Batch version of TriggerPurchaseOrder: one read of the materialised Shortfall, one bulk insert.
+        # Products that still have an open (not delivered or cancelled) order are skipped and listed
+        # under "on_order", so repeated passes do not pile up duplicate orders before delivery
+        from Procurement.models import PurchaseOrder
+
+        products = self.products
+        if product_ids is not None:  # Restrict the pass to the requested products
+            product_ids = ParseProductIds(product_ids)  # ValueError names the first bad id
+            products = products.filter(ProductID__in=product_ids)
+
+        # Shortfall (ReorderQuantity - StockLevel) is the same definition the low-stock watchlist reads
+        stock_levels = (
+            self.AnnotateOnOrder(products)
+            .values_list("ProductID", "Price", "SupplierID", "Shortfall", "OnOrder")
+            .order_by("ProductID")
+        )
+
+        report = {"checked": 0, "sufficient": 0, "created": [], "on_order": [], "no_supplier": [], "missing": []}
+        orders = []  # (productId, reorderQuantity, totalAmount) for every product below threshold
+        found = set()
+
+        for productId, price, supplierId, shortfall, onOrder in stock_levels:
+            found.add(productId)
+            report["checked"] += 1
+
+            if shortfall <= 0:  # Stock is sufficient
+                report["sufficient"] += 1
+            elif onOrder:  # Already reordered; wait for that delivery
+                report["on_order"].append(productId)
+            elif supplierId is None:  # Nobody to order from
+                report["no_supplier"].append(productId)
+            else:
+                reorderQuantity = shortfall
+                orders.append((productId, reorderQuantity, reorderQuantity * price))
+
+        if product_ids is not None:  # Report requested IDs that matched no product
+            report["missing"] = sorted(product_ids - found)
+
+        # Insert every purchase order in one transaction
+        purchaseOrders = PurchaseOrder.CreatePurchaseOrders(
+            [(productId, totalAmount) for productId, _, totalAmount in orders],
+            deliveryDate=None,
+            orderStatus="Pending",
+        )
+
+        for purchaseOrder, (productId, reorderQuantity, totalAmount) in zip(purchaseOrders, orders):
+            report["created"].append({
+                "PurchaseOrderID": purchaseOrder.PurchaseOrderID,
+                "ProductID": productId,
+                "Quantity": reorderQuantity,
+                "TotalAmount": totalAmount,
+            })
+
+        return report
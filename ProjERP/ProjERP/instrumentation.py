@@ -0,0 +1,283 @@
+# Per-request query count and latency instrumentation
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+DEFAULTS = {
+    "SAMPLE_RATE": 0.1,  # Fraction of requests recorded
+    "BUFFER_SIZE": 10000,  # Requests kept in the in-process ring buffer, and per spool file before it rotates
+    "SPOOL_DIR": None,  # Directory new records are appended to for the querystats command
+    "FLUSH_EVERY": 100,  # Recorded requests between spool writes
+    "SPOOL_RETENTION": 86400,  # Seconds a dead process's spool files are kept before they are pruned
+    "MAX_DUPLICATES": 5,  # Duplicate query signatures kept per request
+}
+
+
+def GetConfig():
+    return {**DEFAULTS, **getattr(settings, "QUERY_INSTRUMENTATION", {})}
+
+
+RECORDS = deque(maxlen=GetConfig()["BUFFER_SIZE"])  # Ring buffer of per-request records
+PENDING = deque(maxlen=GetConfig()["BUFFER_SIZE"])  # Records not yet appended to the spool file
+FLUSH_LOCK = threading.Lock()
+SPOOL_LOCK = threading.Lock()  # Held by the background thread writing the spool; at most one runs
+SPOOLED = {"count": 0}  # Records in this process's current spool file
+
+# Recorder of the sampled request being served. Context variables follow the request into
+# sync_to_async worker threads and asyncio tasks, so their queries are counted too.
+ACTIVE_RECORDER = ContextVar("ACTIVE_RECORDER", default=None)
+
+
+class QueryRecorder:
+    # execute_wrapper callable counting queries, summing their time and counting repeated statements
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.signatures = Counter()
+        self.lock = threading.Lock()  # Queries of one request may run on several threads at once
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.duration += elapsed
+                self.count += 1
+                self.signatures[sql] += 1  # Parameters are not part of the SQL text, so repeats share a signature
+
+    def GetDuplicates(self, limit):
+        return [
+            {"sql": sql[:300], "count": count}
+            for sql, count in self.signatures.most_common(limit)
+            if count > 1
+        ]
+
+
+def RecordQuery(execute, sql, params, many, context):
+    # Installed on every connection of every thread; hands the query to the active request's recorder
+    recorder = ACTIVE_RECORDER.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def InstallRecorder(connection, **kwargs):
+    # Inserted first so execute_wrapper() blocks, which pop the last wrapper, leave it in place
+    if RecordQuery not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, RecordQuery)
+
+
+connection_created.connect(InstallRecorder, dispatch_uid="query-instrumentation")
+
+
+class QueryInstrumentationMiddleware:
+    # Records wall time, query count, DB time and N+1 signatures for a sample of requests, sync or async
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = GetConfig()
+        self.recorded = 0
+        self.isAsync = iscoroutinefunction(get_response)
+        if self.isAsync:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.isAsync:
+            return self.CallAsync(request)
+        if random.random() >= self.config["SAMPLE_RATE"]:
+            return self.get_response(request)
+
+        recorder, token, start = self.Start()
+        try:
+            response = self.get_response(request)
+        finally:
+            ACTIVE_RECORDER.reset(token)
+        self.Record(request, response, recorder, start)
+        return response
+
+    async def CallAsync(self, request):
+        if random.random() >= self.config["SAMPLE_RATE"]:
+            return await self.get_response(request)
+
+        recorder, token, start = self.Start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            ACTIVE_RECORDER.reset(token)
+        self.Record(request, response, recorder, start)
+        return response
+
+    def Start(self):
+        # Connections opened before this module was loaded never saw connection_created
+        for connection in connections.all(initialized_only=True):
+            InstallRecorder(connection)
+        recorder = QueryRecorder()
+        return recorder, ACTIVE_RECORDER.set(recorder), time.perf_counter()
+
+    def Record(self, request, response, recorder, start):
+        elapsed = time.perf_counter() - start
+        match = getattr(request, "resolver_match", None)
+        record = {
+            "view": match.view_name if match else request.path,
+            "method": request.method,
+            "status": response.status_code,
+            "timestamp": time.time(),
+            "wall_ms": elapsed * 1000,
+            "queries": recorder.count,
+            "db_ms": recorder.duration * 1000,
+            "duplicates": recorder.GetDuplicates(self.config["MAX_DUPLICATES"]),
+        }
+        RECORDS.append(record)
+        PENDING.append(record)
+        self.MaybeFlush()
+
+    def MaybeFlush(self):
+        if not self.config["SPOOL_DIR"]:
+            return
+        with FLUSH_LOCK:
+            self.recorded += 1
+            if self.recorded % self.config["FLUSH_EVERY"]:
+                return
+        StartFlush(self.config)
+
+
+def StartFlush(config):
+    # Write the pending records on a background thread, off the request path; skipped while one is running
+    if not SPOOL_LOCK.acquire(blocking=False):
+        return None
+
+    def Flush():
+        try:
+            FlushRecords(config["SPOOL_DIR"], config["BUFFER_SIZE"])
+            PruneSpool(config["SPOOL_DIR"], config["SPOOL_RETENTION"])
+        finally:
+            SPOOL_LOCK.release()
+
+    thread = threading.Thread(target=Flush, name="querystats-flush", daemon=True)
+    thread.start()
+    return thread
+
+
+def GetSpoolPath(spoolDir, pid, rotated=False):
+    return os.path.join(spoolDir, f"querystats-{pid}{'.1' if rotated else ''}.ndjson")
+
+
+def FlushRecords(spoolDir, rotateAfter=DEFAULTS["BUFFER_SIZE"]):
+    # -------------------
+    # Append the records recorded since the last flush to this process's spool file, one JSON object per
+    # line. Once the file holds rotateAfter records it becomes the ".1" file (replacing the previous one),
+    # so each process keeps at most two files of bounded size.
+    # -------------------
+    records = []
+    while PENDING:
+        records.append(PENDING.popleft())
+    if not records:
+        return 0
+
+    os.makedirs(spoolDir, exist_ok=True)
+    path = GetSpoolPath(spoolDir, os.getpid())
+    if SPOOLED["count"] >= rotateAfter and os.path.exists(path):
+        os.replace(path, GetSpoolPath(spoolDir, os.getpid(), rotated=True))
+        SPOOLED["count"] = 0
+    with open(path, "a", encoding="utf-8") as spool:
+        spool.write("".join(json.dumps(record) + "\n" for record in records))
+    SPOOLED["count"] += len(records)
+    return len(records)
+
+
+def IsRunning(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # Exists, owned by another user
+        return True
+    return True
+
+
+def PruneSpool(spoolDir, retention):
+    # Delete spool files of processes that have exited and have not written for retention seconds
+    if not spoolDir or not os.path.isdir(spoolDir):
+        return 0
+    cutoff = time.time() - retention
+    removed = 0
+    for name in os.listdir(spoolDir):
+        if not name.startswith("querystats-"):
+            continue
+        pid = name[len("querystats-"):].split(".")[0]
+        path = os.path.join(spoolDir, name)
+        if not pid.isdigit() or int(pid) == os.getpid() or IsRunning(int(pid)):
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:  # Pruned concurrently by another process
+            pass
+    return removed
+
+
+def LoadRecords(spoolDir):
+    # Read every worker's spool files; a line still being appended is skipped
+    records = []
+    if spoolDir and os.path.isdir(spoolDir):
+        for name in sorted(os.listdir(spoolDir)):
+            if name.startswith("querystats-") and name.endswith(".ndjson"):
+                with open(os.path.join(spoolDir, name), encoding="utf-8") as spool:
+                    for line in spool:
+                        try:
+                            records.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            pass
+    return records
+
+
+def Percentile(values, percent):
+    # Nearest-rank percentile of a non-empty list
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def SummariseRecords(records):
+    # Per-view percentile summary, slowest p95 first
+    byView = {}
+    for record in records:
+        byView.setdefault(record["view"], []).append(record)
+
+    summary = []
+    for view, viewRecords in byView.items():
+        wall = [record["wall_ms"] for record in viewRecords]
+        queries = [record["queries"] for record in viewRecords]
+        duplicates = Counter()
+        for record in viewRecords:
+            for duplicate in record["duplicates"]:
+                duplicates[duplicate["sql"]] += duplicate["count"]
+
+        summary.append({
+            "view": view,
+            "requests": len(viewRecords),
+            "wall_ms_p50": Percentile(wall, 50),
+            "wall_ms_p95": Percentile(wall, 95),
+            "wall_ms_p99": Percentile(wall, 99),
+            "queries_p50": Percentile(queries, 50),
+            "queries_p95": Percentile(queries, 95),
+            "db_ms_mean": sum(record["db_ms"] for record in viewRecords) / len(viewRecords),
+            "duplicates": [{"sql": sql, "count": count} for sql, count in duplicates.most_common(3)],
+        })
+
+    return sorted(summary, key=lambda row: row["wall_ms_p95"], reverse=True)
@@ -0,0 +1,164 @@
+# Paginators for admin changelists and JSON list APIs over very large tables
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.http import JsonResponse
+from django.utils.dateparse import parse_date
+from django.utils.functional import cached_property
+from django.utils.http import urlencode
+
+ESTIMATE_THRESHOLD = 100000  # Below this many rows an exact COUNT(*) is cheap enough
+KEYSET_DEFAULT_LIMIT = 100  # Rows per list API page unless ?limit= asks for fewer or more
+KEYSET_MAX_LIMIT = 1000
+
+
+class EstimatedCountPaginator(Paginator):
+    # Unfiltered PostgreSQL counts use the planner's row estimate instead of COUNT(*)
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                        [connection.ops.quote_name(queryset.model._meta.db_table)],
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] >= ESTIMATE_THRESHOLD:
+                    return row[0]
+        return super().count
+
+
+def ParseId(value):
+    if not value.isdigit():
+        raise ValueError(f"expected a positive integer, got {value!r}")
+    return int(value)
+
+
+def ParseDate(value):
+    try:
+        parsed = parse_date(value)
+    except ValueError:  # Well formed but impossible, e.g. 2025-02-30
+        parsed = None
+    if parsed is None:
+        raise ValueError(f"expected YYYY-MM-DD, got {value!r}")
+    return parsed
+
+
+def KeysetPage(queryset, cursor=None, limit=KEYSET_DEFAULT_LIMIT, descending=False, key=None):
+    # -------------------
+    # One page of rows after the cursor (the last primary key of the previous page) in primary-key order.
+    # The cursor becomes "pk > cursor" on the primary key index, so page 10,000 reads the same number of
+    # rows as page 1, unlike OFFSET which walks past every skipped row. Returns (rows, next cursor or None).
+    # With key, rows are ordered by (key, pk) and the cursor is the (key value, pk) pair of the last row, so a
+    # range filter on key and the seek both use a (key, pk) index instead of walking the primary key.
+    # -------------------
+    if key is None:
+        if cursor is not None:
+            queryset = queryset.filter(pk__lt=cursor) if descending else queryset.filter(pk__gt=cursor)
+        ordering = ["pk"]
+    else:
+        if cursor is not None:
+            value, pk = cursor
+            if descending:
+                queryset = queryset.filter(**{f"{key}__lte": value}).exclude(**{key: value, "pk__gte": pk})
+            else:
+                queryset = queryset.filter(**{f"{key}__gte": value}).exclude(**{key: value, "pk__lte": pk})
+        ordering = [key, "pk"]
+    queryset = queryset.order_by(*(f"-{name}" for name in ordering) if descending else ordering)
+    rows = list(queryset[:limit + 1])  # One extra row shows a next page
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    if isinstance(last, dict):
+        pk = last[queryset.model._meta.pk.name]
+        return rows, pk if key is None else (last[key], pk)
+    return rows, last.pk if key is None else (getattr(last, key), last.pk)
+
+
+def KeysetListView(model, fields, filters=None, rangeKey=None):
+    # -------------------
+    # Builds a staff-only JSON list view for model with keyset pagination. fields are the columns a client
+    # may project with ?fields=a,b (related names such as "StoreID__StoreName" become joins in the same
+    # query); filters maps query parameters to (lookup, parser) and should only name indexed columns.
+    # When a filter on rangeKey is given the list is ordered and paged by (rangeKey, pk) instead, which
+    # needs a (rangeKey, pk) index; its cursors then read "<value>.<pk>".
+    # Query parameters: fields, cursor, limit, order=asc|desc and the filter names. No total count is
+    # returned, since COUNT(*) over the large tables would cost more than the page itself.
+    # -------------------
+    filters = filters or {}
+    pkName = model._meta.pk.name
+    rangeField = model._meta.get_field(rangeKey) if rangeKey else None
+
+    def ParseCursor(cursor, keyed):
+        if not keyed:
+            if not cursor.isdigit():
+                raise ValueError(f"Invalid cursor: {cursor!r}")
+            return int(cursor)
+        value, _, pk = cursor.rpartition(".")
+        if not pk.isdigit():
+            raise ValueError(f"Invalid cursor: {cursor!r}")
+        try:
+            return rangeField.to_python(value), int(pk)
+        except ValidationError:
+            raise ValueError(f"Invalid cursor: {cursor!r}")
+
+    @staff_member_required
+    def view(request):
+        try:
+            requested = request.GET.get("fields")
+            columns = requested.split(",") if requested else list(fields)
+            unknown = [column for column in columns if column not in fields]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}; expected some of {', '.join(fields)}")
+
+            order = request.GET.get("order", "asc")
+            if order not in ("asc", "desc"):
+                raise ValueError(f"Invalid order: expected asc or desc, got {order!r}")
+
+            limit = request.GET.get("limit", str(KEYSET_DEFAULT_LIMIT))
+            if not limit.isdigit() or not 1 <= int(limit) <= KEYSET_MAX_LIMIT:
+                raise ValueError(f"Invalid limit: expected 1 to {KEYSET_MAX_LIMIT}, got {limit!r}")
+            limit = int(limit)
+
+            lookups = {}
+            for param, (lookup, parser) in filters.items():
+                value = request.GET.get(param)
+                if value:
+                    try:
+                        lookups[lookup] = parser(value)
+                    except ValueError as e:
+                        raise ValueError(f"Invalid {param}: {e}")
+
+            key = None
+            if rangeKey and any(lookup.split("__")[0] == rangeKey for lookup in lookups):
+                key = rangeKey
+            cursor = request.GET.get("cursor")
+            cursor = ParseCursor(cursor, key is not None) if cursor else None
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        # The primary key (and range key) is always selected because the next cursor is read from it
+        hidden = [name for name in (pkName, key) if name and name not in columns]
+        queryset = model.objects.filter(**lookups).values(*hidden, *columns)
+        rows, nextCursor = KeysetPage(queryset, cursor, limit, descending=order == "desc", key=key)
+        for row in rows:
+            for name in hidden:
+                del row[name]
+        if key and nextCursor is not None:
+            nextCursor = f"{nextCursor[0]}.{nextCursor[1]}"
+
+        nextUrl = None
+        if nextCursor is not None:
+            params = request.GET.copy()
+            params["cursor"] = nextCursor
+            nextUrl = request.path + "?" + urlencode(params, doseq=True)
+        return JsonResponse({"results": rows, "next_cursor": nextCursor, "next": nextUrl})
+
+    return view
@@ -0,0 +1,115 @@
+# Cached report results with write-driven invalidation
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import caches
+from django.db import transaction
+from django.http import JsonResponse
+
+VERSION_KEY = "reports:version"  # Bumped on every relevant write; part of every report key
+CHANGED_KEY = "reports:changed_at"  # Whole-second Unix time of the last bump, used as Last-Modified
+STATS_KEYS = {"hits": "reports:hits", "misses": "reports:misses"}
+MISSING = object()
+
+
+def GetReportCache():
+    return caches[getattr(settings, "REPORT_CACHE_ALIAS", "default")]
+
+
+def GetReportVersion():
+    # Current report version; seeded from the clock so a lost key never revives old entries
+    cache = GetReportCache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def BumpReportVersion():
+    cache = GetReportCache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:  # Key missing or evicted
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+    # Whole seconds, as If-Modified-Since carries no fraction and a float would never compare as unchanged
+    cache.set(CHANGED_KEY, int(time.time()), timeout=None)
+
+
+def GetReportChangedAt():
+    # When report data last changed, or None if no write has been seen since the cache was emptied
+    changed = GetReportCache().get(CHANGED_KEY)
+    return None if changed is None else int(changed)
+
+
+def InvalidateReports():
+    # Bump now so this transaction's own reads miss, and again on commit so results that other
+    # requests cached while the write was in flight are discarded too
+    BumpReportVersion()
+    transaction.on_commit(BumpReportVersion)
+
+
+def CountReportCache(outcome):
+    # Hit/miss counters live in the cache itself so every worker sharing the backend adds to them
+    cache = GetReportCache()
+    key = STATS_KEYS[outcome]
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def GetReportCacheStats():
+    cache = GetReportCache()
+    hits = cache.get(STATS_KEYS["hits"], 0)
+    misses = cache.get(STATS_KEYS["misses"], 0)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0,
+        "timeout": settings.CACHES[getattr(settings, "REPORT_CACHE_ALIAS", "default")].get("TIMEOUT", 300),
+    }
+
+
+def ResetReportCacheStats():
+    GetReportCache().delete_many(list(STATS_KEYS.values()))
+
+
+def GetReportKey(name, args, kwargs):
+    # Key on report name, report version and call arguments (hashed to stay backend-safe)
+    arguments = repr((args, sorted(kwargs.items())))
+    digest = hashlib.md5(arguments.encode(), usedforsecurity=False).hexdigest()
+    return f"reports:{name}:{GetReportVersion()}:{digest}"
+
+
+def CachedReport(name):
+    # Decorator caching a report method's result by name and arguments. The instance is ignored unless it
+    # defines GetReportScope(), whose result then joins the key (e.g. a Facade scoped to some stores).
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = GetReportCache()
+            scope = getattr(self, "GetReportScope", None)
+            key = GetReportKey(name, (scope(),) + args if scope else args, kwargs)
+
+            result = cache.get(key, MISSING)
+            if result is not MISSING:
+                CountReportCache("hits")
+                return result
+
+            CountReportCache("misses")
+            result = method(self, *args, **kwargs)
+            cache.set(key, result)
+            return result
+        return wrapper
+    return decorator
+
+
+@staff_member_required
+def ReportCacheStatsView(request):
+    # Hit/miss counters for tuning ERP_REPORT_CACHE_TIMEOUT
+    return JsonResponse(GetReportCacheStats())
@@ -0,0 +1,211 @@
+# Parallel report engine: company-wide aggregates split by store or date range across worker processes
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Max, Min, Sum
+
+from .routers import ReportingDatabase
+
+PARTITION_KINDS = ("store", "date")
+CENT = Decimal("0.01")
+INHERITED_CONNECTIONS = []  # A forked worker's copies of the parent's connections, kept unused until exit
+
+
+def GetSources():
+    # Source name -> (model, date field, transaction count aggregate)
+    from Sales.models import Sales, SalesDailyRollup
+
+    return {
+        "rollup": (SalesDailyRollup, "Date", Sum("TransactionCount")),
+        "sales": (Sales, "SaleDate", Count("SalesID")),
+    }
+
+
+def GetWorkerCount(workers=None):
+    return max(1, workers if workers is not None else settings.REPORT_ENGINE["WORKERS"])
+
+
+def InitWorker():
+    # -------------------
+    # Runs once in every worker process and makes sure it opens its own database connections.
+    # A forked worker shares the parent's connection sockets, and closing them here would end the parent's
+    # sessions too, so they are parked (never used, never closed) and the worker connects afresh.
+    # -------------------
+    import django
+
+    django.setup()
+    for connection in connections.all(initialized_only=True):
+        INHERITED_CONNECTIONS.append(connection.connection)
+        connection.connection = None
+
+
+def Cents(value):
+    # SQLite sums decimals as floats (2823776.45999999900000); round each partial before merging
+    return Decimal(value).quantize(CENT)
+
+
+def AggregatePartition(report, source, start_date, end_date, storeIds=None):
+    # -------------------
+    # Computes one partition's partial aggregate; runs in a worker process, or inline when serial.
+    # "sales" rows are (store name, product name, total); "stores" rows are (store id, total, transactions).
+    # storeIds of None means every store.
+    # -------------------
+    model, dateField, transactions = GetSources()[source]
+    queryset = model.objects.using(ReportingDatabase())
+    if start_date:
+        queryset = queryset.filter(**{f"{dateField}__gte": start_date})
+    if end_date:
+        queryset = queryset.filter(**{f"{dateField}__lte": end_date})
+    if storeIds is not None:
+        queryset = queryset.filter(StoreID__in=storeIds)
+
+    if report == "sales":
+        grouped = queryset.values_list("StoreID__StoreName", "ProductID__ProductName").annotate(
+            Total=Sum("TotalAmount")
+        )
+        return [(storeName, productName, Cents(total)) for storeName, productName, total in grouped.order_by()]
+    grouped = queryset.values_list("StoreID").annotate(Total=Sum("TotalAmount"), Transactions=transactions)
+    return [(storeId, Cents(total), count) for storeId, total, count in grouped.order_by()]
+
+
+def GetStorePartitions(start_date, end_date, count):
+    # Split every store into count groups of similar sales volume, largest store first into the lightest group
+    from Inventory.models import Store
+    from Sales.models import SalesDailyRollup
+
+    volumes = dict(
+        SalesDailyRollup.FilterDates(start_date, end_date).using(ReportingDatabase())
+        .values_list("StoreID").annotate(Rows=Sum("TransactionCount")).order_by()
+    )
+    storeIds = Store.objects.using(ReportingDatabase()).values_list("StoreId", flat=True)
+    ranked = sorted(((volumes.get(storeId, 0), storeId) for storeId in storeIds), reverse=True)
+
+    partitions = [[0, []] for _ in range(count)]
+    for rows, storeId in ranked:
+        lightest = min(partitions, key=lambda partition: partition[0])
+        lightest[0] += rows
+        lightest[1].append(storeId)
+    return [(start_date, end_date, storeIds) for _, storeIds in partitions if storeIds]
+
+
+def GetDatePartitions(source, start_date, end_date, count):
+    # Split the date range into count contiguous, non-overlapping ranges
+    model, dateField, _ = GetSources()[source]
+    if start_date is None or end_date is None:
+        bounds = model.objects.using(ReportingDatabase()).aggregate(First=Min(dateField), Last=Max(dateField))
+        start_date = start_date or bounds["First"]
+        end_date = end_date or bounds["Last"]
+    if start_date is None or end_date is None or start_date > end_date:
+        return []
+
+    days = (end_date - start_date).days + 1
+    count = min(count, days)
+    partitions, first = [], start_date
+    for index in range(count):
+        last = start_date + timedelta(days=days * (index + 1) // count - 1)
+        partitions.append((first, last, None))
+        first = last + timedelta(days=1)
+    return partitions
+
+
+def RunPartitioned(report, source, start_date, end_date, workers=None, partition="store"):
+    # -------------------
+    # Runs AggregatePartition over every partition and returns all partial rows together.
+    # Each call starts a process pool, so it belongs in management commands and jobs, not web requests.
+    # With one worker, or inside a transaction (whose uncommitted rows other processes cannot see),
+    # the whole range runs inline as a single query instead.
+    # -------------------
+    if source not in GetSources():
+        raise ValueError(f"Unknown report source: {source}")
+    if partition not in PARTITION_KINDS:
+        raise ValueError(f"Unknown partition kind: {partition}")
+
+    workers = GetWorkerCount(workers)
+    inTransaction = any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+    if workers == 1 or inTransaction:
+        return AggregatePartition(report, source, start_date, end_date)
+
+    # More partitions than workers keeps every worker busy when partition sizes are uneven
+    count = workers * settings.REPORT_ENGINE["PARTITIONS_PER_WORKER"]
+    if partition == "store":
+        partitions = GetStorePartitions(start_date, end_date, count)
+    else:
+        partitions = GetDatePartitions(source, start_date, end_date, count)
+    if len(partitions) <= 1:
+        return AggregatePartition(report, source, start_date, end_date)
+
+    # The caller's connections stay open; InitWorker keeps forked workers off them
+    startMethod = settings.REPORT_ENGINE["START_METHOD"]
+    if startMethod is None:
+        startMethod = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(partitions)),
+        mp_context=multiprocessing.get_context(startMethod),
+        initializer=InitWorker,
+    ) as executor:
+        futures = [
+            executor.submit(AggregatePartition, report, source, first, last, storeIds)
+            for first, last, storeIds in partitions
+        ]
+        return [row for future in futures for row in future.result()]
+
+
+def MergeTotals(rows, keyLength):
+    # Sum the partial rows per key; Decimal addition keeps money totals exact
+    merged = {}
+    for row in rows:
+        key, values = row[:keyLength], row[keyLength:]
+        current = merged.get(key)
+        merged[key] = values if current is None else tuple(a + b for a, b in zip(current, values))
+    return merged
+
+
+def GetSalesPerformance(start_date=None, end_date=None, workers=None, partition="store", source="rollup"):
+    # Same result as Facade.GetSalesPerformance, computed in parallel
+    rows = RunPartitioned("sales", source, start_date, end_date, workers, partition)
+    productTotals = MergeTotals(rows, 2)
+
+    storeTotals = {}
+    for (storeName, productName), (total,) in productTotals.items():
+        storeTotals[storeName] = storeTotals.get(storeName, Decimal(0)) + total
+
+    def NameKey(name):
+        return (name is not None, name or "")  # Unnamed groups first, as in the single-query report
+
+    return {
+        "store_sales": [
+            {"StoreID__StoreName": storeName, "TotalSales": total}
+            for storeName, total in sorted(storeTotals.items(), key=lambda item: NameKey(item[0]))
+        ],
+        "product_sales": [
+            {"StoreID__StoreName": storeName, "ProductID__ProductName": productName, "TotalSales": total}
+            for (storeName, productName), (total,) in sorted(
+                productTotals.items(), key=lambda item: (NameKey(item[0][1]), NameKey(item[0][0]))
+            )
+        ],
+    }
+
+
+def GetStorePerformance(start_date=None, end_date=None, workers=None, partition="store", source="rollup"):
+    # Store.ViewStorePerformance for every store at once, with totals taken from recorded sales
+    from Inventory.models import Store
+
+    totals = MergeTotals(RunPartitioned("stores", source, start_date, end_date, workers, partition), 1)
+    stores = Store.objects.using(ReportingDatabase()).values_list("StoreId", "StoreName", "OperatingHours")
+
+    performance = []
+    for storeId, storeName, operatingHours in stores.order_by("StoreId"):
+        total, transactions = totals.get((storeId,), (Decimal(0), 0))
+        performance.append({
+            "StoreId": storeId,
+            "StoreName": storeName,
+            "TotalSales": total,
+            "Transactions": transactions,
+            "AverageSalesPerHour": (total / operatingHours).quantize(Decimal("0.01")) if operatingHours else 0,
+        })
+    return performance
@@ -0,0 +1,67 @@
+# Database routing: read-only report aggregates may go to a "reporting" replica
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+REPORTING_ALIAS = "reporting"
+# Apps whose tables the reports read; only writes to these make later report reads go to the primary.
+# Cache-table entries (DatabaseCache), job queue bookkeeping, sessions and the like never pin.
+REPORTED_APPS = {"Finance", "HR", "Inventory", "Procurement", "Sales"}
+
+# Set once the current request (or job) has written, so its later reads see its own writes
+WROTE_TO_PRIMARY = ContextVar("WROTE_TO_PRIMARY", default=False)
+
+
+def ReportingDatabase():
+    # Alias for report queries: the replica when configured, unless this request already wrote
+    if REPORTING_ALIAS in settings.DATABASES and not WROTE_TO_PRIMARY.get():
+        return REPORTING_ALIAS
+    return "default"
+
+
+class ReportingRouter:
+    # Everything reads and writes the primary; only queries explicitly sent to ReportingDatabase() use the replica
+
+    def db_for_read(self, model, **hints):
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in REPORTED_APPS:
+            WROTE_TO_PRIMARY.set(True)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # The replica holds the same data as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPORTING_ALIAS  # The replica is fed by replication, never migrated directly
+
+
+class PrimaryStickinessMiddleware:
+    # Start every request reading reports from the replica; a write pins the rest of it to the primary.
+    # Async-capable so async views are not pushed through a sync adapter on the way in.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.isAsync = iscoroutinefunction(get_response)
+        if self.isAsync:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.isAsync:
+            return self.CallAsync(request)
+        token = WROTE_TO_PRIMARY.set(False)
+        try:
+            return self.get_response(request)
+        finally:
+            WROTE_TO_PRIMARY.reset(token)
+
+    async def CallAsync(self, request):
+        token = WROTE_TO_PRIMARY.set(False)
+        try:
+            return await self.get_response(request)
+        finally:
+            WROTE_TO_PRIMARY.reset(token)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -36,6 +37,7 @@ INSTALLED_APPS = [
     "Procurement.apps.ProcurementConfig",
     "HR.apps.HrConfig",
     "Finance.apps.FinanceConfig",
+    "Jobs.apps.JobsConfig",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -45,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "app.instrumentation.QueryInstrumentationMiddleware",  # First, so it sees every query of the request
+    "app.routers.PrimaryStickinessMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -54,6 +58,34 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Per-request query/latency sampling; summarise the spooled records with "manage.py querystats"
+QUERY_INSTRUMENTATION = {
+    "SAMPLE_RATE": float(os.environ.get("ERP_INSTRUMENTATION_SAMPLE_RATE", 0.1)),
+    "BUFFER_SIZE": 10000,
+    "SPOOL_DIR": os.environ.get("ERP_INSTRUMENTATION_SPOOL_DIR", str(BASE_DIR / "instrumentation")),
+    "FLUSH_EVERY": 100,
+}
+
+# Parallel report engine (app.reportengine): worker processes per report, partitions per worker, and the
+# multiprocessing start method (None picks "fork" where available, else "spawn")
+REPORT_ENGINE = {
+    "WORKERS": int(os.environ.get("ERP_REPORT_WORKERS", os.cpu_count() or 1)),
+    "PARTITIONS_PER_WORKER": 2,
+    "START_METHOD": os.environ.get("ERP_REPORT_START_METHOD") or None,
+}
+
+# Database-backed job queue; run the workers with "manage.py runjobs"
+JOB_QUEUE = {
+    "WORKERS": int(os.environ.get("ERP_JOB_WORKERS", 2)),
+    "POLL_INTERVAL": float(os.environ.get("ERP_JOB_POLL_INTERVAL", 1.0)),  # Seconds between polls when idle
+    "MAX_ATTEMPTS": 3,
+    "RETRY_DELAY": 30,  # Seconds before the first retry; doubles on each further attempt
+    "HEARTBEAT_INTERVAL": 60,  # Seconds between LockedAt refreshes while a job runs
+    "STALE_AFTER": 600,  # Seconds without a heartbeat before a Running job is taken to have lost its worker
+    "RECOVERY_INTERVAL": 300,  # Seconds between stale-job recovery passes in "manage.py runjobs"
+    "EXPORT_DIR": os.environ.get("ERP_JOB_EXPORT_DIR", str(BASE_DIR / "exports")),
+}
+
 ROOT_URLCONF = "app.urls"
 
 TEMPLATES = [
@@ -78,13 +110,113 @@ WSGI_APPLICATION = "app.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# ERP_DB_ENGINE picks the backend: "sqlite" (default, single-node installs) or "postgresql" (multi-worker
+# deployments). Connection details, persistence and pooling all come from ERP_DB_* environment variables.
+
+ERP_DB_ENGINE = os.environ.get("ERP_DB_ENGINE", "sqlite")
+
+if ERP_DB_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("ERP_DB_NAME", "erp"),
+            "USER": os.environ.get("ERP_DB_USER", "erp"),
+            "PASSWORD": os.environ.get("ERP_DB_PASSWORD", ""),
+            "HOST": os.environ.get("ERP_DB_HOST", "localhost"),
+            "PORT": os.environ.get("ERP_DB_PORT", "5432"),
+            "CONN_HEALTH_CHECKS": True,  # Re-validate persistent connections before reuse
+            "OPTIONS": {},
+        }
     }
+
+    if os.environ.get("ERP_DB_POOL", "1") == "1":
+        # psycopg connection pool (needs psycopg[pool]); Django requires CONN_MAX_AGE = 0 alongside it
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.environ.get("ERP_DB_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.environ.get("ERP_DB_POOL_MAX_SIZE", 10)),
+            "timeout": int(os.environ.get("ERP_DB_POOL_TIMEOUT", 10)),
+        }
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+    else:
+        DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("ERP_DB_CONN_MAX_AGE", 60))
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("ERP_DB_NAME", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": int(os.environ.get("ERP_DB_CONN_MAX_AGE", 60)),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
+    }
+
+    if os.environ.get("ERP_SQLITE_TUNING", "1") == "1":
+        # Writers wait busy_timeout ms for the lock and take it at BEGIN (IMMEDIATE) so a read-then-write
+        # transaction cannot fail with "database is locked"
+        busyTimeout = int(os.environ.get("ERP_SQLITE_BUSY_TIMEOUT", 5000))
+        pragmas = [f"PRAGMA busy_timeout={busyTimeout}", "PRAGMA temp_store=MEMORY", "PRAGMA cache_size=-64000"]
+        if os.environ.get("ERP_SQLITE_WAL") == "1":
+            # WAL lets readers run alongside the single writer. The journal mode is stored in the database file
+            # itself, so it is opt-in for deployments rather than rewriting the checked-in db.sqlite3 on every run
+            pragmas = ["PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL"] + pragmas
+        DATABASES["default"]["OPTIONS"] = {
+            "timeout": busyTimeout / 1000,
+            "transaction_mode": "IMMEDIATE",
+            "init_command": ";".join(pragmas),
+        }
+
+# Optional read replica for reporting aggregates. ERP_DB_REPORTING_NAME (and ERP_DB_REPORTING_HOST for
+# PostgreSQL) point at it; everything else is inherited from the primary. Two SQLite files work as local
+# stand-ins. Under test the replica mirrors the primary's test database.
+if os.environ.get("ERP_DB_REPORTING_NAME") or os.environ.get("ERP_DB_REPORTING_HOST"):
+    DATABASES["reporting"] = {
+        **DATABASES["default"],
+        "NAME": os.environ.get("ERP_DB_REPORTING_NAME", DATABASES["default"]["NAME"]),
+        "OPTIONS": dict(DATABASES["default"]["OPTIONS"]),
+        "TEST": {"MIRROR": "default"},
+    }
+    if os.environ.get("ERP_DB_REPORTING_HOST"):
+        DATABASES["reporting"]["HOST"] = os.environ["ERP_DB_REPORTING_HOST"]
+
+DATABASE_ROUTERS = ["app.routers.ReportingRouter"]
+
+# Test database name, e.g. a throwaway database on a local Postgres stand-in (defaults to Django's choice)
+if os.environ.get("ERP_DB_TEST_NAME"):
+    DATABASES["default"]["TEST"] = {"NAME": os.environ["ERP_DB_TEST_NAME"]}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Report results live in the "reports" cache. ERP_REPORT_CACHE selects its backend: "locmem" (default,
+# per process), "file" (shared by workers on one host) or "db" (shared by every node; run createcachetable).
+
+REPORT_CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "erp-reports",
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("ERP_REPORT_CACHE_LOCATION", str(BASE_DIR / "cache" / "reports")),
+    },
+    "db": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": os.environ.get("ERP_REPORT_CACHE_LOCATION", "erp_report_cache"),
+    },
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "reports": {
+        **REPORT_CACHE_BACKENDS[os.environ.get("ERP_REPORT_CACHE", "locmem")],
+        "TIMEOUT": int(os.environ.get("ERP_REPORT_CACHE_TIMEOUT", 300)),  # Seconds a report result is kept
+    },
+}
+
+REPORT_CACHE_ALIAS = "reports"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
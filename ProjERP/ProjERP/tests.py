@@ -0,0 +1,473 @@
+import contextvars
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+
+from Finance.models import Department
+from HR.models import Staff
+from Inventory.models import Product, ProductLocation, StockMovement, StockSnapshot, Store
+from Procurement.models import PurchaseOrder, Supplier
+from Sales.models import Sales, SalesDailyRollup
+from app import exports, instrumentation, reportcache, reportengine
+from app.facade import Facade
+from app.paginator import KeysetPage
+from app.reportcache import GetReportCache
+from app.routers import WROTE_TO_PRIMARY, PrimaryStickinessMiddleware
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite specific")
+class ReportQueryPlanTests(TestCase):
+    # Every report/lookup query must reach the large tables through an index, never a full scan
+    LARGE_TABLES = {
+        Sales._meta.db_table,
+        SalesDailyRollup._meta.db_table,
+        PurchaseOrder._meta.db_table,
+        ProductLocation._meta.db_table,
+        Product._meta.db_table,
+        Staff._meta.db_table,
+        StockMovement._meta.db_table,
+        StockSnapshot._meta.db_table,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(DepartmentName="Sales", Budget=1000)
+        cls.staff = Staff.objects.create(Name="Ann", Role="Clerk", Salary=100, DepartmentID=cls.department)
+        cls.supplier = Supplier.objects.create(
+            SupplierName="Acme", ContactDetails="-", Location="-", ContractTerms="-"
+        )
+        cls.store = Store.objects.create(
+            StoreName="Central", Location="Town", ContactNumber="123", TotalSales=0, OperatingHours=8
+        )
+        cls.other_store = Store.objects.create(
+            StoreName="North", Location="Town", ContactNumber="456", TotalSales=0, OperatingHours=8
+        )
+        cls.product = Product.objects.create(
+            ProductName="Pen", Category="Office", Price=Decimal("1.50"), ReorderQuantity=10, SupplierID=cls.supplier
+        )
+        ProductLocation.objects.create(ProductID=cls.product, StoreId=cls.store, Quantity=20)
+        Sales.objects.create(
+            PaymentMethod="Card", TotalAmount=Decimal("3.00"), StoreID=cls.store,
+            ProductID=cls.product, EmployeeID=cls.staff,
+        )
+        PurchaseOrder.CreatePurchaseOrder(cls.product, Decimal("15.00"), date.today(), "Delivered")
+
+    def setUp(self):
+        GetReportCache().clear()  # Cached report results would skip the queries under test
+
+    def AssertIndexedQueries(self, func):
+        # Run func, then EXPLAIN every read/update it issued and reject full scans of the large tables.
+        # Returns the plans, one string per statement
+        with CaptureQueriesContext(connection) as context:
+            func()
+
+        statements = [
+            query["sql"] for query in context.captured_queries
+            if query["sql"].startswith(("SELECT", "UPDATE", "DELETE"))
+        ]
+        self.assertTrue(statements, "No queries were captured")
+
+        plans = []
+        for sql in statements:
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+            for step in plan:
+                words = step.split()
+                if words[:1] == ["SCAN"] and words[1] in self.LARGE_TABLES:
+                    self.fail(f"Full scan of {words[1]}:\n{sql}\n" + "\n".join(plan))
+            plans.append("\n".join(plan))
+        return plans
+
+    def test_sales_performance(self):
+        start, end = date.today() - timedelta(days=30), date.today()
+        self.AssertIndexedQueries(lambda: Facade().GetSalesPerformance(start, end))
+
+    def test_sales_graph_and_totals(self):
+        start, end = date.today() - timedelta(days=30), date.today()
+        self.AssertIndexedQueries(lambda: Sales().GetSalesGraph(start, end))
+        self.AssertIndexedQueries(lambda: Sales().CalculateTotalSales(start, end))
+
+    def test_staff_performance(self):
+        self.AssertIndexedQueries(self.staff.ViewPerformance)
+
+    def test_staff_leaderboard(self):
+        self.AssertIndexedQueries(lambda: Staff.objects.Leaderboard(department=self.department, top=10))
+
+    def test_department_staff(self):
+        self.AssertIndexedQueries(lambda: list(self.department.GetDepartmentEmployees()))
+
+    def test_supplier_performance(self):
+        self.AssertIndexedQueries(self.supplier.ViewSupplierPerformance)
+
+    def test_supplier_scorecards(self):
+        self.AssertIndexedQueries(Supplier.GetScorecards)
+
+    def test_stock_lookups(self):
+        self.AssertIndexedQueries(self.product.GetStockLevel)
+        self.AssertIndexedQueries(
+            lambda: self.product.TransferStock(self.store, self.other_store, 5)
+        )
+
+    def test_point_in_time_stock(self):
+        StockSnapshot.TakeSnapshot()
+        self.AssertIndexedQueries(lambda: StockMovement.GetStockAt(date.today(), store=self.store))
+        self.AssertIndexedQueries(lambda: StockMovement.GetStockAt(product=self.product))
+
+    def test_receive_deliveries(self):
+        order = PurchaseOrder.CreatePurchaseOrder(self.product, Decimal("15.00"), None, "Shipped")
+        self.AssertIndexedQueries(
+            lambda: PurchaseOrder.ReceiveDeliveries([(order.pk, self.store.pk, 5), (order.pk, self.other_store.pk, 5)])
+        )
+
+    def test_low_stock_watchlist(self):
+        self.product.EditReorderLevel(50)
+        self.AssertIndexedQueries(lambda: Product.GetLowStockProducts(10))
+
+    def test_batch_reorder(self):
+        self.AssertIndexedQueries(lambda: Facade().TriggerPurchaseOrders([self.product.ProductID]))
+
+    def test_keyset_list_pages(self):
+        # Later pages seek on the primary key (or a filter's index) instead of skipping rows
+        sales = Sales.objects.values("SalesID", "StoreID__StoreName")
+        self.AssertIndexedQueries(lambda: KeysetPage(sales, cursor=1000, limit=10))
+        self.AssertIndexedQueries(lambda: KeysetPage(sales.filter(StoreID=self.store), cursor=1000, descending=True))
+        self.AssertIndexedQueries(
+            lambda: KeysetPage(PurchaseOrder.objects.filter(OrderStatus="Delivered").values("pk"), cursor=1000)
+        )
+
+    def test_keyset_date_range_pages(self):
+        # A date filter seeks the (SaleDate, SalesID) index for both the range and the page order
+        sales = Sales.objects.filter(SaleDate__gte=date.today() - timedelta(days=30)).values("SalesID", "SaleDate")
+        for cursor in (None, (date.today(), 1000)):
+            for descending in (False, True):
+                [plan] = self.AssertIndexedQueries(
+                    lambda: KeysetPage(sales, cursor, limit=10, descending=descending, key="SaleDate")
+                )
+                self.assertIn("sales_date_id_idx", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+
+class AdminChangelistQueryTests(TestCase):
+    # Changelist pages must cost the same number of queries however many rows they show
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", "admin@example.com", "password")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def CreateRows(self, count):
+        # Add count rows to every model, each with all of its foreign keys filled in
+        for _ in range(count):
+            manager = Staff.objects.create(Name="Manager", Role="Lead", Salary=200)
+            department = Department.objects.create(DepartmentName="Ops", Budget=1000, ManagerID=manager)
+            staff = Staff.objects.create(Name="Clerk", Role="Till", Salary=100, DepartmentID=department)
+            manager.AssignDepartment(department)
+            store = Store.objects.create(
+                StoreName="Store", Location="Town", ContactNumber="123",
+                ManagerId=manager, TotalSales=0, OperatingHours=8,
+            )
+            supplier = Supplier.objects.create(
+                SupplierName="Supplier", ContactDetails="-", Location="-", ContractTerms="-"
+            )
+            product = Product.objects.create(
+                ProductName="Product", Category="Cat", Price=Decimal("1.00"), ReorderQuantity=5, SupplierID=supplier
+            )
+            ProductLocation.objects.create(ProductID=product, StoreId=store, Quantity=10)
+            PurchaseOrder.CreatePurchaseOrder(product, Decimal("5.00"), None)
+            Sales.objects.create(
+                PaymentMethod="Card", TotalAmount=Decimal("2.00"), StoreID=store, ProductID=product, EmployeeID=staff
+            )
+
+    def CountChangelistQueries(self, model):
+        url = reverse(f"admin:{model._meta.app_label}_{model._meta.model_name}_changelist")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_changelist_query_count_is_constant(self):
+        self.CreateRows(2)
+        small = {model: self.CountChangelistQueries(model) for model in admin.site._registry}
+        self.CreateRows(8)
+        for model, queries in small.items():
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.CountChangelistQueries(model), queries)
+
+
+class ExportTests(TestCase):
+    # Exports stream every matching row, escaped, in bounded chunks
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", "admin@example.com", "password")
+        store = Store.objects.create(
+            StoreName="Central", Location="Town", ContactNumber="123", TotalSales=0, OperatingHours=8
+        )
+        cls.sales = [
+            Sales.objects.create(
+                PaymentMethod=method, TotalAmount=Decimal(amount), StoreID=store, SaleDate=date(2024, 1, day)
+            )
+            for day, method, amount in (
+                (1, "Card", "1.50"), (2, 'Gift card, "promo"', "2.00"), (3, "Cash\nback", "3.25"),
+                (4, "Card", "4.00"), (5, "Card", "5.00"),
+            )
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def Export(self, **params):
+        return self.client.get(reverse("export", args=["sales"]), params)
+
+    def test_csv_stream(self):
+        with mock.patch.object(exports, "EXPORT_CHUNK_SIZE", 2):
+            response = self.Export()
+            self.assertIsInstance(response, StreamingHttpResponse)
+            self.assertEqual(response["Content-Type"], "text/csv")
+            self.assertEqual(response["Content-Disposition"], 'attachment; filename="sales.csv"')
+            chunks = [chunk.decode() for chunk in response.streaming_content]
+
+        self.assertEqual(len(chunks), 3)  # Header and two rows, two rows, the last row
+        rows = list(csv.reader(io.StringIO("".join(chunks))))
+        self.assertEqual(rows[0], ["SalesID", "SaleDate", "StoreID", "ProductID", "EmployeeID", "PaymentMethod",
+                                   "TotalAmount"])
+        self.assertEqual([row[0] for row in rows[1:]], [str(sale.pk) for sale in self.sales])
+        self.assertEqual([row[5] for row in rows[1:3]], ["Card", 'Gift card, "promo"'])
+        self.assertEqual(rows[3][5], "Cash\nback")  # Quoted, so the newline stays inside the field
+
+    def test_stream_is_lazy(self):
+        # Rows are read while the response is consumed, not when the view returns
+        with CaptureQueriesContext(connection) as context:
+            response = self.Export(format="ndjson")
+            before = len(context.captured_queries)
+            lines = b"".join(response.streaming_content).decode().splitlines()
+        table = Sales._meta.db_table
+        self.assertFalse(any(table in query["sql"] for query in context.captured_queries[:before]))
+        self.assertTrue(any(table in query["sql"] for query in context.captured_queries[before:]))
+        self.assertEqual(len(lines), 5)
+
+    def test_ndjson_with_date_range(self):
+        response = self.Export(format="ndjson", start_date="2024-01-02", end_date="2024-01-03")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows, [
+            {"SalesID": self.sales[1].pk, "SaleDate": "2024-01-02", "StoreID": self.sales[1].StoreID_id,
+             "ProductID": None, "EmployeeID": None, "PaymentMethod": 'Gift card, "promo"', "TotalAmount": "2.00"},
+            {"SalesID": self.sales[2].pk, "SaleDate": "2024-01-03", "StoreID": self.sales[2].StoreID_id,
+             "ProductID": None, "EmployeeID": None, "PaymentMethod": "Cash\nback", "TotalAmount": "3.25"},
+        ])
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get(reverse("export", args=["payroll"])).status_code, 404)
+        self.assertEqual(self.Export(format="xml").status_code, 400)
+
+    def test_view_rejects_impossible_date(self):
+        response = self.Export(start_date="2025-02-30")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("start_date", response.json()["error"])
+
+    def test_commands_reject_impossible_date(self):
+        with self.assertRaisesMessage(CommandError, "Invalid end-date"):
+            call_command("exportdata", "sales", "--end-date", "2025-02-30")
+        with self.assertRaisesMessage(CommandError, "Invalid start-date"):
+            call_command("rebuildsalesrollup", "--start-date", "2025-13-01")
+
+
+@override_settings(REPORT_ENGINE={"WORKERS": 4, "PARTITIONS_PER_WORKER": 2, "START_METHOD": None})
+class ReportEngineTests(TransactionTestCase):
+    # Outside a test transaction, so the engine would fork unless the caller keeps it inline
+
+    def setUp(self):
+        GetReportCache().clear()
+        for name in ("Central", "North"):
+            store = Store.objects.create(
+                StoreName=name, Location="Town", ContactNumber="123", TotalSales=0, OperatingHours=8
+            )
+            for amount in ("0.10", "0.20", "0.10"):
+                Sales.objects.create(PaymentMethod="Card", TotalAmount=Decimal(amount), StoreID=store)
+
+    def test_partials_are_whole_cents(self):
+        for report in ("sales", "stores"):
+            for row in reportengine.AggregatePartition(report, "sales", None, None):
+                total = row[2] if report == "sales" else row[1]
+                self.assertEqual((total, total.as_tuple().exponent), (Decimal("0.40"), -2))
+
+    def test_facade_runs_inline(self):
+        # A web request must not start a process pool or close its own connections
+        with mock.patch.object(reportengine, "ProcessPoolExecutor") as pool, \
+                mock.patch.object(reportengine.connections, "close_all") as closeAll:
+            performance = Facade().GetStorePerformance()
+        pool.assert_not_called()
+        closeAll.assert_not_called()
+        self.assertEqual([row["TotalSales"] for row in performance], [Decimal("0.40")] * 2)
+
+
+class ReportingRouterTests(TestCase):
+    # Only writes to the reported tables may pin report reads to the primary
+
+    def WritesPin(self, write):
+        # Run write in a fresh context and return whether it set the pin
+        def Run():
+            WROTE_TO_PRIMARY.set(False)
+            write()
+            return WROTE_TO_PRIMARY.get()
+        return contextvars.copy_context().run(Run)
+
+    def test_erp_writes_pin(self):
+        self.assertTrue(self.WritesPin(
+            lambda: Store.objects.create(StoreName="S", Location="-", ContactNumber="1", TotalSales=0, OperatingHours=8)
+        ))
+
+    def test_bookkeeping_writes_do_not_pin(self):
+        from Jobs.models import Job
+
+        self.assertFalse(self.WritesPin(lambda: Job.objects.create(Kind="rollup")))
+        self.assertFalse(self.WritesPin(lambda: User.objects.create_user("reader")))
+
+    async def test_middleware_runs_async(self):
+        # Under ASGI the chain is awaited directly; each request starts unpinned and its pin is dropped with it
+        seen = []
+
+        async def View(request):
+            seen.append(WROTE_TO_PRIMARY.get())
+            WROTE_TO_PRIMARY.set(True)
+            return "response"
+
+        middleware = PrimaryStickinessMiddleware(View)
+        self.assertTrue(iscoroutinefunction(middleware))
+        WROTE_TO_PRIMARY.set(True)  # Left over from earlier work in this context
+        self.assertEqual(await middleware(None), "response")
+        self.assertEqual(seen, [False])
+        self.assertTrue(WROTE_TO_PRIMARY.get())  # Restored, not leaked from the view
+
+
+@override_settings(QUERY_INSTRUMENTATION={"SAMPLE_RATE": 1.0, "SPOOL_DIR": None})
+class QueryInstrumentationTests(TransactionTestCase):
+    # No open test transaction, so the async view's worker threads can read the in-memory database
+
+    def setUp(self):
+        GetReportCache().clear()
+
+    async def test_async_view_counts_worker_thread_queries(self):
+        # The validator query plus one report query on each of the two sync_to_async worker threads
+        response = await self.async_client.get(reverse("sales-performance"))
+        self.assertEqual(response.status_code, 200)
+        record = instrumentation.RECORDS[-1]
+        self.assertEqual(record["view"], "sales-performance")
+        self.assertGreaterEqual(record["queries"], 3)
+
+    def test_spool_appends_rotates_and_prunes(self):
+        with tempfile.TemporaryDirectory() as spoolDir:
+            instrumentation.SPOOLED["count"] = 0
+            instrumentation.PENDING.clear()
+            instrumentation.PENDING.extend({"view": "v", "n": n} for n in range(3))
+            self.assertEqual(instrumentation.FlushRecords(spoolDir, rotateAfter=2), 3)
+            instrumentation.PENDING.append({"view": "v", "n": 3})
+            instrumentation.FlushRecords(spoolDir, rotateAfter=2)  # Rotates the full file first
+            self.assertEqual(sorted(record["n"] for record in instrumentation.LoadRecords(spoolDir)), [0, 1, 2, 3])
+            self.assertEqual(len(os.listdir(spoolDir)), 2)
+
+            # A process id above the kernel's pid_max is never running
+            dead = instrumentation.GetSpoolPath(spoolDir, 2 ** 22 + 1)
+            with open(dead, "w") as spool:
+                spool.write("{}\n")
+            os.utime(dead, (time.time() - 7200, time.time() - 7200))
+            self.assertEqual(instrumentation.PruneSpool(spoolDir, retention=3600), 1)
+            self.assertEqual(len(os.listdir(spoolDir)), 2)  # This process's files are kept
+
+
+class FacadeTests(TestCase):
+    # Scoped facades only see their own rows, memoise per request and never share cached reports
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supplier = Supplier.objects.create(
+            SupplierName="Acme", ContactDetails="-", Location="-", ContractTerms="-"
+        )
+        cls.central, cls.north = [
+            Store.objects.create(StoreName=name, Location="Town", ContactNumber="123", TotalSales=0, OperatingHours=8)
+            for name in ("Central", "North")
+        ]
+        cls.pen, cls.ink = [
+            Product.objects.create(
+                ProductName=name, Category="Office", Price=Decimal("1.00"), ReorderQuantity=10, SupplierID=cls.supplier
+            )
+            for name in ("Pen", "Ink")
+        ]
+        for store, product, amount in ((cls.central, cls.pen, "3.00"), (cls.north, cls.pen, "5.00"),
+                                       (cls.north, cls.ink, "7.00")):
+            Sales.objects.create(PaymentMethod="Card", TotalAmount=Decimal(amount), StoreID=store, ProductID=product)
+
+    def setUp(self):
+        GetReportCache().clear()
+
+    def StoreTotals(self, facade):
+        return {row["StoreID__StoreName"]: row["TotalSales"] for row in facade.GetStoreSales()}
+
+    def test_scoped_facades_see_their_own_rows(self):
+        self.assertEqual(self.StoreTotals(Facade()), {"Central": 3, "North": 12})
+        self.assertEqual(self.StoreTotals(Facade(stores=Store.objects.filter(pk=self.central.pk))), {"Central": 3})
+        self.assertEqual(self.StoreTotals(Facade(sales=Sales.objects.filter(TotalAmount__gt=4))), {"North": 12})
+        inkOnly = Facade(products=Product.objects.filter(pk=self.ink.pk))
+        self.assertEqual(
+            [(row["StoreID__StoreName"], row["ProductID__ProductName"]) for row in inkOnly.GetProductSales()],
+            [("North", "Ink")],
+        )
+        northOnly = Facade(stores=Store.objects.filter(pk=self.north.pk))
+        self.assertEqual([row["StoreId"] for row in northOnly.GetStorePerformance()], [self.north.pk])
+
+    def test_memoised_per_request(self):
+        request = RequestFactory().get("/")
+        facade = Facade.ForRequest(request)
+        self.assertIs(Facade.ForRequest(request), facade)
+        self.assertIsNot(Facade.ForRequest(request, stores=Store.objects.filter(pk=self.central.pk)), facade)
+
+        with mock.patch.object(reportcache, "CountReportCache") as count:
+            facade.GetStoreSales()
+            facade.GetStoreSales()  # Memoised: the report cache is not even consulted
+            self.assertEqual(count.call_args_list, [mock.call("misses")])
+            Facade.ForRequest(RequestFactory().get("/")).GetStoreSales()  # A new request reads the cache again
+            self.assertEqual(count.call_args_list, [mock.call("misses"), mock.call("hits")])
+
+    def test_scopes_never_share_cache_entries(self):
+        scopes = [
+            Facade(),
+            Facade(stores=Store.objects.filter(pk=self.central.pk)),
+            Facade(stores=Store.objects.filter(pk=self.north.pk)),
+            Facade(products=Product.objects.filter(pk=self.ink.pk)),
+            Facade(sales=Sales.objects.filter(StoreID=self.central.pk)),
+        ]
+        self.assertEqual(len({facade.GetReportScope() for facade in scopes}), len(scopes))
+        # Run in turn on a shared cache; each must still get its own result
+        self.assertEqual(
+            [sum(row["TotalSales"] for row in facade.GetStoreSales()) for facade in scopes], [15, 3, 12, 7, 3]
+        )
+
+    def test_single_reorder_skips_products_on_order(self):
+        # TriggerPurchaseOrder and TriggerPurchaseOrders share the same open-order check
+        self.assertIn("created", Facade().TriggerPurchaseOrder(self.pen.pk))
+        self.assertIn("already has an open purchase order", Facade().TriggerPurchaseOrder(self.pen.pk))
+        self.assertEqual(Facade().TriggerPurchaseOrders([self.pen.pk])["on_order"], [self.pen.pk])
+        self.assertEqual(PurchaseOrder.objects.count(), 1)
+
+        PurchaseOrder.objects.update(OrderStatus="Delivered")
+        self.assertIn("created", Facade().TriggerPurchaseOrder(self.pen.pk))
@@ -1,8 +1,16 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from .exports import ExportView
+from .reportcache import ReportCacheStatsView
+
 urlpatterns = [
     path("admin/", admin.site.urls),
-    # path("Inventory/", include("Inventory.urls")),
-    # path("Sales/", include("Sales.urls")),
+    path("export/<str:dataset>/", ExportView, name="export"),
+    path("reports/cache-stats/", ReportCacheStatsView, name="report-cache-stats"),
+    path("Inventory/", include("Inventory.urls")),
+    path("Sales/", include("Sales.urls")),
+    path("Procurement/", include("Procurement.urls")),
+    path("HR/", include("HR.urls")),
+    path("jobs/", include("Jobs.urls")),
 ]
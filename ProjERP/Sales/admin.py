@@ -1,5 +1,13 @@
 from django.contrib import admin
 
+from app.paginator import EstimatedCountPaginator
 from .models import *
 
-admin.site.register(Sales)
+
+@admin.register(Sales)
+class SalesAdmin(admin.ModelAdmin):
+    list_display = ("SalesID", "StoreID", "ProductID", "EmployeeID", "TotalAmount", "PaymentMethod", "SaleDate")
+    list_select_related = ("StoreID", "ProductID", "EmployeeID__DepartmentID")  # Staff.__str__ shows the department
+    raw_id_fields = ("StoreID", "ProductID", "EmployeeID")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,282 @@
+# In-memory columnar snapshot of Sales for dashboards that slice store x product x date repeatedly
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+from app.reportcache import GetReportCache
+from app.routers import ReportingDatabase
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency: the snapshot is unavailable without NumPy
+    np = None
+
+SNAPSHOT_LOAD_CHUNK_SIZE = 50000  # Sales rows fetched and converted to arrays per step
+SNAPSHOT_REFRESH_SECONDS = 5  # GetSalesSnapshot() pulls new sales at most this often
+SNAPSHOT_RECONCILE_SECONDS = 600  # Full reload at least this often, catching anything the appends missed
+SNAPSHOT_GAP_WINDOW = 10000  # Unused SalesIDs this close to the high-water mark are watched for late commits
+SNAPSHOT_GAP_SECONDS = 120  # How long a SalesID gap is watched before it is taken as a rollback
+DENSE_KEY_LIMIT = 1 << 22  # Key spaces up to this size (or 4x the rows) are summed without compacting
+REWRITES_KEY = "analytics:sales-rewrites"  # Bumped when existing sales change; forces a full reload
+
+
+def MarkSalesRewritten():
+    # Called when an existing sale is edited or deleted; appends alone cannot pick that up
+    cache = GetReportCache()
+    try:
+        cache.incr(REWRITES_KEY)
+    except ValueError:  # Key missing or evicted
+        cache.set(REWRITES_KEY, time.time_ns(), timeout=None)
+
+
+def GetSalesRewrites():
+    return GetReportCache().get(REWRITES_KEY)
+
+
+class CodeMap:
+    # Dense int32 codes for foreign keys; code 0 stands for NULL
+    def __init__(self):
+        self.ids = [None]
+        self.codes = {None: 0}
+
+    def Encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.ids)
+            self.ids.append(value)
+        return code
+
+
+class SnapshotState:
+    # The columns together with the code maps their codes refer to; replaced whole, never edited in place
+    def __init__(self, columns, stores, products, employees):
+        self.columns = columns
+        self.stores, self.products, self.employees = stores, products, employees
+
+    @classmethod
+    def Empty(cls):
+        columns = {
+            "stores": np.empty(0, np.int32),
+            "products": np.empty(0, np.int32),
+            "employees": np.empty(0, np.int32),
+            "days": np.empty(0, np.int32),
+            "cents": np.empty(0, np.int64),
+        }
+        return cls(columns, CodeMap(), CodeMap(), CodeMap())
+
+
+class SalesSnapshot:
+    # -------------------
+    # Sales held as parallel NumPy columns sorted by day: int32 store/product/employee codes, int32 day
+    # ordinals and int64 amounts in cents, so 24 bytes per sale rather than 20. The cents need 64 bits, as
+    # TotalAmount allows 13 integer digits and int32 cents wrap above 21 million per sale; day ordinals
+    # (about 739,000 today) need more than 16 bits. Groupings use searchsorted to find the date
+    # range, then bincount over compacted keys. bincount sums float64 weights, which stay exact integers up
+    # to 2**53 cents (about 90 trillion) per group.
+    # Refresh() appends sales above the SalesID high-water mark. SalesIDs are handed out at insert but
+    # become visible at commit, so a lower id can appear after a higher one was loaded: unused ids near the
+    # mark are kept as gaps and re-read until they fill or SNAPSHOT_GAP_SECONDS pass. Edits and deletes, and
+    # every SNAPSHOT_RECONCILE_SECONDS anything else missed, trigger a full reload.
+    # Queries read self.state once, so a refresh running alongside never mixes old columns and new codes.
+    # -------------------
+    COLUMNS = ("stores", "products", "employees", "days", "cents")
+
+    def __init__(self):
+        if np is None:
+            raise ImportError("The sales analytics snapshot requires NumPy (pip install numpy).")
+        self.lock = threading.Lock()
+        self.state = SnapshotState.Empty()
+        self.highWaterMark = 0
+        self.gaps = {}  # Unused SalesID below the high-water mark -> monotonic time it was first seen
+        self.rewrites = GetSalesRewrites()
+        self.refreshedAt = None
+        self.reloadedAt = None
+
+    def __len__(self):
+        return len(self.state.columns["days"])
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.state.columns.values())
+
+    def Refresh(self, full=False):
+        # Load sales committed since the last refresh (or everything); returns the number of rows loaded
+        from .models import Sales
+
+        with self.lock:
+            now = time.monotonic()
+            rewrites = GetSalesRewrites()
+            stale = self.reloadedAt is None or now - self.reloadedAt >= SNAPSHOT_RECONCILE_SECONDS
+            if full or stale or rewrites != self.rewrites:
+                # Build into fresh code maps and columns; the old state stays intact for running queries
+                state, highWaterMark, gaps = SnapshotState.Empty(), 0, {}
+                self.rewrites, self.reloadedAt = rewrites, now
+            else:
+                state, highWaterMark, gaps = self.state, self.highWaterMark, dict(self.gaps)
+
+            sales = Sales.objects.using(ReportingDatabase())
+            sales = sales.filter(SalesID__gte=min(gaps)) if gaps else sales.filter(SalesID__gt=highWaterMark)
+            rows = (
+                sales.order_by("SalesID")
+                .values_list("SalesID", "StoreID", "ProductID", "EmployeeID", "SaleDate", "TotalAmount")
+                .iterator(chunk_size=SNAPSHOT_LOAD_CHUNK_SIZE)
+            )
+
+            chunks, batch, loadedUpTo = [], [], highWaterMark
+            for salesId, storeId, productId, employeeId, saleDate, amount in rows:
+                if salesId <= highWaterMark:
+                    if gaps.pop(salesId, None) is None:  # Loaded by an earlier refresh
+                        continue
+                else:
+                    self.NoteGaps(gaps, loadedUpTo, salesId, now)
+                    loadedUpTo = salesId
+                batch.append((
+                    state.stores.Encode(storeId),
+                    state.products.Encode(productId),
+                    state.employees.Encode(employeeId),
+                    saleDate.toordinal(),
+                    int(amount.scaleb(2)),  # Exact cents from the two-decimal amount
+                ))
+                if len(batch) >= SNAPSHOT_LOAD_CHUNK_SIZE:
+                    chunks.append(self.ToColumns(batch))
+                    batch = []
+            if batch:
+                chunks.append(self.ToColumns(batch))
+
+            columns = state.columns
+            if chunks:
+                columns = {
+                    name: np.concatenate([columns[name]] + [chunk[name] for chunk in chunks])
+                    for name in self.COLUMNS
+                }
+                # New sales are normally dated today and stay in order; backdated imports need a re-sort
+                if np.any(np.diff(columns["days"]) < 0):
+                    order = np.argsort(columns["days"], kind="stable")
+                    columns = {name: column[order] for name, column in columns.items()}
+
+            # One assignment publishes the columns with their code maps, so queries see old or new, never half
+            self.state = SnapshotState(columns, state.stores, state.products, state.employees)
+            self.highWaterMark = loadedUpTo
+            self.gaps = {
+                salesId: seenAt for salesId, seenAt in gaps.items()
+                if salesId > loadedUpTo - SNAPSHOT_GAP_WINDOW and now - seenAt < SNAPSHOT_GAP_SECONDS
+            }
+            self.refreshedAt = now
+            return sum(len(chunk["days"]) for chunk in chunks)
+
+    @staticmethod
+    def NoteGaps(gaps, previous, salesId, now):
+        # Record the unused ids between two consecutive loaded sales, keeping only the last SNAPSHOT_GAP_WINDOW
+        for missing in range(max(previous + 1, salesId - SNAPSHOT_GAP_WINDOW), salesId):
+            gaps.setdefault(missing, now)
+        if len(gaps) > 2 * SNAPSHOT_GAP_WINDOW:
+            for old in [gap for gap in gaps if gap <= salesId - SNAPSHOT_GAP_WINDOW]:
+                del gaps[old]
+
+    @staticmethod
+    def ToColumns(batch):
+        stores, products, employees, days, cents = zip(*batch)
+        return {
+            "stores": np.array(stores, np.int32),
+            "products": np.array(products, np.int32),
+            "employees": np.array(employees, np.int32),
+            "days": np.array(days, np.int32),
+            "cents": np.array(cents, np.int64),
+        }
+
+    def Slice(self, start_date=None, end_date=None, state=None):
+        # Columns restricted to the date range, found by binary search on the sorted day ordinals
+        columns = (state or self.state).columns
+        days = columns["days"]
+        low = np.searchsorted(days, start_date.toordinal(), side="left") if start_date else 0
+        high = np.searchsorted(days, end_date.toordinal(), side="right") if end_date else len(days)
+        return {name: column[low:high] for name, column in columns.items()}
+
+    @staticmethod
+    def ToAmount(cents):
+        return Decimal(int(cents)).scaleb(-2)
+
+    @staticmethod
+    def SumByKey(keys, cents, keySpace):
+        # Exact totals per distinct key in [0, keySpace), keys ascending
+        if keySpace <= max(DENSE_KEY_LIMIT, 4 * len(keys)):
+            present = np.flatnonzero(np.bincount(keys, minlength=keySpace))
+            totals = np.bincount(keys, weights=cents, minlength=keySpace)[present]
+        else:
+            # Sparse key space: compact the keys first so bincount stays small
+            present, inverse = np.unique(keys, return_inverse=True)
+            totals = np.bincount(inverse, weights=cents)
+        return present, np.rint(totals).astype(np.int64)
+
+    def CalculateTotalSales(self, start_date=None, end_date=None):
+        # Same result as Sales.CalculateTotalSales
+        cents = self.Slice(start_date, end_date)["cents"]
+        return self.ToAmount(cents.sum()) if len(cents) else 0
+
+    def GetSalesGraph(self, start_date=None, end_date=None):
+        # Same result as Sales.GetSalesGraph: daily totals in date order
+        columns = self.Slice(start_date, end_date)
+        if not len(columns["days"]):
+            return []
+        firstDay = int(columns["days"][0])
+        keySpace = int(columns["days"][-1]) - firstDay + 1
+        offsets, totals = self.SumByKey(columns["days"] - firstDay, columns["cents"], keySpace)
+        return [
+            {"SaleDate": date.fromordinal(firstDay + int(offset)), "TotalSales": self.ToAmount(total)}
+            for offset, total in zip(offsets, totals)
+        ]
+
+    def GetSalesPerformance(self, start_date=None, end_date=None):
+        # Same result as Facade.GetSalesPerformance: totals per store name, and per store and product name
+        from Inventory.models import Product, Store
+
+        state = self.state  # Codes in these columns index these maps, whatever a refresh does meanwhile
+        columns = self.Slice(start_date, end_date, state)
+        productCount = len(state.products.ids)
+        pairs = columns["stores"].astype(np.int64) * productCount + columns["products"]
+        pairs, totals = self.SumByKey(pairs, columns["cents"], len(state.stores.ids) * productCount)
+
+        # Names come from the small dimension tables, so renames show up without a reload
+        storeNames = dict(Store.objects.using(ReportingDatabase()).values_list("StoreId", "StoreName"))
+        productNames = dict(Product.objects.using(ReportingDatabase()).values_list("ProductID", "ProductName"))
+
+        storeSales, productSales = {}, {}
+        for pair, total in zip(pairs, totals):
+            storeCode, productCode = divmod(int(pair), productCount)
+            storeName = storeNames.get(state.stores.ids[storeCode])
+            productName = productNames.get(state.products.ids[productCode])
+            storeSales[storeName] = storeSales.get(storeName, 0) + int(total)
+            key = (storeName, productName)
+            productSales[key] = productSales.get(key, 0) + int(total)
+
+        def NameKey(name):
+            return (name is not None, name or "")  # Unnamed groups first, as in the SQL report
+
+        return {
+            "store_sales": [
+                {"StoreID__StoreName": storeName, "TotalSales": self.ToAmount(cents)}
+                for storeName, cents in sorted(storeSales.items(), key=lambda item: NameKey(item[0]))
+            ],
+            "product_sales": [
+                {"StoreID__StoreName": storeName, "ProductID__ProductName": productName, "TotalSales": self.ToAmount(cents)}
+                for (storeName, productName), cents in sorted(
+                    productSales.items(), key=lambda item: (NameKey(item[0][1]), NameKey(item[0][0]))
+                )
+            ],
+        }
+
+
+SNAPSHOT = None
+SNAPSHOT_LOCK = threading.Lock()
+
+
+def GetSalesSnapshot(maxAge=SNAPSHOT_REFRESH_SECONDS):
+    # Process-wide snapshot, loaded on first use and refreshed when older than maxAge seconds
+    global SNAPSHOT
+    with SNAPSHOT_LOCK:
+        if SNAPSHOT is None:
+            SNAPSHOT = SalesSnapshot()
+    if SNAPSHOT.refreshedAt is None or time.monotonic() - SNAPSHOT.refreshedAt >= maxAge:
+        SNAPSHOT.Refresh()
+    return SNAPSHOT
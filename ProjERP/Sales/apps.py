@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SalesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "Sales"
+
+    def ready(self):
+        from . import signals  # noqa: F401  Register sales rollup signal handlers
@@ -0,0 +1,141 @@
+# Bulk ingest of POS sales batches (CSV or NDJSON)
+import csv
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from app.reportcache import InvalidateReports
+from HR.models import Staff
+from Inventory.models import SALE, Product, ProductLocation, Store
+from .models import Sales, SalesDailyRollup
+
+INGEST_CHUNK_SIZE = 5000  # Sales rows per bulk_create
+INGEST_FORMATS = ("csv", "ndjson")
+
+
+def ReadSalesRows(stream, fileFormat="csv"):
+    # Yield one dict per sale from a CSV (with header) or NDJSON text stream
+    if fileFormat == "csv":
+        yield from csv.DictReader(stream)
+    elif fileFormat == "ndjson":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unsupported sales batch format: {fileFormat}")
+
+
+def ParseOptionalId(value):
+    # Blank or missing foreign keys are stored as NULL
+    return int(value) if value not in (None, "") else None
+
+
+def ParseSaleRow(row, storeIds, productIds, staffIds):
+    # ------------------- 
+    # Validates one batch row against the prefetched key sets.
+    # Returns (saleDate, storeId, productId, employeeId, paymentMethod, amount, quantity).
+    # ------------------- 
+    storeId = int(row["StoreID"])
+    productId = ParseOptionalId(row.get("ProductID"))
+    employeeId = ParseOptionalId(row.get("EmployeeID"))
+
+    if storeId not in storeIds:
+        raise ValueError(f"Unknown store {storeId}")
+    if productId is not None and productId not in productIds:
+        raise ValueError(f"Unknown product {productId}")
+    if employeeId is not None and employeeId not in staffIds:
+        raise ValueError(f"Unknown employee {employeeId}")
+
+    paymentMethod = row.get("PaymentMethod")
+    if not paymentMethod:
+        raise ValueError("PaymentMethod is required")
+
+    try:
+        amount = Decimal(str(row["TotalAmount"]))
+    except InvalidOperation:
+        raise ValueError(f"Invalid TotalAmount {row['TotalAmount']!r}")
+
+    saleDate = date.today()
+    if row.get("SaleDate"):
+        saleDate = parse_date(str(row["SaleDate"]))
+        if saleDate is None:
+            raise ValueError(f"Invalid SaleDate {row['SaleDate']!r}")
+
+    quantity = row.get("Quantity")  # Units sold, only used for the stock decrement
+    try:
+        quantity = 1 if quantity in (None, "") else int(str(quantity))  # A blank CSV cell counts as missing
+    except ValueError:
+        raise ValueError(f"Invalid Quantity {row['Quantity']!r}")
+    if quantity < 1:
+        raise ValueError(f"Quantity must be at least 1, got {quantity}")
+    return saleDate, storeId, productId, employeeId, paymentMethod, amount, quantity
+
+
+def IngestSalesBatch(rows, chunk_size=INGEST_CHUNK_SIZE):
+    # ------------------- 
+    # Inserts a batch of POS sales in one transaction.
+    # rows: iterable of dicts with StoreID, ProductID, EmployeeID, PaymentMethod, TotalAmount and optional
+    # SaleDate (defaults to today) and Quantity (defaults to 1 when missing, otherwise a positive integer).
+    # Foreign keys are checked against key sets prefetched once per batch, sales are inserted with chunked
+    # bulk_create, and the rollup and stock decrements are applied as grouped updates at the end.
+    # Raises ValueError naming the first bad row; nothing is written in that case.
+    # ------------------- 
+
+    # One query per referenced table instead of one lookup per row
+    storeIds = set(Store.objects.values_list("StoreId", flat=True))
+    productIds = set(Product.objects.values_list("ProductID", flat=True))
+    staffIds = set(Staff.objects.values_list("EmployeeID", flat=True))
+
+    rollupRows = {}  # (date, store, product, employee) -> [amount, count]
+    stockDeltas = {}  # (product, store) -> units to remove
+    inserted = 0
+
+    with transaction.atomic():
+        chunk = []
+        for rowNumber, row in enumerate(rows, start=1):
+            try:
+                saleDate, storeId, productId, employeeId, paymentMethod, amount, quantity = ParseSaleRow(
+                    row, storeIds, productIds, staffIds
+                )
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Row {rowNumber}: {e}")
+
+            chunk.append(Sales(
+                SaleDate=saleDate,
+                StoreID_id=storeId,
+                ProductID_id=productId,
+                EmployeeID_id=employeeId,
+                PaymentMethod=paymentMethod,
+                TotalAmount=amount,
+            ))
+
+            totals = rollupRows.setdefault((saleDate, storeId, productId, employeeId), [0, 0])
+            totals[0] += amount
+            totals[1] += 1
+            if productId is not None:
+                stockDeltas[(productId, storeId)] = stockDeltas.get((productId, storeId), 0) - quantity
+
+            if len(chunk) >= chunk_size:
+                # bulk_create skips the rollup signal; the rollup is updated in one pass below
+                Sales.objects.bulk_create(chunk)
+                inserted += len(chunk)
+                chunk = []
+
+        Sales.objects.bulk_create(chunk)
+        inserted += len(chunk)
+
+        SalesDailyRollup.ApplySales(
+            (saleDate, storeId, productId, employeeId, amount, count)
+            for (saleDate, storeId, productId, employeeId), (amount, count) in rollupRows.items()
+        )
+
+        # Sales already happened at the till, so stock may go negative; those locations are reported
+        shortfalls = ProductLocation.ApplyStockDeltas(stockDeltas, allow_negative=True, kind=SALE)
+
+        # bulk_create sends no post_save signals, so drop cached reports explicitly
+        InvalidateReports()
+
+    return {"inserted": inserted, "stock_shortfalls": shortfalls}
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Sales.ingest import INGEST_CHUNK_SIZE, INGEST_FORMATS, IngestSalesBatch, ReadSalesRows
+
+
+class Command(BaseCommand):
+    help = "Bulk import POS sales batches from CSV or NDJSON files, one transaction per file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Batch files to import.")
+        parser.add_argument(
+            "--format",
+            dest="file_format",
+            choices=INGEST_FORMATS,
+            help="File format (defaults to the file extension).",
+        )
+        parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE, help="Rows per bulk insert.")
+
+    def handle(self, *args, **options):
+        for path in options["paths"]:
+            fileFormat = options["file_format"] or path.rsplit(".", 1)[-1].lower()
+            if fileFormat not in INGEST_FORMATS:
+                raise CommandError(f"Cannot tell the format of {path}; pass --format.")
+
+            with open(path, newline="", encoding="utf-8") as stream:
+                try:
+                    report = IngestSalesBatch(ReadSalesRows(stream, fileFormat), chunk_size=options["chunk_size"])
+                except ValueError as e:
+                    raise CommandError(f"{path}: {e}")
+
+            self.stdout.write(self.style.SUCCESS(f"{path}: imported {report['inserted']} sale(s)."))
+            for productId, storeId in report["stock_shortfalls"]:
+                self.stdout.write(self.style.WARNING(f"  Stock below zero for product {productId} at store {storeId}"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.paginator import ParseDate
+
+from Sales.models import SalesDailyRollup
+
+
+class Command(BaseCommand):
+    help = "Backfill SalesDailyRollup from the Sales table, optionally for a date range only."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start-date", help="First sale date to rebuild (YYYY-MM-DD).")
+        parser.add_argument("--end-date", help="Last sale date to rebuild (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        dates = {}
+        for option in ("start_date", "end_date"):
+            value = options[option]
+            try:
+                dates[option] = ParseDate(value) if value else None
+            except ValueError as e:
+                raise CommandError(f"Invalid {option.replace('_', '-')}: {e}")
+
+        written = SalesDailyRollup.Rebuild(**dates)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rollup row(s)."))
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def BackfillRollup(apps, schema_editor):
+    # Seed the rollup from the existing Sales rows
+    Sales = apps.get_model("Sales", "Sales")
+    SalesDailyRollup = apps.get_model("Sales", "SalesDailyRollup")
+    grouped = (
+        Sales.objects.values_list("SaleDate", "StoreID", "ProductID", "EmployeeID")
+        .annotate(Total=Sum("TotalAmount"), Transactions=Count("SalesID"))
+        .order_by()
+    )
+    SalesDailyRollup.objects.bulk_create(
+        (
+            SalesDailyRollup(
+                Date=date,
+                StoreID_id=storeId,
+                ProductID_id=productId,
+                EmployeeID_id=employeeId,
+                TotalAmount=amount,
+                TransactionCount=count,
+            )
+            for date, storeId, productId, employeeId, amount, count in grouped.iterator()
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HR', '0001_initial'),
+        ('Inventory', '0003_materialised_stock_level'),
+        ('Sales', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('RollupID', models.AutoField(primary_key=True, serialize=False, unique=True)),
+                ('Date', models.DateField()),
+                ('TotalAmount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('TransactionCount', models.IntegerField(default=0)),
+                ('EmployeeID', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to='HR.staff')),
+                ('ProductID', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to='Inventory.product')),
+                ('StoreID', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='Inventory.store')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('Date', 'StoreID', 'ProductID', 'EmployeeID'), name='sales_rollup_unique_key')],
+            },
+        ),
+        migrations.RunPython(BackfillRollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HR', '0002_staff_staff_department_name_idx'),
+        ('Inventory', '0004_productlocation_productlocation_product_store_unique'),
+        ('Sales', '0002_sales_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sales',
+            index=models.Index(fields=['SaleDate', 'StoreID'], name='sales_date_store_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sales',
+            index=models.Index(fields=['SaleDate', 'ProductID'], name='sales_date_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sales',
+            index=models.Index(fields=['EmployeeID', 'SaleDate'], name='sales_employee_date_idx'),
+        ),
+    ]
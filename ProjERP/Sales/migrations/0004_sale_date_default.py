@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:34
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Sales', '0003_sales_sales_date_store_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sales',
+            name='SaleDate',
+            field=models.DateField(default=datetime.date.today),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HR', '0002_staff_staff_department_name_idx'),
+        ('Inventory', '0005_product_low_stock_watchlist'),
+        ('Sales', '0004_sale_date_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salesdailyrollup',
+            index=models.Index(fields=['EmployeeID', 'Date'], name='sales_rollup_employee_date_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HR', '0002_staff_staff_department_name_idx'),
+        ('Inventory', '0006_stock_ledger'),
+        ('Sales', '0005_sales_rollup_employee_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sales',
+            index=models.Index(fields=['SaleDate', 'SalesID'], name='sales_date_id_idx'),
+        ),
+    ]
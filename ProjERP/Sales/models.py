@@ -1,8 +1,52 @@
 # Imports for managing sales functionality
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from Inventory.models import Store, Product  
 from HR.models import Staff
-from django.db.models import Sum
+from django.db.models import Sum, Count, F, Case, Min, When, Value
+from django.db.models.functions import TruncWeek, TruncMonth, TruncQuarter, TruncYear
+from datetime import date, timedelta
+from app.reportcache import CachedReport
+from app.routers import ReportingDatabase
+
+ROLLUP_UPDATE_BATCH_SIZE = 500  # Rollup rows per CASE-based bulk UPDATE
+ROLLUP_REBUILD_CHUNK_SIZE = 2000  # Grouped rows inserted per bulk_create during a rebuild
+ROLLUP_INSERT_ATTEMPTS = 3  # Retries when a concurrent writer inserts the same new rollup row first
+
+# Sales graph bucket sizes (database truncation function; days are already buckets) and breakdowns
+GRAPH_GRANULARITIES = {"day": None, "week": TruncWeek, "month": TruncMonth, "quarter": TruncQuarter, "year": TruncYear}
+GRAPH_DIMENSIONS = {"store": "StoreID__StoreName", "product": "ProductID__ProductName", "category": "ProductID__Category"}
+GRAPH_MAX_POINTS = 20000  # Zero-filled rows (buckets x series) one graph may return
+
+
+def GetBucketStart(day, granularity):
+    # Python equivalent of the Trunc* functions for a single date
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    if granularity == "quarter":
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    if granularity == "year":
+        return day.replace(month=1, day=1)
+    return day
+
+
+def GetNextBucket(bucket, granularity):
+    if granularity == "week":
+        return bucket + timedelta(days=7)
+    months = {"month": 1, "quarter": 3, "year": 12}.get(granularity)
+    if months is None:
+        return bucket + timedelta(days=1)
+    month = bucket.month - 1 + months
+    return bucket.replace(year=bucket.year + month // 12, month=month % 12 + 1)
+
+
+def CountBuckets(first, last, granularity):
+    # Buckets from first to last inclusive, both bucket starts, without stepping through them
+    if granularity in ("day", "week"):
+        return (last - first).days // (7 if granularity == "week" else 1) + 1
+    months = {"month": 1, "quarter": 3, "year": 12}[granularity]
+    return ((last.year - first.year) * 12 + last.month - first.month) // months + 1
 
 class Sales(models.Model):
     # Core sales record attributes
@@ -20,12 +64,46 @@ class Sales(models.Model):
         related_name='sales'
     )  # Staff member who processed the sale
     
-    SaleDate = models.DateField(auto_now_add=True)  # Timestamp of sale
+    SaleDate = models.DateField(default=date.today)  # Date of sale, settable for imported POS batches
+
+    class Meta:
+        indexes = [
+            # Date-range reports narrowed by store, product or employee
+            models.Index(fields=["SaleDate", "StoreID"], name="sales_date_store_idx"),
+            models.Index(fields=["SaleDate", "ProductID"], name="sales_date_product_idx"),
+            models.Index(fields=["EmployeeID", "SaleDate"], name="sales_employee_date_idx"),
+            # Date-filtered list API pages, ordered and seeked by (SaleDate, SalesID)
+            models.Index(fields=["SaleDate", "SalesID"], name="sales_date_id_idx"),
+        ]
 
     def __str__(self):
         # String representation of sale record
         return f"Id: {self.SalesID} - Total: {self.TotalAmount} - Store: {self.StoreID.StoreName}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Remember the stored rollup key and amount so edits can be applied to the rollup as deltas
+        instance = super().from_db(db, field_names, values)
+        instance._stored_rollup = instance.GetRollupRow()
+        return instance
+
+    def GetRollupRow(self, sign=1):
+        # (date, store, product, employee, amount, count) contribution of this sale to SalesDailyRollup.
+        # Values are normalised with to_python, so e.g. TotalAmount="3.00" or SaleDate="2024-01-05"
+        # (valid ORM input) give the same key and amount as the row read back from the database.
+        values = [
+            self._meta.get_field(name).to_python(self.__dict__.get(attname))
+            for name, attname in (
+                ("SaleDate", "SaleDate"),
+                ("StoreID", "StoreID_id"),
+                ("ProductID", "ProductID_id"),
+                ("EmployeeID", "EmployeeID_id"),
+                ("TotalAmount", "TotalAmount"),
+            )
+        ]
+        saleDate, storeId, productId, employeeId, amount = values
+        return (saleDate, storeId, productId, employeeId, sign * (amount or 0), sign)
+
     def GetSalesData(self):
         # ------------------- Returns the sales record data as a dictionary ------------------- 
 
@@ -39,32 +117,74 @@ class Sales(models.Model):
             "SaleDate": self.SaleDate,
         }
 
-    def GetSalesGraph(self, start_date=None, end_date=None):
+    @CachedReport("GetSalesGraph")
+    def GetSalesGraph(self, start_date=None, end_date=None, granularity="day", dimension=None, zero_fill=False):
         # ------------------- 
         #Generates sales data for a graph based on the given date range.
         # start_date: Optional start date for filtering sales (datetime.date).
         # end_date: Optional end date for filtering sales (datetime.date).
+        # granularity: Bucket size, one of day/week/month/quarter/year; buckets are truncated in the database.
+        # dimension: Optional breakdown by store, product or category, returned as a "Series" label per row.
+        # zero_fill: Add zero rows for empty buckets between the first and last date (per series);
+        # raises ValueError when that would exceed GRAPH_MAX_POINTS rows.
         # ------------------- 
-        
-        # Initialise base queryset
-        sales_queryset = Sales.objects.all()
+        if granularity not in GRAPH_GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        if dimension is not None and dimension not in GRAPH_DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dimension}")
 
-        # Apply date filters if provided
-        if start_date:
-            sales_queryset = sales_queryset.filter(DateOfSale__gte=start_date)
-        if end_date:
-            sales_queryset = sales_queryset.filter(DateOfSale__lte=end_date)
+        # Daily totals come straight from the pre-aggregated rollup, read from the reporting database
+        rollup_queryset = SalesDailyRollup.FilterDates(start_date, end_date).using(ReportingDatabase())
 
-        # Group sales by date and calculate totals
-        sales_summary = (
-            sales_queryset
-            .values("SaleDate")
+        # Group sales by bucket (and series) and calculate totals, one row per bucket from the database
+        trunc = GRAPH_GRANULARITIES[granularity]
+        groups = {"SaleDate": trunc("Date") if trunc else F("Date")}
+        if dimension:
+            groups["Series"] = F(GRAPH_DIMENSIONS[dimension])
+        sales_summary = list(
+            rollup_queryset
+            .values(**groups)
             .annotate(TotalSales=Sum("TotalAmount"))
-            .order_by("SaleDate")
+            .order_by(*groups)
         )
 
-        return list(sales_summary)  # Returns a list of dictionaries for graph plotting
+        if zero_fill and (sales_summary or (start_date and end_date)):
+            sales_summary = self.ZeroFillGraph(sales_summary, start_date, end_date, granularity, dimension)
+
+        return sales_summary  # Returns a list of dictionaries for graph plotting
+
+    @staticmethod
+    def ZeroFillGraph(rows, start_date, end_date, granularity, dimension):
+        # Fill every bucket from start to end for each series, keeping the database's ordering
+        first = GetBucketStart(start_date or min(row["SaleDate"] for row in rows), granularity)
+        last = GetBucketStart(end_date or max(row["SaleDate"] for row in rows), granularity)
+        count = CountBuckets(first, last, granularity) if first <= last else 0
+        series = [None]
+        if dimension:
+            series = sorted({row["Series"] for row in rows}, key=lambda label: (label is not None, label or ""))
+        if count * len(series) > GRAPH_MAX_POINTS:
+            raise ValueError(
+                f"Too many points to zero fill ({count} {granularity} buckets x {len(series)} series); "
+                f"narrow the date range or use a coarser granularity (limit {GRAPH_MAX_POINTS})"
+            )
 
+        # Stop on the last bucket rather than stepping past it, which overflows at date.max
+        buckets = [first] if count else []
+        while len(buckets) < count:
+            buckets.append(GetNextBucket(buckets[-1], granularity))
+
+        totals = {(row["SaleDate"], row.get("Series")): row["TotalSales"] for row in rows}
+        filled = []
+        for bucket in buckets:
+            for label in series:
+                row = {"SaleDate": bucket}
+                if dimension:
+                    row["Series"] = label
+                row["TotalSales"] = totals.get((bucket, label), 0)  # Same key order as the database rows
+                filled.append(row)
+        return filled
+
+    @CachedReport("CalculateTotalSales")
     def CalculateTotalSales(self, start_date=None, end_date=None):
         # ------------------- 
         # Calculates the total sales amount within the specified date range.
@@ -72,17 +192,188 @@ class Sales(models.Model):
         # end_date: Optional end date for filtering sales (datetime.date).
         # ------------------- 
         
-        # Initialise base queryset
-        sales_queryset = Sales.objects.all()
+        # Initialise base queryset on the daily rollup, read from the reporting database
+        rollup_queryset = SalesDailyRollup.FilterDates(start_date, end_date).using(ReportingDatabase())
 
-        # Apply date filters if provided
-        if start_date:
-            sales_queryset = sales_queryset.filter(DateOfSale__gte=start_date)
-        if end_date:
-            sales_queryset = sales_queryset.filter(DateOfSale__lte=end_date)
         # Calculate total sales amount
-        total_sales = sales_queryset.aggregate(TotalSales=Sum("TotalAmount"))
+        total_sales = rollup_queryset.aggregate(TotalSales=Sum("TotalAmount"))
         return total_sales["TotalSales"] or 0
-    
 
-    
+
+class SalesDailyRollup(models.Model):
+    # Pre-aggregated sales totals per day, store, product and employee
+    RollupID = models.AutoField(primary_key=True, unique=True)
+    Date = models.DateField()
+    StoreID = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='sales_rollups')
+    ProductID = models.ForeignKey(Product, on_delete=models.SET_NULL, related_name='sales_rollups', null=True)
+    EmployeeID = models.ForeignKey(Staff, on_delete=models.SET_NULL, related_name='sales_rollups', null=True)
+    TotalAmount = models.DecimalField(max_digits=18, decimal_places=2, default=0)  # Sum of Sales.TotalAmount
+    TransactionCount = models.IntegerField(default=0)  # Number of Sales rows summed
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["Date", "StoreID", "ProductID", "EmployeeID"], name="sales_rollup_unique_key"
+            ),
+        ]
+        indexes = [
+            # Per-employee date ranges for the staff leaderboard
+            models.Index(fields=["EmployeeID", "Date"], name="sales_rollup_employee_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.Date} - Store: {self.StoreID_id} - Total: {self.TotalAmount} ({self.TransactionCount})"
+
+    @classmethod
+    def FilterDates(cls, start_date=None, end_date=None):
+        # Rollup rows within an optional inclusive date range
+        rollup_queryset = cls.objects.all()
+        if start_date:
+            rollup_queryset = rollup_queryset.filter(Date__gte=start_date)
+        if end_date:
+            rollup_queryset = rollup_queryset.filter(Date__lte=end_date)
+        return rollup_queryset
+
+    @classmethod
+    def ApplySales(cls, rows):
+        # ------------------- 
+        # Adds sales to the rollup incrementally.
+        # rows: iterable of (date, storeId, productId, employeeId, amount, count); negative values remove sales.
+        # ------------------- 
+
+        # Merge rows sharing a key so each rollup row is touched once
+        deltas = {}
+        for date, storeId, productId, employeeId, amount, count in rows:
+            key = (date, storeId, productId, employeeId)
+            totalAmount, totalCount = deltas.get(key, (0, 0))
+            deltas[key] = (totalAmount + amount, totalCount + count)
+        if not deltas:
+            return
+
+        with transaction.atomic():
+            for attempt in range(1, ROLLUP_INSERT_ATTEMPTS + 1):
+                existing = cls.FindExisting(deltas)
+                cls.UpdateExisting(existing, deltas)
+                # Keys without a row only get one if sales remain, e.g. not for a delete the rollup never saw
+                deltas = {key: delta for key, delta in deltas.items() if key not in existing and delta[1] > 0}
+                try:
+                    # Savepoint: a unique-key clash from a concurrent first sale undoes only these inserts,
+                    # which are then retried as updates of the row the other writer created
+                    with transaction.atomic():
+                        cls.objects.bulk_create(
+                            cls(
+                                Date=date,
+                                StoreID_id=storeId,
+                                ProductID_id=productId,
+                                EmployeeID_id=employeeId,
+                                TotalAmount=amount,
+                                TransactionCount=count,
+                            )
+                            for (date, storeId, productId, employeeId), (amount, count) in deltas.items()
+                        )
+                    break
+                except IntegrityError:
+                    if attempt == ROLLUP_INSERT_ATTEMPTS:
+                        raise
+
+    @classmethod
+    def FindExisting(cls, deltas):
+        # Map (date, store, product, employee) keys to existing rollup row ids, in one query
+        existing = {}
+        candidates = cls.objects.filter(
+            Date__in={key[0] for key in deltas}, StoreID__in={key[1] for key in deltas}
+        ).values_list("RollupID", "Date", "StoreID", "ProductID", "EmployeeID")
+        for rollupId, *key in candidates:
+            existing.setdefault(tuple(key), rollupId)
+        return existing
+
+    @classmethod
+    def UpdateExisting(cls, existing, deltas):
+        # Add the deltas to existing rows as F-expression UPDATEs, then drop rows left without sales
+        updates = [(existing[key], delta) for key, delta in deltas.items() if key in existing]
+        for start in range(0, len(updates), ROLLUP_UPDATE_BATCH_SIZE):
+            batch = updates[start:start + ROLLUP_UPDATE_BATCH_SIZE]
+            cls.objects.filter(RollupID__in=[rollupId for rollupId, _ in batch]).update(
+                TotalAmount=F("TotalAmount") + Case(
+                    *[When(RollupID=rollupId, then=Value(amount)) for rollupId, (amount, _) in batch],
+                    output_field=models.DecimalField(max_digits=18, decimal_places=2),
+                ),
+                TransactionCount=F("TransactionCount") + Case(
+                    *[When(RollupID=rollupId, then=Value(count)) for rollupId, (_, count) in batch],
+                    output_field=models.IntegerField(),
+                ),
+            )
+
+        removed = [rollupId for rollupId, (_, count) in updates if count < 0]
+        if removed:
+            cls.objects.filter(RollupID__in=removed, TransactionCount__lte=0).delete()
+
+    @classmethod
+    def MergeDuplicateKeys(cls, dates):
+        # -------------------
+        # Folds rollup rows that share a key into one, for the given dates.
+        # Deleting a product or employee nulls its rollup rows, and NULLs never clash in the unique
+        # constraint, so a nulled row can sit next to an existing one for the same day, store and key.
+        # Returns the number of rows removed.
+        # -------------------
+        removed = 0
+        dates = sorted(set(dates))
+        for start in range(0, len(dates), ROLLUP_UPDATE_BATCH_SIZE):
+            duplicates = (
+                cls.objects.filter(Date__in=dates[start:start + ROLLUP_UPDATE_BATCH_SIZE])
+                .values("Date", "StoreID", "ProductID", "EmployeeID")
+                .annotate(
+                    Rows=Count("RollupID"), KeepID=Min("RollupID"),
+                    Total=Sum("TotalAmount"), Transactions=Sum("TransactionCount"),
+                )
+                .filter(Rows__gt=1)
+                .order_by()
+            )
+            for row in duplicates:
+                cls.objects.filter(RollupID=row["KeepID"]).update(
+                    TotalAmount=row["Total"], TransactionCount=row["Transactions"]
+                )
+                removed += cls.objects.filter(
+                    Date=row["Date"], StoreID=row["StoreID"], ProductID=row["ProductID"], EmployeeID=row["EmployeeID"]
+                ).exclude(RollupID=row["KeepID"]).delete()[0]
+        return removed
+
+    @classmethod
+    def Rebuild(cls, start_date=None, end_date=None):
+        # ------------------- 
+        # Recomputes the rollup from the Sales table for an optional date range.
+        # Returns the number of rollup rows written.
+        # ------------------- 
+        sales_queryset = Sales.objects.all()
+        if start_date:
+            sales_queryset = sales_queryset.filter(SaleDate__gte=start_date)
+        if end_date:
+            sales_queryset = sales_queryset.filter(SaleDate__lte=end_date)
+
+        grouped = (
+            sales_queryset
+            .values_list("SaleDate", "StoreID", "ProductID", "EmployeeID")
+            .annotate(Total=Sum("TotalAmount"), Transactions=Count("SalesID"))
+            .order_by()
+        )
+
+        written = 0
+        with transaction.atomic():
+            cls.FilterDates(start_date, end_date).delete()
+
+            batch = []
+            for date, storeId, productId, employeeId, amount, count in grouped.iterator(chunk_size=ROLLUP_REBUILD_CHUNK_SIZE):
+                batch.append(cls(
+                    Date=date,
+                    StoreID_id=storeId,
+                    ProductID_id=productId,
+                    EmployeeID_id=employeeId,
+                    TotalAmount=amount,
+                    TransactionCount=count,
+                ))
+                if len(batch) >= ROLLUP_REBUILD_CHUNK_SIZE:
+                    written += len(cls.objects.bulk_create(batch))
+                    batch = []
+            written += len(cls.objects.bulk_create(batch))
+
+        return written
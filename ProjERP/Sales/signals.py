@@ -0,0 +1,61 @@
+# Signal handlers keeping SalesDailyRollup in step with Sales rows
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from app.reportcache import InvalidateReports
+from HR.models import Staff
+from Inventory.models import Product, Store
+from .analytics import MarkSalesRewritten
+from .models import Sales, SalesDailyRollup
+
+
+@receiver(post_save, sender=Sales)
+def ApplySaleSave(sender, instance, created, raw=False, **kwargs):
+    # Add a new sale to the rollup, or swap the stored version of an edited sale for the saved one
+    if raw:  # Fixture loading, the rollup is rebuilt separately
+        return
+
+    rows = [instance.GetRollupRow()]
+    stored = getattr(instance, "_stored_rollup", None)
+    if not created and stored is not None:
+        date, storeId, productId, employeeId, amount, count = stored
+        rows.append((date, storeId, productId, employeeId, -amount, -count))
+        # In-memory snapshots only pick up appends on their own; reloading before commit would miss the edit
+        transaction.on_commit(MarkSalesRewritten)
+
+    SalesDailyRollup.ApplySales(rows)
+    instance._stored_rollup = instance.GetRollupRow()
+
+
+@receiver(post_delete, sender=Sales)
+def ApplySaleDelete(sender, instance, **kwargs):
+    # Remove a deleted sale from the rollup (also runs for cascades)
+    SalesDailyRollup.ApplySales([instance.GetRollupRow(sign=-1)])
+    transaction.on_commit(MarkSalesRewritten)
+
+
+@receiver(pre_delete, sender=Product)
+@receiver(pre_delete, sender=Staff)
+def RememberRollupDates(sender, instance, **kwargs):
+    # Days whose rollup rows the delete is about to null, so they can be merged afterwards
+    instance._rollup_dates = list(instance.sales_rollups.values_list("Date", flat=True).distinct())
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Staff)
+def MergeNulledRollups(sender, instance, **kwargs):
+    # The nulled rows may now duplicate a row already kept for sales without a product or employee
+    dates = getattr(instance, "_rollup_dates", None)
+    if dates:
+        SalesDailyRollup.MergeDuplicateKeys(dates)
+
+
+def InvalidateReportCache(sender, **kwargs):
+    # Any change to sales, stores or products can alter cached report results
+    InvalidateReports()
+
+
+for model in (Sales, Store, Product):
+    post_save.connect(InvalidateReportCache, sender=model, dispatch_uid=f"report-cache-save-{model.__name__}")
+    post_delete.connect(InvalidateReportCache, sender=model, dispatch_uid=f"report-cache-delete-{model.__name__}")
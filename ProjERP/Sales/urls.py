@@ -0,0 +1,9 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path("", views.SalesListView, name="sales-list"),
+    path("performance/", views.SalesPerformanceGraphView, name="sales-performance"),
+    path("graph/", views.SalesGraphView, name="sales-graph"),
+]
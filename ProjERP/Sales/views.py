@@ -1,19 +1,120 @@
-from django.http import JsonResponse
-from django.shortcuts import render
+import asyncio
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import close_old_connections
+from django.db.models import Max
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date
 
 from app.facade import Facade
+from app.paginator import KeysetListView, ParseDate, ParseId
+from app.reportcache import GetReportChangedAt, GetReportVersion
+from app.routers import ReportingDatabase
+from .models import GRAPH_DIMENSIONS, GRAPH_GRANULARITIES, Sales
+
+
+SalesListView = KeysetListView(
+    Sales,
+    ["SalesID", "SaleDate", "StoreID", "StoreID__StoreName", "ProductID", "ProductID__ProductName",
+     "EmployeeID", "PaymentMethod", "TotalAmount"],
+    {
+        # Id filters seek their foreign key index in primary-key order; date filters switch the order to
+        # (SaleDate, SalesID) so the range and the cursor both seek sales_date_id_idx
+        "store": ("StoreID", ParseId),
+        "product": ("ProductID", ParseId),
+        "employee": ("EmployeeID", ParseId),
+        "start_date": ("SaleDate__gte", ParseDate),
+        "end_date": ("SaleDate__lte", ParseDate),
+    },
+    rangeKey="SaleDate",
+)
+
+
+def ParseDateRange(request):
+    # Validate the optional start_date/end_date query parameters; returns (start, end, error)
+    dates = []
+    for param in ("start_date", "end_date"):
+        value = request.GET.get(param)
+        try:
+            parsed = parse_date(value) if value else None
+        except ValueError:  # Well formed but impossible, e.g. 2025-02-30
+            parsed = None
+        if value and parsed is None:
+            return None, None, f"Invalid {param}: expected YYYY-MM-DD, got {value!r}"
+        dates.append(parsed)
+
+    start_date, end_date = dates
+    if start_date and end_date and start_date > end_date:
+        return None, None, "start_date must not be after end_date"
+    return start_date, end_date, None
+
+
+def GetSalesValidators(start_date, end_date):
+    # ETag from the latest sale and report version; Last-Modified from when sales data last changed
+    latest = Sales.objects.using(ReportingDatabase()).aggregate(LatestSale=Max("SalesID"))["LatestSale"]
+    fingerprint = f"{GetReportVersion()}:{latest}:{start_date}:{end_date}"
+    etag = '"' + hashlib.md5(fingerprint.encode(), usedforsecurity=False).hexdigest() + '"'
+    return etag, GetReportChangedAt()
 
 
-def SalesPerformanceGraphView(request):
-    facade = Facade()
-    start_date = request.GET.get("start_date")  # Optional date from query parameters
-    end_date = request.GET.get("end_date")
+def RunReport(report, start_date, end_date):
+    # Run one aggregate in a worker thread, releasing that thread's connection when done
+    try:
+        return report(start_date, end_date)
+    finally:
+        close_old_connections()
 
-    sales_data = facade.GetSalesPerformanceGraph(start_date, end_date)
 
-    return JsonResponse(
-        {
-            "store_sales": sales_data["store_sales"],
-            "product_sales": sales_data["product_sales"],
-        }
+@staff_member_required
+def SalesGraphView(request):
+    # Chart-ready sales series: ?granularity=day|week|month|quarter|year&dimension=store|product|category&zero_fill=1
+    start_date, end_date, error = ParseDateRange(request)
+    granularity = request.GET.get("granularity", "day")
+    dimension = request.GET.get("dimension") or None
+    if not error and granularity not in GRAPH_GRANULARITIES:
+        error = f"Invalid granularity: expected one of {', '.join(GRAPH_GRANULARITIES)}"
+    if not error and dimension is not None and dimension not in GRAPH_DIMENSIONS:
+        error = f"Invalid dimension: expected one of {', '.join(GRAPH_DIMENSIONS)}"
+    if error:
+        return JsonResponse({"error": error}, status=400)
+
+    try:
+        series = Sales().GetSalesGraph(
+            start_date, end_date, granularity=granularity, dimension=dimension,
+            zero_fill=request.GET.get("zero_fill") in ("1", "true"),
+        )
+    except ValueError as exc:  # Zero fill over too many buckets
+        return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse({"granularity": granularity, "dimension": dimension, "series": series})
+
+
+async def SalesPerformanceGraphView(request):
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+
+    start_date, end_date, error = ParseDateRange(request)  # Optional dates from query parameters
+    if error:
+        return JsonResponse({"error": error}, status=400)
+
+    # Unchanged dashboards get a 304 before any aggregate runs
+    etag, last_modified = await sync_to_async(GetSalesValidators)(start_date, end_date)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    # Store-level and product-level aggregates run concurrently, each on its own thread and connection
+    facade = Facade.ForRequest(request)
+    store_sales, product_sales = await asyncio.gather(
+        sync_to_async(RunReport, thread_sensitive=False)(facade.GetStoreSales, start_date, end_date),
+        sync_to_async(RunReport, thread_sensitive=False)(facade.GetProductSales, start_date, end_date),
     )
+
+    response = JsonResponse({"store_sales": store_sales, "product_sales": product_sales})
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified)
+    return response